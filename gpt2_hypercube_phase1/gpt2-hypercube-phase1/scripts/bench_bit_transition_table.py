@@ -0,0 +1,85 @@
+"""
+Memory, file size and save/load time of BitTransitionTable against the former
+dict-of-lists + indented JSON representation.
+
+Usage: python scripts/bench_bit_transition_table.py [n_bits] [n_edits]
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+import tracemalloc
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.hypercube.topology import Hypercube
+from src.routing.bit_transition_table import BitTransitionTable
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    secs = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, secs, peak
+
+
+def row(name, build_s, mem, size, save_s, load_s):
+    print(f"{name:<26} {build_s:>8.2f} {mem / 2 ** 20:>9.1f} {size / 2 ** 20:>9.2f} {save_s:>7.2f} {load_s:>7.2f}")
+
+
+def main(n=20, n_edits=10000):
+    hc = Hypercube(n)
+    rng = np.random.RandomState(0)
+    edits = [(int(u), int(u) ^ (1 << int(b))) for u, b in zip(rng.randint(0, hc.vertex_count, n_edits), rng.randint(0, n, n_edits))]
+    print(f"n={n}: {hc.vertex_count:,} vertices, {hc.edge_count:,} edges, {n_edits} disabled edges")
+    print(f"{'representation':<26} {'build s':>8} {'peak MB':>9} {'file MB':>9} {'save s':>7} {'load s':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        def legacy_build():
+            adjacency = {v: hc.neighbors(v) for v in hc.all_vertices()}
+            for u, v in edits:
+                if v in adjacency[u]:
+                    adjacency[u].remove(v)
+                    adjacency[v].remove(u)
+            return adjacency
+        adjacency, build_s, mem = measure(legacy_build)
+        path = os.path.join(tmp, "table.json")
+        start = time.perf_counter()
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"n": n, "adjacency": {str(k): v for k, v in adjacency.items()}}, f, indent=2)
+        save_s = time.perf_counter() - start
+        del adjacency
+        start = time.perf_counter()
+        with open(path, "r", encoding="utf-8") as f:
+            d = json.load(f)
+        {int(k): list(v) for k, v in d["adjacency"].items()}
+        load_s = time.perf_counter() - start
+        del d
+        row("dict of lists + JSON", build_s, mem, os.path.getsize(path), save_s, load_s)
+
+        for label, k in (("implicit", 0), ("implicit + overrides", n_edits)):
+            def build():
+                table = BitTransitionTable(hc)
+                for u, v in edits[:k]:
+                    table.remove_edge(u, v)
+                return table
+            table, build_s, mem = measure(build)
+            path = os.path.join(tmp, "table.btt")
+            start = time.perf_counter()
+            table.save(path)
+            save_s = time.perf_counter() - start
+            start = time.perf_counter()
+            BitTransitionTable.load(path)
+            load_s = time.perf_counter() - start
+            row(label, build_s, mem, os.path.getsize(path), save_s, load_s)
+        start = time.perf_counter()
+        n_listed = len(table.edge_list())
+        print(f"edge_list() with overrides: {n_listed:,} edges in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:3]])
@@ -0,0 +1,60 @@
+"""
+Time a checkpoint blocks the training loop: synchronous torch.save vs the background
+CheckpointWriter (snapshot to CPU, safetensors write on a worker thread), plus the
+time until the file is on disk and the load time of each format. The state dict is
+a randomly initialised GPT-2 (124M parameters at the default size).
+
+Usage: python scripts/bench_checkpoint_writer.py [n_layer] [n_embd] [saves]
+"""
+import os
+import sys
+import tempfile
+import time
+import torch
+from transformers import GPT2Config, GPT2LMHeadModel
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.utils.checkpoint_writer import CheckpointWriter, load_tensors
+
+
+def main(n_layer=12, n_embd=768, saves=3):
+    model = GPT2LMHeadModel(GPT2Config(n_layer=n_layer, n_embd=n_embd, n_head=max(1, n_embd // 64)))
+    state = model.state_dict()
+    n_params = sum(p.numel() for p in model.parameters())
+    print(f"GPT-2 {n_layer}x{n_embd}: {n_params / 1e6:.0f}M parameters, {saves} saves")
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        for i in range(saves):
+            torch.save({"student_state": state}, os.path.join(tmp, f"sync_{i}.pt"))
+        sync = (time.perf_counter() - start) / saves
+
+        writer = CheckpointWriter(max_pending=2)
+        blocked = []
+        start = time.perf_counter()
+        for i in range(saves):
+            t0 = time.perf_counter()
+            writer.save_tensors(state, os.path.join(tmp, f"async_{i}.safetensors"))
+            blocked.append(time.perf_counter() - t0)
+        writer.flush()
+        landed = (time.perf_counter() - start) / saves
+        writer.close()
+
+        start = time.perf_counter()
+        torch.load(os.path.join(tmp, "sync_0.pt"))
+        load_pt = time.perf_counter() - start
+        start = time.perf_counter()
+        load_tensors(os.path.join(tmp, "async_0.safetensors"))
+        load_st = time.perf_counter() - start
+        size_pt = os.path.getsize(os.path.join(tmp, "sync_0.pt")) / 2**20
+        size_st = os.path.getsize(os.path.join(tmp, "async_0.safetensors")) / 2**20
+    print(f"{'torch.save, loop blocked per save, s':<44} {sync:>8.3f}")
+    print(f"{'writer, loop blocked per save (first), s':<44} {blocked[0]:>8.3f}")
+    print(f"{'writer, loop blocked per save (mean), s':<44} {sum(blocked) / saves:>8.3f}")
+    print(f"{'writer, submit to on-disk per save, s':<44} {landed:>8.3f}")
+    print(f"{'load .pt / .safetensors, s':<44} {load_pt:>8.3f} / {load_st:.3f}")
+    print(f"{'size .pt / .safetensors, MB':<44} {size_pt:>8.1f} / {size_st:.1f}")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:4]])
@@ -0,0 +1,66 @@
+"""
+Peak memory and throughput of the token distillation loss (forward + backward) at
+GPT-2 vocabulary size: dense token_lm_loss vs chunked_token_lm_loss, with and
+without teacher top-k. Each variant runs in its own process so the peak resident
+set (CPU) or peak allocated memory (CUDA) is measured in isolation, on top of the
+student/teacher logits and the gradient buffer that every variant needs.
+
+Usage: python scripts/bench_distillation_loss.py [batch] [seq_len] [vocab] [repeats]
+"""
+import os
+import resource
+import subprocess
+import sys
+import time
+import torch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.distillation.losses import token_lm_loss, chunked_token_lm_loss
+
+VARIANTS = {
+    "dense token_lm_loss": lambda s, t, y: token_lm_loss(s, t, y),
+    "chunked, chunk=64": lambda s, t, y: chunked_token_lm_loss(s, t, y, chunk_size=64),
+    "chunked, chunk=16": lambda s, t, y: chunked_token_lm_loss(s, t, y, chunk_size=16),
+    "chunked, chunk=64, T=2, top-k=64": lambda s, t, y: chunked_token_lm_loss(s, t, y, temperature=2.0, top_k=64, chunk_size=64),
+}
+
+
+def peak_bytes(device):
+    if device.type == "cuda":
+        return torch.cuda.max_memory_allocated()
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def run_variant(name, batch, seq_len, vocab, repeats):
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    gen = torch.Generator(device=device).manual_seed(0)
+    student = torch.randn(batch, seq_len, vocab, device=device, generator=gen, requires_grad=True)
+    teacher = torch.randn(batch, seq_len, vocab, device=device, generator=gen)
+    labels = torch.randint(0, vocab, (batch, seq_len), device=device, generator=gen)
+    student.grad = torch.ones_like(student)  # touch the gradient buffer before the baseline
+    base = peak_bytes(device)
+    fn = VARIANTS[name]
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn(student, teacher, labels).backward()
+    if device.type == "cuda":
+        torch.cuda.synchronize()
+    elapsed = time.perf_counter() - start
+    print(f"{(peak_bytes(device) - base) / 2**20:.1f} {batch * seq_len * repeats / elapsed:.0f}")
+
+
+def main(batch=4, seq_len=256, vocab=50257, repeats=3):
+    print(f"batch={batch} seq_len={seq_len} vocab={vocab} (logits {batch * seq_len * vocab * 4 / 2**20:.0f} MB fp32)")
+    print(f"{'loss':<36} {'extra peak MB':>14} {'tokens/s':>10}")
+    for name in VARIANTS:
+        out = subprocess.run([sys.executable, __file__, "--variant", name, str(batch), str(seq_len), str(vocab), str(repeats)],
+                             capture_output=True, text=True, check=True).stdout.split()
+        print(f"{name:<36} {float(out[0]):>14.1f} {float(out[1]):>10.0f}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--variant":
+        run_variant(sys.argv[2], *[int(a) for a in sys.argv[3:7]])
+    else:
+        main(*[int(a) for a in sys.argv[1:5]])
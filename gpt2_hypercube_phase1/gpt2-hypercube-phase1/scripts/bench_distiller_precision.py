@@ -0,0 +1,88 @@
+"""
+Distiller throughput and peak memory for fp32 vs bf16 autocast, gradient
+accumulation and student gradient checkpointing. The student is a randomly
+initialised GPT-2 (vocab 50257); the teacher is a 1-layer GPT-2 so that the
+student's forward/backward dominates. Each configuration runs in its own process
+and reports tokens/s and the peak RSS (CPU) or peak allocated memory (CUDA) above
+the models' own footprint (activations, gradients, optimizer state).
+
+Usage: python scripts/bench_distiller_precision.py [batches] [batch_size] [seq_len] [student_layers]
+"""
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import torch
+from torch import nn
+from torch.utils.data import DataLoader
+from transformers import GPT2Config, GPT2LMHeadModel
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.distillation import distiller as distiller_mod
+from src.distillation.distiller import Distiller
+from src.distillation.curriculum import CurriculumSchedule, Stage
+from src.distillation.losses import next_token_labels
+
+# name -> (precision, grad_accum_steps, micro-batches per batch, gradient_checkpointing)
+CONFIGS = {
+    "fp32": ("fp32", 1, 1, False),
+    "bf16 autocast": ("bf16", 1, 1, False),
+    "fp32, accum 4 x batch/4": ("fp32", 4, 4, False),
+    "fp32, grad checkpointing": ("fp32", 1, 1, True),
+    "bf16, accum 4, checkpointing": ("bf16", 4, 4, True),
+}
+
+
+class LM(nn.Module):
+    def __init__(self, n_layer, n_embd, n_head):
+        super().__init__()
+        self.model = GPT2LMHeadModel(GPT2Config(n_positions=512, n_embd=n_embd, n_layer=n_layer, n_head=n_head, use_cache=False))
+
+    def forward(self, batch):
+        return {"logits": self.model(input_ids=batch["input_ids"]).logits}
+
+
+def peak_bytes(device):
+    if device.type == "cuda":
+        return torch.cuda.max_memory_allocated()
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def run_config(name, batches, batch_size, seq_len, student_layers):
+    precision, accum, split, ckpt = CONFIGS[name]
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    torch.manual_seed(0)
+    teacher, student = LM(1, 64, 2).to(device).eval(), LM(student_layers, 256, 4)
+    ids = torch.randint(0, 50257, (batches * batch_size, seq_len))
+    micro = batch_size // split
+    data = [{"input_ids": ids[i:i + micro], "labels": next_token_labels(ids[i:i + micro])} for i in range(0, len(ids), micro)]
+    with tempfile.TemporaryDirectory() as tmp:
+        distiller_mod.CHECKPOINT_DIR = tmp
+        dist = Distiller(teacher, student, torch.optim.AdamW(student.parameters(), 1e-4), device=device,
+                         curriculum=CurriculumSchedule([Stage("all", 2)]), precision=precision,
+                         grad_accum_steps=accum, gradient_checkpointing=ckpt)
+        base = peak_bytes(device)
+        dist.run_distillation(DataLoader(data[:split], batch_size=None), epochs=1)  # warm-up step
+        start = time.perf_counter()
+        dist.run_distillation(DataLoader(data, batch_size=None), epochs=1)
+        elapsed = time.perf_counter() - start
+    print(f"{ids.numel() / elapsed:.0f} {(peak_bytes(device) - base) / 2**20:.1f}")
+
+
+def main(batches=4, batch_size=8, seq_len=128, student_layers=4):
+    print(f"batches={batches} batch_size={batch_size} seq_len={seq_len} student={student_layers}x256")
+    print(f"{'configuration':<32} {'tokens/s':>10} {'extra peak MB':>14}")
+    for name in CONFIGS:
+        out = subprocess.run([sys.executable, __file__, "--config", name, str(batches), str(batch_size), str(seq_len),
+                              str(student_layers)], capture_output=True, text=True, check=True).stdout.split()
+        print(f"{name:<32} {float(out[-2]):>10.0f} {float(out[-1]):>14.1f}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--config":
+        run_config(sys.argv[2], *[int(a) for a in sys.argv[3:7]])
+    else:
+        main(*[int(a) for a in sys.argv[1:5]])
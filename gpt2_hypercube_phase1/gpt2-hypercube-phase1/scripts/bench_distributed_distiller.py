@@ -0,0 +1,72 @@
+"""
+Strong scaling of DistributedDistiller: one epoch over a fixed set of batches with
+1, 2, 4 and 8 local gloo processes. The student is a random GPT-2 (vocab 50257), the
+teacher a 1-layer GPT-2; intra-op threads are split evenly between the processes.
+Efficiency = speedup over 1 process / processes.
+
+Usage: python scripts/bench_distributed_distiller.py [max_procs] [batches] [batch_size] [seq_len]
+"""
+import os
+import sys
+import tempfile
+import time
+import torch
+import torch.distributed as dist
+from torch import nn
+from torch.utils.data import DataLoader
+from transformers import GPT2Config, GPT2LMHeadModel
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.distillation import distiller as distiller_mod
+from src.distillation.curriculum import CurriculumSchedule, Stage
+from src.distillation.distributed import DistributedDistiller, launch
+from src.distillation.losses import next_token_labels
+
+
+class LM(nn.Module):
+    def __init__(self, n_layer, n_embd, n_head):
+        super().__init__()
+        self.model = GPT2LMHeadModel(GPT2Config(n_positions=256, n_embd=n_embd, n_layer=n_layer, n_head=n_head, use_cache=False))
+
+    def forward(self, batch):
+        return {"logits": self.model(input_ids=batch["input_ids"]).logits}
+
+
+def worker(rank, world_size, data, ckpt_dir, out_path):
+    distiller_mod.CHECKPOINT_DIR = ckpt_dir
+    torch.manual_seed(0)
+    teacher, student = LM(1, 64, 2).eval(), LM(2, 128, 2)
+    dd = DistributedDistiller(teacher, student, torch.optim.AdamW(student.parameters(), 1e-4),
+                              curriculum=CurriculumSchedule([Stage("all", 2)]), device=torch.device("cpu"))
+    dist.barrier()
+    start = time.perf_counter()
+    dd.run_distillation(DataLoader(data, batch_size=None), epochs=1)
+    dist.barrier()
+    if rank == 0:
+        with open(out_path, "w") as f:
+            f.write(str(time.perf_counter() - start))
+
+
+def main(max_procs=8, batches=32, batch_size=4, seq_len=64):
+    torch.manual_seed(0)
+    ids = torch.randint(0, 50257, (batches * batch_size, seq_len))
+    data = [{"input_ids": ids[i:i + batch_size], "labels": next_token_labels(ids[i:i + batch_size])} for i in range(0, len(ids), batch_size)]
+    print(f"cpus={os.cpu_count()} batches={batches} batch_size={batch_size} seq_len={seq_len} student=2x128")
+    print(f"{'procs':>5} {'s/epoch':>9} {'tokens/s':>10} {'speedup':>8} {'efficiency':>11}")
+    base = None
+    procs = 1
+    with tempfile.TemporaryDirectory() as tmp:
+        while procs <= max_procs:
+            out = os.path.join(tmp, f"time_{procs}")
+            launch(worker, procs, args=(data, tmp, out), port=29600 + procs)
+            with open(out) as f:
+                elapsed = float(f.read())
+            base = base or elapsed
+            speedup = base / elapsed
+            print(f"{procs:>5} {elapsed:>9.2f} {ids.numel() / elapsed:>10.0f} {speedup:>8.2f} {speedup / procs:>11.2f}")
+            procs *= 2
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:5]])
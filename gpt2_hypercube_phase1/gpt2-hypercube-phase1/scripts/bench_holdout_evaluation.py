@@ -0,0 +1,107 @@
+"""
+Holdout evaluation cost: the previous loop (one student.generate per sample,
+evaluator on the raw reference) vs HoldoutEvaluator (batched generation, reference
+preparation cached, scoring pool) and with the sequential early stop. The student
+is a randomly initialised 4x256 GPT-2 with a byte-level BPE trained locally.
+
+Usage: python scripts/bench_holdout_evaluation.py [samples] [batch_size] [max_new_tokens]
+"""
+import functools
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+import numpy as np
+import torch
+from transformers import GPT2Config, GPT2LMHeadModel, PreTrainedTokenizerFast
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.evaluation.holdout import HoldoutEvaluator, gpt2_generate_batch
+
+
+class NgramEvaluator:
+    """BLEU-style 1-4 gram precision on subword tokens; the reference side is the costly part."""
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+
+    def prepare(self, reference):
+        ids = self.tokenizer(reference)["input_ids"]
+        return [Counter(tuple(ids[i:i + n]) for i in range(len(ids) - n + 1)) for n in range(1, 5)]
+
+    def score(self, output, prepared):
+        ids = self.tokenizer(output)["input_ids"]
+        precisions = []
+        for n, ref in enumerate(prepared, start=1):
+            out = Counter(tuple(ids[i:i + n]) for i in range(len(ids) - n + 1))
+            precisions.append(sum((out & ref).values()) / max(1, sum(out.values())))
+        return {"coherence": float(np.mean(precisions)), "unigram_precision": precisions[0]}
+
+    def __call__(self, output, reference):
+        return self.score(output, self.prepare(reference))
+
+
+class Student:
+    def __init__(self, model, tokenizer, max_new_tokens):
+        self.model, self.tokenizer, self.max_new_tokens = model, tokenizer, max_new_tokens
+
+    def generate(self, prompt):
+        return gpt2_generate_batch(self.model, self.tokenizer, [prompt], self.max_new_tokens)[0]
+
+    def generate_batch(self, prompts):
+        return gpt2_generate_batch(self.model, self.tokenizer, prompts, self.max_new_tokens)
+
+
+def main(samples=128, batch_size=16, max_new_tokens=24):
+    from tokenizers import ByteLevelBPETokenizer
+    rng = np.random.default_rng(0)
+    words = [f"w{i}" for i in range(3000)]
+    sentence = lambda lo, hi: " ".join(rng.choice(words, size=int(rng.integers(lo, hi))))
+    holdout = [{"prompt": sentence(8, 24), "reference": sentence(150, 300)} for _ in range(samples)]
+    with tempfile.TemporaryDirectory() as tmp:
+        bpe = ByteLevelBPETokenizer()
+        bpe.train_from_iterator([s["reference"] for s in holdout], vocab_size=8192,
+                                special_tokens=["<|endoftext|>"], show_progress=False)
+        bpe.save(os.path.join(tmp, "tokenizer.json"))
+        load = functools.partial(PreTrainedTokenizerFast, tokenizer_file=os.path.join(tmp, "tokenizer.json"),
+                                 eos_token="<|endoftext|>")
+        # the scoring threads get their own tokenizer: a fast tokenizer's padding settings are
+        # per instance, and generation pads while the pool scores
+        tokenizer, score_tokenizer = load(), load()
+    torch.manual_seed(0)
+    model = GPT2LMHeadModel(GPT2Config(vocab_size=len(tokenizer), n_positions=256, n_embd=256, n_layer=4,
+                                       n_head=4, bos_token_id=0, eos_token_id=0)).eval()
+    student = Student(model, tokenizer, max_new_tokens)
+    evaluator = NgramEvaluator(score_tokenizer)
+    print(f"samples={samples} batch_size={batch_size} max_new_tokens={max_new_tokens} threads={torch.get_num_threads()}")
+
+    start = time.perf_counter()
+    with torch.no_grad():
+        old = [evaluator(student.generate(s["prompt"]), s["reference"]) for s in holdout]
+    old_s = time.perf_counter() - start
+    rows = [("per-sample loop (previous)", samples, old_s)]
+
+    ev = HoldoutEvaluator(evaluator, batch_size=batch_size, workers=2, max_samples=None)
+    start = time.perf_counter()
+    first = ev.evaluate(student, holdout)
+    rows.append(("batched + pool, cold cache", first["n"], time.perf_counter() - start))
+    start = time.perf_counter()
+    full = ev.evaluate(student, holdout)
+    rows.append(("batched + pool, cached refs", full["n"], time.perf_counter() - start))
+    ev.alpha = 0.05
+    start = time.perf_counter()
+    early = ev.evaluate(student, holdout, baseline=first["scores"], max_drop=0.1)
+    rows.append((f"+ sequential test ({early['decision']})", early["n"], time.perf_counter() - start))
+    ev.close()
+
+    print(f"{'':<34} {'samples':>8} {'seconds':>8} {'samples/s':>10}")
+    for name, n, secs in rows:
+        print(f"{name:<34} {n:>8} {secs:>8.2f} {n / secs:>10.1f}")
+    diff = abs(np.mean([m["coherence"] for m in old]) - full["metrics"]["coherence"])
+    print(f"mean coherence, per-sample vs batched: |diff| = {diff:.4f}")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:4]])
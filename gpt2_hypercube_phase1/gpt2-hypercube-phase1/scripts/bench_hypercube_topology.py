@@ -0,0 +1,52 @@
+"""
+Micro-benchmarks of batched Hypercube topology ops against their per-vertex forms.
+
+Usage: python scripts/bench_hypercube_topology.py [n_ids] [max_bits]
+"""
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.hypercube.topology import Hypercube
+
+SCALAR_SAMPLE = 20000
+
+
+def rate(fn, count):
+    start = time.perf_counter()
+    fn()
+    return count / (time.perf_counter() - start)
+
+
+def main(n_ids=1000000, max_bits=24):
+    rng = np.random.RandomState(0)
+    print(f"{'n':>3} {'op':<12} {'batched ids/s':>15} {'scalar ids/s':>14} {'speedup':>8}")
+    for n in range(12, max_bits + 1, 4):
+        hc = Hypercube(n)
+        a = rng.randint(0, hc.vertex_count, size=n_ids).astype(hc.id_dtype)
+        b = rng.randint(0, hc.vertex_count, size=n_ids).astype(hc.id_dtype)
+        bits = hc.bits_of(a)
+        sa, sb = a[:SCALAR_SAMPLE].tolist(), b[:SCALAR_SAMPLE].tolist()
+        sbits = [hc.bits_of(v) for v in sa]
+        ops = [
+            ("bits_of", lambda: hc.bits_of(a), lambda: [hc.bits_of(v) for v in sa]),
+            ("vertex_id", lambda: hc.vertex_id(bits), lambda: [hc.vertex_id(x) for x in sbits]),
+            ("hamming", lambda: hc.hamming(a, b), lambda: [hc.hamming(x, y) for x, y in zip(sa, sb)]),
+            ("neighbors", lambda: hc.neighbors(a), lambda: [hc.neighbors(v) for v in sa]),
+            ("complement", lambda: hc.complement(a), lambda: [hc.complement(v) for v in sa]),
+        ]
+        for name, batched, scalar in ops:
+            fast = rate(batched, n_ids)
+            slow = rate(scalar, SCALAR_SAMPLE)
+            print(f"{n:>3} {name:<12} {fast:>15,.0f} {slow:>14,.0f} {fast / slow:>7.0f}x")
+        start = time.perf_counter()
+        count = sum(len(block) for block in hc.edge_blocks())
+        secs = time.perf_counter() - start
+        print(f"{n:>3} {'edges':<12} {count:,} edges in {secs:.2f}s ({count / secs:,.0f} edges/s)")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:3]])
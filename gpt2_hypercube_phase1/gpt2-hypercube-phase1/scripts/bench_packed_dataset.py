@@ -0,0 +1,78 @@
+"""
+Tokens/s delivered to the trainer: on-the-fly tokenization + padding per batch vs
+the packed uint16 dataset (build once in a tokenizer pool, then PackedLoader).
+No GPT-2 vocabulary is downloaded: a byte-level BPE is trained on the synthetic
+corpus and loaded through PreTrainedTokenizerFast (the same fast Rust tokenizer).
+
+Usage: python scripts/bench_packed_dataset.py [documents] [block_size] [workers] [batch_size]
+"""
+import functools
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.distillation.packed_dataset import build_packed_dataset, PackedLoader
+
+
+def corpus(n, seed):
+    rng = np.random.default_rng(seed)
+    words = [f"w{i}" for i in range(5000)] + ["the", "hypercube", "vertex", "concept", "of", "and", "to"]
+    for _ in range(n):
+        yield " ".join(rng.choice(words, size=int(rng.integers(20, 400))))
+
+
+def train_tokenizer(path, docs):
+    from tokenizers import ByteLevelBPETokenizer
+    tok = ByteLevelBPETokenizer()
+    tok.train_from_iterator(docs, vocab_size=50257, special_tokens=["<|endoftext|>"], show_progress=False)
+    tok.save(path)
+
+
+def main(documents=20000, block_size=512, workers=2, batch_size=8):
+    from transformers import PreTrainedTokenizerFast
+    with tempfile.TemporaryDirectory() as tmp:
+        tok_path = os.path.join(tmp, "tokenizer.json")
+        train_tokenizer(tok_path, corpus(2000, 1))
+        factory = functools.partial(PreTrainedTokenizerFast, tokenizer_file=tok_path, eos_token="<|endoftext|>",
+                                    pad_token="<|endoftext|>")
+        tokenizer = factory()
+        print(f"documents={documents} block_size={block_size} workers={workers} batch_size={batch_size} "
+              f"vocab={len(tokenizer)} cpus={os.cpu_count()}")
+
+        # baseline: tokenize each batch of documents in the training loop, pad to the longest
+        docs = list(corpus(documents, 0))
+        start = time.perf_counter()
+        real = padded = 0
+        for i in range(0, len(docs), batch_size):
+            enc = tokenizer(docs[i:i + batch_size], padding=True, truncation=True, max_length=block_size,
+                            return_tensors="pt")
+            ids = enc["input_ids"]
+            real += int(enc["attention_mask"].sum())
+            padded += ids.numel()
+        baseline = time.perf_counter() - start
+
+        start = time.perf_counter()
+        ds = build_packed_dataset({"all": iter(docs)}, os.path.join(tmp, "packed"), block_size=block_size,
+                                  tokenizer_factory=factory, workers=workers)
+        build = time.perf_counter() - start
+        n_tokens = ds.index["stages"]["all"]["tokens"]
+
+        rates = {}
+        for prefetch in (0, 4):
+            loader = PackedLoader(ds, batch_size=batch_size, prefetch=prefetch, seed=0)
+            start = time.perf_counter()
+            delivered = sum(b["input_ids"].numel() for b in loader)
+            rates[prefetch] = delivered / (time.perf_counter() - start)
+
+    print(f"{'on-the-fly tokenize+pad, tokens/s':<40} {real / baseline:>12,.0f}  (padding {1 - real / padded:.1%})")
+    print(f"{'packed build (pool), tokens/s':<40} {n_tokens / build:>12,.0f}  ({n_tokens:,} tokens, {build:.1f}s)")
+    print(f"{'PackedLoader no prefetch, tokens/s':<40} {rates[0]:>12,.0f}  (padding 0.0%)")
+    print(f"{'PackedLoader prefetch=4, tokens/s':<40} {rates[4]:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:5]])
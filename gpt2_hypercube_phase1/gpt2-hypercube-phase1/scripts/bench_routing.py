@@ -0,0 +1,58 @@
+"""
+Throughput of HypercubeRouter: batched e-cube routes for 1M (src, dst) pairs,
+per-pair routing, disjoint paths and bitset BFS around blocked vertices.
+
+Usage: python scripts/bench_routing.py [n_queries] [n_bits] [n_blocked]
+"""
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.hypercube.topology import Hypercube
+from src.routing.router import HypercubeRouter
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main(n_queries=1000000, n_bits=20, n_blocked=10000):
+    hc = Hypercube(n_bits)
+    router = HypercubeRouter(hc)
+    rng = np.random.RandomState(0)
+    src = rng.randint(0, hc.vertex_count, size=n_queries)
+    dst = rng.randint(0, hc.vertex_count, size=n_queries)
+    print(f"n={n_bits}, {n_queries:,} route queries")
+    print(f"{'operation':<38} {'queries':>9} {'seconds':>8} {'queries/s':>12}")
+
+    def report(name, count, secs):
+        print(f"{name:<38} {count:>9,} {secs:>8.2f} {count / secs:>12,.0f}")
+
+    _, secs = timed(lambda: router.distances(src, dst))
+    report("distances (batched)", n_queries, secs)
+    _, secs = timed(lambda: router.next_hops(src, dst))
+    report("next_hops (batched)", n_queries, secs)
+    total = 0
+    start = time.perf_counter()
+    for i in range(0, n_queries, 1 << 18):
+        paths, lengths = router.shortest_paths(src[i:i + (1 << 18)], dst[i:i + (1 << 18)])
+        total += int(lengths.sum())
+    report("shortest_paths (batched, full paths)", n_queries, time.perf_counter() - start)
+    sample = 100000
+    pairs = list(zip(src[:sample].tolist(), dst[:sample].tolist()))
+    _, secs = timed(lambda: [router.shortest_path(a, b) for a, b in pairs])
+    report("shortest_path (per pair)", sample, secs)
+    _, secs = timed(lambda: [router.disjoint_paths(a, b) for a, b in pairs[:10000]])
+    report("disjoint_paths (per pair)", 10000, secs)
+    blocked = set(rng.randint(0, hc.vertex_count, size=n_blocked).tolist())
+    _, secs = timed(lambda: [router.route(a, b, blocked=blocked) for a, b in pairs[:20]])
+    report(f"route avoiding {len(blocked):,} blocked (BFS)", 20, secs)
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:4]])
@@ -0,0 +1,50 @@
+"""
+Query throughput of ShardedVectorDB with K local shard processes vs a single VectorDB.
+
+Usage: python scripts/bench_sharded_vector_db.py [n_vectors] [n_queries] [max_shards]
+"""
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.knowledge.vector_db import VectorDB
+from src.knowledge.sharded_vector_db import ShardedVectorDB
+
+DIM = 768
+
+
+def timed_queries(db, queries):
+    db.query(queries[0], top_k=10)
+    start = time.perf_counter()
+    for q in queries:
+        db.query(q, top_k=10)
+    return len(queries) / (time.perf_counter() - start)
+
+
+def main(n=100000, n_queries=50, max_shards=8):
+    rng = np.random.RandomState(0)
+    data = rng.randn(n, DIM).astype(np.float32)
+    queries = rng.randn(n_queries, DIM).astype(np.float32)
+    items = [(i, v, None) for i, v in enumerate(data)]
+    single = VectorDB()
+    single.bulk_upsert(items)
+    base = timed_queries(single, queries)
+    print(f"cpus={os.cpu_count()} n={n} dim={DIM}")
+    print(f"{'shards':>6} {'qps':>8} {'speedup':>8}")
+    print(f"{'single':>6} {base:>8.1f} {1.0:>8.2f}")
+    del single
+    k = 1
+    while k <= max_shards:
+        with ShardedVectorDB(n_shards=k) as sharded:
+            for start in range(0, n, 10000):
+                sharded.bulk_upsert(items[start:start + 10000])
+            qps = timed_queries(sharded, queries)
+        print(f"{k:>6} {qps:>8.1f} {qps / base:>8.2f}")
+        k *= 2
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:4]])
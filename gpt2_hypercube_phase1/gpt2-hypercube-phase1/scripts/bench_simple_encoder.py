@@ -0,0 +1,58 @@
+"""
+Fit and encode throughput of SimpleEncoder (batch and streaming modes) on short texts.
+
+Usage: python scripts/bench_simple_encoder.py [n_texts] [chunk_size]
+"""
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.knowledge.concept_grounding import SimpleEncoder
+
+
+def short_texts(n, rng, vocab_size=20000, max_words=12):
+    vocab = np.array([f"w{i}" for i in range(vocab_size)])
+    # Zipf-like word frequencies, 3..max_words words per text
+    p = 1.0 / np.arange(1, vocab_size + 1)
+    p /= p.sum()
+    lengths = rng.randint(3, max_words + 1, size=n)
+    words = rng.choice(vocab, size=int(lengths.sum()), p=p)
+    out, pos = [], 0
+    for length in lengths:
+        out.append(" ".join(words[pos:pos + length]))
+        pos += length
+    return out
+
+
+def main(n=100000, chunk=10000):
+    rng = np.random.RandomState(0)
+    texts = short_texts(n, rng)
+    print(f"{'mode':<10} {'fit s':>8} {'encode texts/s':>15} {'file MB':>8} {'load s':>7}")
+    for name, enc in [("batch", SimpleEncoder(dim=64)), ("streaming", SimpleEncoder(dim=64, streaming=True))]:
+        start = time.perf_counter()
+        if enc.streaming:
+            for i in range(0, n, chunk):
+                enc.partial_fit(texts[i:i + chunk])
+        else:
+            enc.fit(texts)
+        fit_s = time.perf_counter() - start
+        start = time.perf_counter()
+        for i in range(0, n, chunk):
+            enc.encode(texts[i:i + chunk])
+        rate = n / (time.perf_counter() - start)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "enc.npz")
+            enc.save(path)
+            size = os.path.getsize(path) / 2 ** 20
+            start = time.perf_counter()
+            SimpleEncoder.load(path)
+            load_s = time.perf_counter() - start
+        print(f"{name:<10} {fit_s:>8.2f} {rate:>15.0f} {size:>8.1f} {load_s:>7.3f}")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:3]])
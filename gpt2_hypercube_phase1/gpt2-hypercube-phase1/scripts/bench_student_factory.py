@@ -0,0 +1,88 @@
+"""
+Size, CPU latency and memory of students from build_student() against their GPT-2
+teacher (GPT-2 small shape, 124M parameters; randomly initialised, as weights
+cannot be downloaded here; initialisation does not change size or speed). Each
+model is timed in its own process: median forward latency for one sequence, and
+peak RSS above the bare interpreter (weights + activations). The 4-bit column
+estimates NF4 with double quantisation (~4.13 bits per parameter) for every
+weight, against quantization.target_size_mb in configs/phase1.yaml.
+
+Usage: python scripts/bench_student_factory.py [seq_len] [runs]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import torch
+import yaml
+from transformers import GPT2Config, GPT2LMHeadModel
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.distillation.student import build_student, GPT2DistillModel
+
+# name -> build_student kwargs (None = the teacher itself)
+VARIANTS = {
+    "teacher 12x768": None,
+    "6 blocks x768 (every other)": dict(layers=range(0, 12, 2)),
+    "6 blocks x512, mlp 2048": dict(layers=range(0, 12, 2), n_embd=512, n_inner=2048),
+    "6 blocks x512, vocab 16k": dict(layers=range(0, 12, 2), n_embd=512, n_inner=2048, vocab_ids=range(16384)),
+    "4 blocks x384, vocab 16k": dict(layers=[0, 4, 8, 11], n_embd=384, n_inner=1536, vocab_ids=range(16384)),
+}
+HEADS = dict(concept_dim=1024, vertex_bits=4)
+
+
+def teacher_model():
+    return GPT2LMHeadModel(GPT2Config(bos_token_id=0, eos_token_id=0, use_cache=False)).eval()
+
+
+def memory_kb(field):
+    # /proc rather than ru_maxrss, which a child inherits from the (large) parent across exec
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith(field + ":"))
+
+
+def run_variant(config_json, seq_len, runs):
+    base = memory_kb("VmRSS")
+    cfg = json.loads(config_json)
+    model = GPT2DistillModel(GPT2LMHeadModel(GPT2Config(**cfg["gpt2"])), **cfg["heads"]).eval()
+    ids = torch.randint(0, cfg["gpt2"]["vocab_size"], (1, seq_len))
+    times = []
+    with torch.no_grad():
+        for _ in range(runs + 2):
+            start = time.perf_counter()
+            model({"input_ids": ids})
+            times.append(time.perf_counter() - start)
+    peak = memory_kb("VmHWM")
+    print(json.dumps({"ms": 1000 * statistics.median(times[2:]), "rss_mb": (peak - base) / 1024}))
+
+
+def main(seq_len=128, runs=10):
+    with open(os.path.join(os.path.dirname(__file__), "..", "configs", "phase1.yaml")) as f:
+        target = yaml.safe_load(f)["quantization"]["target_size_mb"]
+    torch.manual_seed(0)
+    teacher = teacher_model()
+    print(f"seq_len={seq_len} runs={runs} threads={torch.get_num_threads()} target={target} MB (4-bit)")
+    print(f"{'':<30} {'params':>8} {'fp32 MB':>8} {'4-bit MB':>9} {'ms/seq':>8} {'RSS MB':>8}")
+    for name, kwargs in VARIANTS.items():
+        if kwargs is None:
+            model, heads = GPT2DistillModel(teacher), {}
+        else:
+            model, heads = build_student(teacher, **kwargs, **HEADS), HEADS
+        params = sum(p.numel() for p in model.parameters())
+        config = json.dumps({"gpt2": model.model.config.to_dict(), "heads": heads})
+        out = subprocess.run([sys.executable, __file__, "--variant", config, str(seq_len), str(runs)],
+                             capture_output=True, text=True, check=True)
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{name:<30} {params / 1e6:>7.1f}M {params * 4 / 2**20:>8.0f} {params * 4.13 / 8 / 2**20:>9.1f} "
+              f"{r['ms']:>8.1f} {r['rss_mb']:>8.0f}")
+        del model
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--variant":
+        run_variant(sys.argv[2], int(sys.argv[3]), int(sys.argv[4]))
+    else:
+        main(*[int(a) for a in sys.argv[1:3]])
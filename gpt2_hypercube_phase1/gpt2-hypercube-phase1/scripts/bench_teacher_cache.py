@@ -0,0 +1,69 @@
+"""
+Distillation epoch time with a live teacher forward on every batch vs teacher
+outputs precomputed once into memory-mapped shards (teacher_cache). Teacher and
+student are randomly initialised GPT-2 models at vocabulary 50257.
+
+Usage: python scripts/bench_teacher_cache.py [sequences] [seq_len] [teacher_layers] [epochs]
+"""
+import os
+import sys
+import tempfile
+import time
+import torch
+from torch import nn
+from torch.utils.data import DataLoader
+from transformers import GPT2Config, GPT2LMHeadModel
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.distillation import distiller as distiller_mod
+from src.distillation.distiller import Distiller
+from src.distillation.curriculum import CurriculumSchedule, Stage
+from src.distillation.losses import next_token_labels
+from src.distillation.teacher_cache import precompute_teacher_outputs, TeacherCacheLoader
+
+
+class LM(nn.Module):
+    def __init__(self, n_layer, n_embd, n_head):
+        super().__init__()
+        self.model = GPT2LMHeadModel(GPT2Config(n_positions=256, n_embd=n_embd, n_layer=n_layer, n_head=n_head))
+
+    def forward(self, batch):
+        return {"logits": self.model(input_ids=batch["input_ids"]).logits}
+
+
+def main(sequences=64, seq_len=64, teacher_layers=6, epochs=3, batch_size=8):
+    torch.manual_seed(0)
+    teacher = LM(teacher_layers, 384, 6).eval()
+    ids = torch.randint(0, 50257, (sequences, seq_len))
+    data = [{"input_ids": ids[i:i + batch_size], "labels": next_token_labels(ids[i:i + batch_size])} for i in range(0, sequences, batch_size)]
+    curriculum = lambda: CurriculumSchedule([Stage("all", epochs)])
+    print(f"sequences={sequences} seq_len={seq_len} teacher={teacher_layers}x384 student=2x128 epochs={epochs}")
+    with tempfile.TemporaryDirectory() as tmp:
+        distiller_mod.CHECKPOINT_DIR = tmp
+        student = LM(2, 128, 2)
+        dist = Distiller(teacher, student, torch.optim.AdamW(student.parameters(), 1e-4), curriculum=curriculum(),
+                         device=torch.device("cpu"))
+        start = time.perf_counter()
+        dist.run_distillation(DataLoader(data, batch_size=None), epochs=epochs)
+        live = (time.perf_counter() - start) / epochs
+
+        start = time.perf_counter()
+        cache = precompute_teacher_outputs(teacher, DataLoader(data, batch_size=None), os.path.join(tmp, "tc"), top_k=64)
+        precompute = time.perf_counter() - start
+        student = LM(2, 128, 2)
+        dist = Distiller(teacher, student, torch.optim.AdamW(student.parameters(), 1e-4), curriculum=curriculum(),
+                         device=torch.device("cpu"))
+        start = time.perf_counter()
+        dist.run_distillation(TeacherCacheLoader(cache, batch_size=batch_size, shuffle=True), epochs=epochs)
+        cached = (time.perf_counter() - start) / epochs
+        size = sum(os.path.getsize(os.path.join(tmp, "tc", f)) for f in os.listdir(os.path.join(tmp, "tc")))
+    print(f"{'live teacher, s/epoch':<34} {live:>8.2f}")
+    print(f"{'one-off precompute, s':<34} {precompute:>8.2f}")
+    print(f"{'cached top-64, s/epoch':<34} {cached:>8.2f}")
+    print(f"{'epoch speedup':<34} {live / cached:>8.2f}x")
+    print(f"{'cache size, MB':<34} {size / 2**20:>8.2f}  (dense fp32 logits: {sequences * seq_len * 50257 * 4 / 2**20:.0f} MB)")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:5]])
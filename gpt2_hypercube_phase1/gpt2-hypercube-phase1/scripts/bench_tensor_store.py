@@ -0,0 +1,68 @@
+"""
+Disk cost of repeated student checkpoints: full safetensors copies vs the
+content-addressed TensorStore. A random GPT-2 is "trained" between checkpoints by
+updating every parameter except the frozen token/position embeddings (wte is tied
+to the LM head); one checkpoint name is also rewritten, as pre_distill is.
+
+Usage: python scripts/bench_tensor_store.py [n_layer] [n_embd] [checkpoints]
+"""
+import os
+import sys
+import tempfile
+import time
+import torch
+from transformers import GPT2Config, GPT2LMHeadModel
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.utils.checkpoint_writer import CheckpointWriter
+from src.utils.tensor_store import TensorStore
+
+
+def dir_bytes(path):
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+
+
+def main(n_layer=12, n_embd=768, checkpoints=5):
+    model = GPT2LMHeadModel(GPT2Config(n_layer=n_layer, n_embd=n_embd, n_head=max(1, n_embd // 64)))
+    frozen = {"transformer.wte.weight", "transformer.wpe.weight"}
+    trainable = [p for n, p in model.named_parameters() if n not in frozen]
+    print(f"GPT-2 {n_layer}x{n_embd}, {checkpoints} checkpoints, frozen embeddings "
+          f"({sum(p.numel() for n, p in model.named_parameters() if n in frozen) / 1e6:.0f}M of "
+          f"{sum(p.numel() for p in model.parameters()) / 1e6:.0f}M parameters)")
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = CheckpointWriter()
+        store = TensorStore(os.path.join(tmp, "store"))
+        t_full = t_store = 0.0
+        written = []
+        for i in range(checkpoints):
+            with torch.no_grad():
+                for p in trainable:
+                    p.add_(1e-3)
+            names = [f"epoch_{i}", "latest"]
+            for name in names:
+                start = time.perf_counter()
+                writer.save_tensors(model.state_dict(), os.path.join(tmp, "full", f"{name}.safetensors"))
+                writer.flush()
+                t_full += time.perf_counter() - start
+                start = time.perf_counter()
+                written.append(store.put(name, model.state_dict())["bytes_written"])
+                t_store += time.perf_counter() - start
+        writer.close()
+        full_bytes, store_bytes = dir_bytes(os.path.join(tmp, "full")), dir_bytes(os.path.join(tmp, "store"))
+        before_gc = store.stats()["blob_bytes"]
+        for i in range(checkpoints - 1):
+            store.delete(f"epoch_{i}")
+        freed = store.gc()
+    saves = 2 * checkpoints
+    print(f"{'full copies on disk, MB':<42} {full_bytes / 2**20:>9.1f}")
+    print(f"{'store on disk, MB':<42} {store_bytes / 2**20:>9.1f}")
+    print(f"{'store bytes written: first / later saves, MB':<42} {written[0] / 2**20:>9.1f} / "
+          f"{sum(written[1:]) / (saves - 1) / 2**20:.1f}")
+    print(f"{'full save / store put, s per save':<42} {t_full / saves:>9.3f} / {t_store / saves:.3f}")
+    print(f"{'gc after keeping 2 of {} names, MB freed'.format(checkpoints + 1):<42} {freed['bytes_freed'] / 2**20:>9.1f}"
+          f" (of {before_gc / 2**20:.1f})")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:4]])
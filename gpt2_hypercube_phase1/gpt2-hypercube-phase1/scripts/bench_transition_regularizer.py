@@ -0,0 +1,63 @@
+"""
+Per-step cost of the hypercube transition regularizer on a (batch, seq) grid of
+vertex predictions: the former CPU loop, the on-device XOR + popcount version and
+the differentiable per-bit relaxation (forward + backward).
+
+Usage: python scripts/bench_transition_regularizer.py [batch] [seq_len] [n_bits] [repeats]
+"""
+import os
+import sys
+import time
+import torch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.distillation.losses import hypercube_transition_regularizer, soft_transition_regularizer
+
+
+def legacy_regularizer(vertex_seq_preds, penalty=1.0):
+    v = vertex_seq_preds.detach().cpu().numpy()
+    batch_pen = 0.0
+    for seq in v:
+        for i in range(1, len(seq)):
+            h = (int(seq[i - 1]) ^ int(seq[i])).bit_count()
+            if h > 1:
+                batch_pen += h - 1
+    return torch.tensor(batch_pen * penalty / max(1, vertex_seq_preds.shape[0]), dtype=torch.float32)
+
+
+def timed(fn, repeats, device):
+    fn()
+    if device.type == "cuda":
+        torch.cuda.synchronize()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    if device.type == "cuda":
+        torch.cuda.synchronize()
+    return (time.perf_counter() - start) * 1000 / repeats
+
+
+def main(batch=64, seq_len=512, n_bits=16, repeats=20):
+    devices = [torch.device("cpu")] + ([torch.device("cuda")] if torch.cuda.is_available() else [])
+    print(f"batch={batch} seq_len={seq_len} n_bits={n_bits}")
+    print(f"{'device':<6} {'implementation':<40} {'ms/step':>9}")
+    for device in devices:
+        preds = torch.randint(0, 1 << n_bits, (batch, seq_len), device=device)
+        logits = torch.randn(batch, seq_len, n_bits, device=device, requires_grad=True)
+
+        def soft_step():
+            logits.grad = None
+            soft_transition_regularizer(torch.sigmoid(logits)).backward()
+
+        rows = [
+            ("legacy CPU loop (int.bit_count)", lambda: legacy_regularizer(preds), max(1, repeats // 10)),
+            ("XOR + popcount on device", lambda: hypercube_transition_regularizer(preds), repeats),
+            ("soft per-bit relaxation, fwd + bwd", soft_step, repeats),
+        ]
+        for name, fn, reps in rows:
+            print(f"{device.type:<6} {name:<40} {timed(fn, reps, device):>9.2f}")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:5]])
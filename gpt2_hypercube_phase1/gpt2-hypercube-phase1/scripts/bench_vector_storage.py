@@ -0,0 +1,56 @@
+"""
+Memory footprint and recall@10 of VectorDB storage modes on 768-d vectors.
+
+Usage: python scripts/bench_vector_storage.py [n_vectors] [n_queries]
+"""
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.knowledge.vector_db import VectorDB
+
+DIM = 768
+SETTINGS = [
+    ("float32", {}),
+    ("float16", {}),
+    ("int8", {}),
+    ("pq", {"pq_subvectors": 96}),
+    ("pq", {"pq_subvectors": 96, "rerank": 100}),
+    ("pq", {"pq_subvectors": 48}),
+    ("pq", {"pq_subvectors": 48, "rerank": 100}),
+]
+
+
+def clustered(n, n_clusters, rng):
+    centers = rng.randn(n_clusters, DIM).astype(np.float32)
+    return centers[rng.randint(0, n_clusters, size=n)] + 0.5 * rng.randn(n, DIM).astype(np.float32)
+
+
+def main(n=20000, n_queries=100):
+    rng = np.random.RandomState(0)
+    data = clustered(n, 200, rng)
+    queries = clustered(n_queries, 200, rng)
+    items = [(i, v, None) for i, v in enumerate(data)]
+    exact = VectorDB()
+    exact.bulk_upsert(items)
+    truth = [{r["vertex_id"] for r in exact.query(q, top_k=10)} for q in queries]
+    print(f"{'storage':<8} {'options':<34} {'bytes/vec':>10} {'recall@10':>10} {'ms/query':>9}")
+    for storage, kwargs in SETTINGS:
+        db = VectorDB(storage=storage, **kwargs)
+        db.bulk_upsert(items)
+        db.query(queries[0])  # trains PQ
+        start = time.perf_counter()
+        found = [{r["vertex_id"] for r in db.query(q, top_k=10)} for q in queries]
+        ms = (time.perf_counter() - start) * 1000 / n_queries
+        recall = np.mean([len(t & f) / 10 for t, f in zip(truth, found)])
+        usage = db.memory_usage()
+        # full-precision rows for re-ranking live on disk once the store is saved and loaded
+        per_vec = (usage["total"] - usage["full"] - usage["codebook"]) / n
+        print(f"{storage:<8} {str(kwargs):<34} {per_vec:>10.0f} {recall:>10.3f} {ms:>9.2f}")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:3]])
@@ -1,19 +1,49 @@
 """
 Simple retrieval API that returns top-k vertex candidates with snippets.
+
+retrieve_neighborhood() expands the best-matching vertex to its radius-r Hamming
+ball and ranks the items stored on those vertices.
 """
-from typing import List, Dict
+from typing import List, Dict, Optional
 import numpy as np
 
+from ..hypercube.topology import Hypercube
+from ..hypercube.neighborhood import ball
+
 
 class RetrievalAPI:
-    def __init__(self, encoder, vectordb):
+    def __init__(self, encoder, vectordb, hypercube: Optional[Hypercube] = None):
         """
         encoder: callable that takes list[str] -> np.ndarray embeddings
         vectordb: VectorDB instance
+        hypercube: vertex space of the store, needed by retrieve_neighborhood
         """
         self.encoder = encoder
         self.vectordb = vectordb
+        self.hypercube = hypercube
 
     def retrieve(self, query: str, k: int = 5) -> List[Dict]:
         qvec = self.encoder([query])[0]
         return self.vectordb.query(qvec, top_k=k)
+
+    def retrieve_neighborhood(self, query: str, radius: int = 1, k: int = 5) -> List[Dict]:
+        """
+        Items on vertices within Hamming distance `radius` of the query's top vertex,
+        best first; each result also carries its "distance" from that vertex.
+        """
+        if self.hypercube is None:
+            raise ValueError("retrieve_neighborhood needs RetrievalAPI(..., hypercube=...)")
+        qvec = self.encoder([query])[0]
+        top = self.vectordb.query(qvec, top_k=1)
+        if not top:
+            return []
+        center = top[0]["vertex_id"]
+        vertices = ball(self.hypercube, center, radius)
+        if hasattr(self.vectordb, "query_ids"):
+            results = self.vectordb.query_ids(qvec, vertices, top_k=k)
+        else:
+            inside = set(vertices.tolist())
+            results = [r for r in self.vectordb.query(qvec, top_k=len(self.vectordb)) if r["vertex_id"] in inside][:k]
+        for r in results:
+            r["distance"] = self.hypercube.hamming(center, r["vertex_id"])
+        return results
@@ -1,15 +1,18 @@
 """
 Curriculum schedule for phased training.
 Simple stage manager with names and epoch boundaries.
+A stage may also mix in data from other stages (mix={stage_name: weight}).
 """
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 
 class Stage:
-    def __init__(self, name: str, epochs: int):
+    def __init__(self, name: str, epochs: int, mix: Optional[Dict[str, float]] = None):
         self.name = name
         self.epochs = epochs
         self.completed = 0
+        # sampling weight of each stage's data while this stage is active (default: only its own)
+        self.mix = mix
 
 
 class CurriculumSchedule:
@@ -28,6 +31,14 @@ class CurriculumSchedule:
     def current_stage(self) -> Stage:
         return self.stages[self.current_idx]
 
+    def mixing_weights(self) -> Dict[str, float]:
+        """Normalised data weights of the current stage, e.g. {"long_form_chaining": 0.8, "definitions_paraphrase": 0.2}."""
+        mix = self.current_stage().mix or {self.current_stage().name: 1.0}
+        if any(w < 0 for w in mix.values()) or sum(mix.values()) <= 0:
+            raise ValueError(f"invalid mixing weights {mix}")
+        total = sum(mix.values())
+        return {name: w / total for name, w in mix.items() if w > 0}
+
     def step_epoch(self) -> None:
         st = self.current_stage()
         st.completed += 1
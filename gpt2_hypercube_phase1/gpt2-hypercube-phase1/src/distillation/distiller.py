@@ -8,22 +8,84 @@ Teacher API: teacher(inputs) -> dict with keys:
     - vertex_preds: LongTensor (batch, seq_len)  [optional]
 
 Student API: student(inputs) -> similar dict, and student.parameters() for optimizer.
+A student may also return vertex_bit_logits (batch, seq_len, n) for the
+differentiable hypercube regularizer (student.build_student makes such students).
 
 This module implements:
  - staged curriculum loop
  - combined loss (token KD + concept MSE + hypercube regularizer)
  - checkpointing & rollback when metrics drop beyond threshold
  - separate save for experimental vs production
+ - resumable training state
 """
+import itertools
 import os
+import random
 import time
+import numpy as np
 import torch
-from typing import Callable, Optional, Dict, Any
+from typing import Callable, Optional, Dict, Any, List, Tuple
+from ..utils.checkpoint_writer import CheckpointWriter, load_tensors
+from ..utils.tensor_store import TensorStore
+from ..evaluation.holdout import HoldoutEvaluator, primary_metric
 from .curriculum import CurriculumSchedule
-from .losses import token_lm_loss, concept_prediction_loss, hypercube_transition_regularizer
+from .losses import token_lm_loss, chunked_token_lm_loss, concept_prediction_loss, hypercube_transition_regularizer, soft_transition_regularizer
 
 CHECKPOINT_DIR = "distill_checkpoints"
 os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+TRAINING_STATE_VERSION = 1
+
+
+def _rng_state() -> Dict[str, Any]:
+    # numpy's key array as a tensor, so the state file loads with weights_only=True
+    name, key, pos, has_gauss, gauss = np.random.get_state()
+    state = {"torch": torch.get_rng_state(), "python": random.getstate(),
+             "numpy": (name, torch.from_numpy(key.astype(np.int64)), pos, has_gauss, gauss)}
+    if torch.cuda.is_available():
+        state["cuda"] = torch.cuda.get_rng_state_all()
+    return state
+
+
+def _set_rng_state(state: Dict[str, Any]):
+    torch.set_rng_state(state["torch"])
+    random.setstate(state["python"])
+    name, key, pos, has_gauss, gauss = state["numpy"]
+    np.random.set_state((name, key.numpy().astype(np.uint32), pos, has_gauss, gauss))
+    if "cuda" in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state["cuda"])
+
+
+def _stateful(dataloader):
+    """The object holding the epoch order: the loader itself or a torch DataLoader's batch_sampler."""
+    for obj in (dataloader, getattr(dataloader, "batch_sampler", None)):
+        if hasattr(obj, "state_dict") and hasattr(obj, "load_state_dict"):
+            return obj
+    return None
+
+
+def _loader_state(dataloader):
+    obj = _stateful(dataloader)
+    return obj.state_dict() if obj is not None else None
+
+
+def _record_scores(record: Dict[int, Tuple[float, int]], scores: Optional[List[float]],
+                   epoch: int) -> Dict[int, Tuple[float, int]]:
+    """record updated with the per-sample scores of the evaluation after `epoch` (samples 0..len-1)."""
+    record = dict(record)
+    for i, score in enumerate(scores or []):
+        record[i] = (float(score), epoch)
+    return record
+
+
+def _latest_scores(record: Dict[int, Tuple[float, int]]) -> List[float]:
+    """The scores of the newest evaluation in record, in holdout order; older (stale) ones are left out."""
+    if not record:
+        return []
+    newest = max(epoch for _, epoch in record.values())
+    scores = []
+    while len(scores) in record and record[len(scores)][1] == newest:
+        scores.append(record[len(scores)][0])
+    return scores
 
 
 class Distiller:
@@ -37,118 +99,375 @@ class Distiller:
         holdout_dataset=None,
         device: Optional[torch.device] = None,
         max_metric_drop: float = 0.10,
+        kd_temperature: float = 1.0,
+        kd_top_k: Optional[int] = None,
+        loss_chunk_size: Optional[int] = 64,
+        precision: str = "fp32",
+        grad_accum_steps: int = 1,
+        gradient_checkpointing: bool = False,
+        state_every_n_steps: Optional[int] = None,
+        checkpoint_writer: Optional[CheckpointWriter] = None,
+        checkpoint_store: Optional[TensorStore] = None,
+        holdout_batch_size: int = 8,
+        holdout_workers: int = 0,
+        max_holdout_samples: Optional[int] = 20,
+        holdout_alpha: Optional[float] = None,
     ):
+        """
+        kd_temperature / kd_top_k: token KD temperature and the number of teacher logits
+            kept per position (None = all).
+        loss_chunk_size: positions per chunk of the token KD + CE loss
+            (chunked_token_lm_loss); None uses the dense token_lm_loss.
+        precision: "fp32" or "bf16" (student forward and loss under autocast; the teacher
+            forward, parameters, gradients and optimizer state stay fp32, so no loss scaling).
+        grad_accum_steps: batches per optimizer step; each loss is scaled by 1 / (batches
+            in its window), and a partial window at the end of an epoch is stepped too.
+        gradient_checkpointing: recompute student activations in backward (the student
+            or a submodule must expose gradient_checkpointing_enable()).
+        state_every_n_steps: also save_training_state() every N optimizer steps.
+        checkpoint_writer: background writer for checkpoints and training state (default:
+            one owned by this Distiller, stopped by close()).
+        checkpoint_store: write student checkpoints as manifests of content-addressed
+            tensor blobs, so a checkpoint costs only the tensors changed since the last one.
+        holdout_batch_size / holdout_workers / max_holdout_samples: holdout generation
+            batch, scoring pool size and samples per evaluation (HoldoutEvaluator).
+        holdout_alpha: error rate of the sequential test that stops an end-of-epoch
+            holdout evaluation early (None = always score max_holdout_samples).
+        Batches from teacher_cache.TeacherCacheLoader carry the teacher outputs under
+        batch["teacher"], and the teacher forward is skipped for them.
+        """
         self.teacher = teacher
         self.student = student
         self.optimizer = optimizer
         self.curriculum = curriculum or CurriculumSchedule()
         self.evaluator = evaluator
         self.holdout = holdout_dataset
+        self.holdout_evaluator = HoldoutEvaluator(evaluator, batch_size=holdout_batch_size, workers=holdout_workers,
+                                                  max_samples=max_holdout_samples,
+                                                  min_samples=min(16, max_holdout_samples or 16),
+                                                  alpha=holdout_alpha) if evaluator is not None else None
+        self.last_holdout: Dict[str, Any] = {}
         self.device = device or (torch.device("cuda") if torch.cuda.is_available() else torch.device("cpu"))
         self.student.to(self.device)
         self.max_metric_drop = max_metric_drop
+        self.kd_temperature = kd_temperature
+        self.kd_top_k = kd_top_k
+        self.loss_chunk_size = loss_chunk_size
+        if precision not in ("fp32", "bf16"):
+            raise ValueError(f"precision must be 'fp32' or 'bf16', got {precision!r}")
+        if grad_accum_steps < 1:
+            raise ValueError("grad_accum_steps must be >= 1")
+        self.precision = precision
+        self.grad_accum_steps = grad_accum_steps
+        if gradient_checkpointing:
+            self._enable_gradient_checkpointing()
+        self.state_every_n_steps = state_every_n_steps
+        self.global_step = 0
+        self._run: Dict[str, Any] = {}
+        self._dataloader = None
+        # a writer passed in is shared with its owner, which closes it
+        self._owns_writer = checkpoint_writer is None
+        self.writer = checkpoint_writer or CheckpointWriter()
+        self.checkpoint_store = checkpoint_store
         self.best_prod_ckpt = None
         self.audit_log_path = os.path.join(CHECKPOINT_DIR, "audit.logl")
+        self.training_state_path = os.path.join(CHECKPOINT_DIR, "training_state.pt")
+
+    def close(self):
+        """
+        Flush queued checkpoint writes, then stop the threads this Distiller started:
+        its own CheckpointWriter (not one passed as checkpoint_writer=) and the
+        holdout scoring pool.
+        """
+        try:
+            self.writer.flush()
+        finally:
+            if self._owns_writer:
+                self.writer.close()
+            if self.holdout_evaluator is not None:
+                self.holdout_evaluator.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _enable_gradient_checkpointing(self):
+        for module in self.student.modules():
+            if hasattr(module, "gradient_checkpointing_enable"):
+                module.gradient_checkpointing_enable()
+                return
+        raise ValueError("gradient_checkpointing needs a student module with gradient_checkpointing_enable()")
+
+    def _autocast(self):
+        return torch.autocast(device_type=self.device.type, dtype=torch.bfloat16, enabled=self.precision == "bf16")
+
+    def _token_loss(self, student_logits, tea_out, labels):
+        vocab_ids = getattr(self.student, "vocab_ids", None)
+        if vocab_ids is not None:
+            # restricted-vocabulary student (student.build_student(vocab_ids=...)): compare on its ids
+            if "topk_vals" in tea_out:
+                raise ValueError("cached top-k teacher outputs need a student with the full vocabulary")
+            tea_out = {"logits": tea_out["logits"].index_select(-1, vocab_ids)}
+            labels = self.student.map_labels(labels) if labels is not None else None
+        if "topk_vals" in tea_out:
+            return chunked_token_lm_loss(student_logits, labels=labels, temperature=self.kd_temperature,
+                                         chunk_size=self.loss_chunk_size or student_logits.shape[1],
+                                         teacher_topk=(tea_out["topk_vals"], tea_out["topk_idx"]))
+        teacher_logits = tea_out["logits"]
+        if self.loss_chunk_size is None and self.kd_top_k is None and self.kd_temperature == 1.0:
+            return token_lm_loss(student_logits, teacher_logits, labels=labels)
+        return chunked_token_lm_loss(student_logits, teacher_logits, labels=labels, temperature=self.kd_temperature,
+                                     top_k=self.kd_top_k, chunk_size=self.loss_chunk_size or student_logits.shape[1])
+
+    def _combined_loss(self, stu_out, tea_out, batch, stage_name: str) -> torch.Tensor:
+        loss = torch.tensor(0.0, device=self.device)
+        if ("logits" in tea_out or "topk_vals" in tea_out) and "logits" in stu_out:
+            loss = loss + self._token_loss(stu_out["logits"], tea_out, batch.get("labels", None))
+        if "concepts" in tea_out and "concepts" in stu_out:
+            loss = loss + concept_prediction_loss(stu_out["concepts"], tea_out["concepts"])
+        if "vertex_bit_logits" in stu_out:
+            penalty = soft_transition_regularizer(torch.sigmoid(stu_out["vertex_bit_logits"].float()), allow_multi_bit=(stage_name=="constrained_pip_tasks"))
+            loss = loss + penalty * 0.1
+        elif "vertex_preds" in stu_out and "vertex_preds" in tea_out:
+            penalty = hypercube_transition_regularizer(stu_out["vertex_preds"], allow_multi_bit=(stage_name=="constrained_pip_tasks"))
+            loss = loss + penalty * 0.1
+        return loss
+
+    def _optimizer_step(self):
+        # clip grads to avoid runaway drift; once per step, on the accumulated gradients
+        torch.nn.utils.clip_grad_norm_(self.student.parameters(), max_norm=1.0)
+        self.optimizer.step()
+        self.optimizer.zero_grad()
+        self.global_step += 1
+
+    def _checkpoint_path(self, name: str) -> str:
+        if self.checkpoint_store is not None:
+            return self.checkpoint_store.manifest_path(name)
+        return os.path.join(CHECKPOINT_DIR, f"{name}.safetensors")
 
     def _save_checkpoint(self, name: str, experimental: bool = False):
-        path = os.path.join(CHECKPOINT_DIR, f"{name}.pt")
-        torch.save({"student_state": self.student.state_dict(), "meta": {"ts": int(time.time()), "experimental": experimental}}, path)
+        path = self._checkpoint_path(name)
+        ts = int(time.time())
+        meta = {"ts": ts, "experimental": experimental}
+        audit = (self.audit_log_path, f"CKPT_SAVE {path} experimental={experimental} ts={ts}")
+        if self.checkpoint_store is not None:
+            self.checkpoint_store.put(name, self.student.state_dict(), metadata=meta, writer=self.writer, audit=audit)
+        else:
+            self.writer.save_tensors(self.student.state_dict(), path, metadata=meta, audit=audit)
         # track production best
         if not experimental:
             self.best_prod_ckpt = path
-        with open(self.audit_log_path, "a") as f:
-            f.write(f"CKPT_SAVE {path} experimental={experimental} ts={int(time.time())}\n")
         return path
 
+    def _load_student(self, path: str):
+        if path.endswith(".json"):  # TensorStore manifest: <root>/manifests/<name>.json
+            store = self.checkpoint_store or TensorStore(os.path.dirname(os.path.dirname(path)))
+            state, _ = store.get(path, device=str(self.device))
+        elif path.endswith(".safetensors"):
+            state = load_tensors(path, device=str(self.device))
+        else:  # checkpoints from before the safetensors format
+            state = torch.load(path, map_location=self.device)["student_state"]
+        self.student.load_state_dict(state)
+        self.optimizer.zero_grad()
+
+    def _audit(self, line: str):
+        self.writer.append_line(self.audit_log_path, line)
+
     def _rollback_to(self, path: str):
+        self.writer.flush()
         if not os.path.exists(path):
             return False
-        data = torch.load(path, map_location=self.device)
-        self.student.load_state_dict(data["student_state"])
-        with open(self.audit_log_path, "a") as f:
-            f.write(f"CKPT_ROLLBACK {path} ts={int(time.time())}\n")
+        self._load_student(path)
+        self._audit(f"CKPT_ROLLBACK {path} ts={int(time.time())}")
         return True
 
-    def evaluate_holdout(self) -> Dict[str, float]:
+    def save_training_state(self, path: Optional[str] = None, epoch: int = 0, batches_done: int = 0,
+                            epoch_start: Optional[Dict[str, Any]] = None) -> str:
         """
-        Run evaluator over holdout if provided. Evaluator callable returns dict with metric names.
-        For simplicity run single sample or aggregated.
+        Everything needed to continue the run: epoch and batches_done locate the loop;
+        epoch_start holds the RNG and loader state from the start of that epoch.
+        The file holds only tensors and plain containers (loader state_dict()s must be
+        plain too), so load_training_state() reads it with weights_only=True.
         """
-        if self.evaluator is None or self.holdout is None:
-            return {}
-        # simple aggregate over holdout items
-        acc = {}
-        n = 0
-        for sample in self.holdout:
-            prompt = sample.get("prompt", "")
-            reference = sample.get("reference", "")
-            # teacher/student generate texts via provided callables
-            with torch.no_grad():
-                student_out = self.student.generate(prompt) if hasattr(self.student, "generate") else ""
-            metrics = self.evaluator(student_out, reference)
-            for k, v in metrics.items():
-                acc[k] = acc.get(k, 0.0) + v
-            n += 1
-            if n >= 20:
-                break
-        if n == 0:
+        path = path or self.training_state_path
+        state = {
+            "version": TRAINING_STATE_VERSION,
+            "student_state": self.student.state_dict(),
+            "optimizer_state": self.optimizer.state_dict(),
+            "curriculum": {"current_idx": self.curriculum.current_idx,
+                           "completed": [st.completed for st in self.curriculum.stages]},
+            "rng": _rng_state(),
+            "progress": {"epoch": epoch, "batches_done": batches_done, "global_step": self.global_step},
+            "epoch_start": epoch_start,
+            "loader": _loader_state(self._dataloader),
+            "run": dict(self._run, best_prod_ckpt=self.best_prod_ckpt),
+            "meta": {"ts": int(time.time())},
+        }
+        self.writer.save_object(state, path, audit=(
+            self.audit_log_path, f"STATE_SAVE {path} epoch={epoch} batch={batches_done} step={self.global_step} ts={int(time.time())}"))
+        return path
+
+    def load_training_state(self, path: Optional[str] = None) -> Dict[str, Any]:
+        """Restore model, optimizer, curriculum and RNG from save_training_state(); returns the raw state."""
+        path = path or self.training_state_path
+        self.writer.flush()
+        state = torch.load(path, map_location=self.device, weights_only=True)
+        version = state.get("version") if isinstance(state, dict) else None
+        if version is None:
+            raise ValueError(f"{path} is not a training-state checkpoint")
+        if version > TRAINING_STATE_VERSION:
+            raise ValueError(f"{path} has training-state version {version}, newer than {TRAINING_STATE_VERSION}")
+        self.student.load_state_dict(state["student_state"])
+        self.optimizer.load_state_dict(state["optimizer_state"])
+        self.curriculum.current_idx = state["curriculum"]["current_idx"]
+        for st, completed in zip(self.curriculum.stages, state["curriculum"]["completed"]):
+            st.completed = completed
+        _set_rng_state(state["rng"])
+        self.global_step = state["progress"]["global_step"]
+        self.best_prod_ckpt = state["run"].get("best_prod_ckpt")
+        return state
+
+    def evaluate_holdout(self, baseline: Optional[list] = None) -> Dict[str, float]:
+        """
+        Mean evaluator metrics of the student over the holdout ({} without evaluator or holdout).
+        Generation runs in batches of holdout_batch_size and scoring in a pool of
+        holdout_workers while the next batch generates; evaluator.prepare() results are
+        cached per reference.
+        baseline: per-sample primary-metric scores of an earlier evaluation (last_holdout["scores"]);
+            with holdout_alpha the evaluation stops once the drop against it is decided.
+        The per-sample scores and the early-stop decision are kept in self.last_holdout.
+        """
+        if self.holdout_evaluator is None or self.holdout is None:
+            self.last_holdout = {}
             return {}
-        for k in acc:
-            acc[k] /= n
-        return acc
+        self.last_holdout = self.holdout_evaluator.evaluate(self.student, self.holdout, baseline=baseline,
+                                                            max_drop=self.max_metric_drop)
+        return self.last_holdout["metrics"]
 
-    def run_distillation(self, dataloader, epochs: int = 1, experimental_stage: bool = False):
+    def run_distillation(self, dataloader, epochs: int = 1, experimental_stage: bool = False,
+                         resume_from: Optional[str] = None):
         """
         Main loop: iterate curriculum, perform distillation per batch.
         dataloader yields dicts with fields acceptable by teacher/student, e.g.:
             {"input_ids": Tensor, "labels": Tensor}
+        where labels[:, t] is the target of logits[:, t] (the next token, -100 =
+        ignored; losses.next_token_labels builds them from input_ids).
+        resume_from: a save_training_state() file; epochs and experimental_stage then
+            come from the saved run and the dataloader must yield the same batches. The
+            interrupted epoch replays its batch order (epoch-start RNG and loader state)
+            and skips the batches already trained on.
+        Training state is saved at the end of every epoch (and every state_every_n_steps).
+        Checkpoint I/O goes through the background writer, which is flushed before this
+        returns or raises; rollbacks flush it before reading.
         """
-        # Save pre-distill checkpoint for rollback safety
-        pre_path = self._save_checkpoint("pre_distill", experimental=False)
-        prod_metrics_before = self.evaluate_holdout() or {}
-        for epoch in range(epochs):
+        try:
+            return self._run_distillation(dataloader, epochs, experimental_stage, resume_from)
+        finally:
+            # checkpoints queued before an error still land on disk
+            self.writer.flush()
+
+    def _run_distillation(self, dataloader, epochs: int, experimental_stage: bool, resume_from: Optional[str]):
+        start_epoch, skip, epoch_start = 0, 0, None
+        if resume_from is not None:
+            state = self.load_training_state(resume_from)
+            run = state["run"]
+            epochs, experimental_stage = run["epochs"], run["experimental_stage"]
+            pre_path, prod_metrics_before = run["pre_path"], run["prod_metrics_before"]
+            holdout_before = run.get("holdout_before") or {}
+            start_epoch, skip = state["progress"]["epoch"], state["progress"]["batches_done"]
+            epoch_start = state["epoch_start"]
+            if state["loader"] is not None:
+                _stateful(dataloader).load_state_dict(state["loader"])
+            self._audit(f"STATE_RESUME {resume_from} epoch={start_epoch} batch={skip} ts={int(time.time())}")
+        else:
+            # Save pre-distill checkpoint for rollback safety
+            pre_path = self._save_checkpoint("pre_distill", experimental=False)
+            prod_metrics_before = self.evaluate_holdout() or {}
+            # per-sample primary-metric scores: holdout index -> (score, epoch it was scored after)
+            holdout_before = _record_scores({}, self.last_holdout.get("scores"), epoch=-1)
+        self._dataloader = dataloader
+        self._run = {"epochs": epochs, "experimental_stage": experimental_stage, "pre_path": pre_path,
+                     "prod_metrics_before": prod_metrics_before, "holdout_before": holdout_before}
+        if resume_from is not None and not skip and self.curriculum.is_finished():
+            return {"rolled_back": False}
+        for epoch in range(start_epoch, epochs):
             stage_name = self.curriculum.current_stage().name
-            for batch in dataloader:
+            try:
+                n_batches = len(dataloader)
+            except TypeError:
+                n_batches = None
+            if skip:
+                # replay the interrupted epoch's batch order, then continue from the saved RNG
+                resumed_rng = _rng_state()
+                _set_rng_state(epoch_start["rng"])
+                if epoch_start["loader"] is not None:
+                    _stateful(dataloader).load_state_dict(epoch_start["loader"])
+                batches = iter(dataloader)
+                # consumed eagerly: samplers draw their shuffle seed on the first next()
+                for _ in itertools.islice(batches, skip):
+                    pass
+                _set_rng_state(resumed_rng)
+            else:
+                epoch_start = {"rng": _rng_state(), "loader": _loader_state(dataloader)}
+                batches = iter(dataloader)
+            pending = 0
+            self.optimizer.zero_grad()
+            for i, batch in enumerate(batches, start=skip):
                 self.student.train()
                 # move tensors to device
                 batch = {k: (v.to(self.device) if torch.is_tensor(v) else v) for k, v in batch.items()}
-                # teacher forward
-                with torch.no_grad():
-                    tea_out = self.teacher(batch)
-                stu_out = self.student(batch)
-                # combined loss
-                loss = torch.tensor(0.0, device=self.device)
-                if "logits" in tea_out and "logits" in stu_out:
-                    loss = loss + token_lm_loss(stu_out["logits"], tea_out["logits"], labels=batch.get("labels", None))
-                if "concepts" in tea_out and "concepts" in stu_out:
-                    loss = loss + concept_prediction_loss(stu_out["concepts"], tea_out["concepts"])
-                if "vertex_preds" in stu_out and "vertex_preds" in tea_out:
-                    penalty = hypercube_transition_regularizer(stu_out["vertex_preds"], allow_multi_bit=(stage_name=="constrained_pip_tasks"))
-                    loss = loss + penalty * 0.1
-                # step
-                self.optimizer.zero_grad()
-                loss.backward()
-                # clip grads to avoid runaway drift
-                torch.nn.utils.clip_grad_norm_(self.student.parameters(), max_norm=1.0)
-                self.optimizer.step()
+                # teacher forward, unless the batch carries cached teacher outputs; kept
+                # outside the autocast so the KD targets are not rounded to bf16
+                if "teacher" in batch:
+                    tea_out = {k: v.to(self.device) for k, v in batch.pop("teacher").items()}
+                else:
+                    with torch.no_grad():
+                        tea_out = self.teacher(batch)
+                with self._autocast():
+                    stu_out = self.student(batch)
+                    loss = self._combined_loss(stu_out, tea_out, batch, stage_name)
+                # accumulate: scale by the size of this batch's accumulation window
+                window_start = i - i % self.grad_accum_steps
+                window = self.grad_accum_steps if n_batches is None else min(self.grad_accum_steps, n_batches - window_start)
+                (loss / window).backward()
+                pending += 1
+                if pending == window:
+                    self._optimizer_step()
+                    pending = 0
+                    if self.state_every_n_steps and self.global_step % self.state_every_n_steps == 0:
+                        self.save_training_state(epoch=epoch, batches_done=i + 1, epoch_start=epoch_start)
+            skip = 0
+            if pending:
+                self._optimizer_step()
             # epoch finished
             self.curriculum.step_epoch()
             # checkpoint experimental vs production separation
             ckpt_name = f"epoch_{epoch}_{stage_name}_{'exp' if experimental_stage else 'prod'}"
             self._save_checkpoint(ckpt_name, experimental=experimental_stage)
             # evaluate holdout and enforce rollback if drop too large
-            prod_metrics_after = self.evaluate_holdout() or {}
+            baseline = _latest_scores(holdout_before)
+            prod_metrics_after = self.evaluate_holdout(baseline=baseline or None) or {}
+            scores = self.last_holdout.get("scores") or []
             if prod_metrics_before and prod_metrics_after:
                 # compare a primary metric 'coherence' or fallback to first metric
-                key = "coherence" if "coherence" in prod_metrics_before else list(prod_metrics_before.keys())[0]
+                key = primary_metric(prod_metrics_before)
                 before = prod_metrics_before.get(key, 0.0)
                 after = prod_metrics_after.get(key, 0.0)
+                n = min(len(baseline), len(scores))
+                if n:
+                    # either evaluation may have stopped early: compare on the samples both scored
+                    before, after = float(np.mean(baseline[:n])), float(np.mean(scores[:n]))
                 drop = (before - after) / max(1e-9, before) if before > 0 else 0.0
                 if drop > self.max_metric_drop:
                     # rollback to pre-distill
                     self._rollback_to(pre_path)
                     return {"rolled_back": True, "reason": f"metric_drop_{drop:.3f}"}
             prod_metrics_before = prod_metrics_after
+            holdout_before = _record_scores(holdout_before, scores, epoch)
+            self._run["prod_metrics_before"] = prod_metrics_before
+            self._run["holdout_before"] = holdout_before
             # staged gating: only allow PIP stage if previous stages satisfied minimal metrics
             if stage_name == "long_form_chaining":
                 # check baseline coherence/factuality thresholds before enabling PIP
@@ -159,6 +478,7 @@ class Distiller:
                     # enforce rollback and abort PIP stage
                     self._rollback_to(pre_path)
                     return {"rolled_back": True, "reason": "pre_PIP_threshold_failed", "metrics": metrics}
+            self.save_training_state(epoch=epoch + 1)
             # continue until curriculum finished or epochs consumed
             if self.curriculum.is_finished():
                 break
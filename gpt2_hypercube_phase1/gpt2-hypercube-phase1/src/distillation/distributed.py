@@ -0,0 +1,176 @@
+"""
+Data-parallel distillation over local processes (torch.distributed, gloo backend).
+
+- launch(worker, world_size, args): spawns world_size processes, initialises the
+  gloo process group in each and calls worker(rank, world_size, *args); intra-op
+  threads are split evenly between the processes
+- DistributedDistiller: a Distiller for one rank
+  * the dataloader is sharded round-robin by batch (rank r takes batches r, r + N, ...);
+    the last len(dataloader) % N batches are dropped so every rank steps equally often.
+    Rank 0's loader state and a seed for the epoch's torch RNG draws are broadcast
+    before every epoch, so all ranks split the same order; a torch DataLoader is split
+    on its sampler's indices, so a rank only loads and collates its own batches
+  * gradients are all-reduced (averaged) as one flat buffer before clipping and the
+    optimizer step, so N ranks with grad_accum_steps=k match one process with
+    grad_accum_steps=N*k
+  * student parameters and curriculum state are broadcast from rank 0 at start; with
+    resume_from, every rank restores the same training-state file written by rank 0
+    (student, optimizer, curriculum, RNG and its shard's position)
+  * rank 0 alone writes checkpoints, training state, the audit log and runs holdout evaluation; its
+    metrics are broadcast so every rank takes the same rollback decisions, and
+    every rank loads the rollback checkpoint
+"""
+from typing import Callable, Dict, Iterator, Optional
+import itertools
+import os
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+from torch._utils import _flatten_dense_tensors, _unflatten_dense_tensors
+from torch.utils.data import DataLoader, IterableDataset
+
+from .distiller import Distiller, _loader_state, _stateful
+
+
+def _entry(rank: int, worker: Callable, world_size: int, port: int, threads: int, args: tuple):
+    os.environ["MASTER_ADDR"] = "127.0.0.1"
+    os.environ["MASTER_PORT"] = str(port)
+    torch.set_num_threads(threads)
+    dist.init_process_group("gloo", rank=rank, world_size=world_size)
+    try:
+        worker(rank, world_size, *args)
+    finally:
+        dist.destroy_process_group()
+
+
+def launch(worker: Callable, world_size: int, args: tuple = (), port: int = 29517):
+    """Run worker(rank, world_size, *args) in world_size local processes; worker must be picklable."""
+    threads = max(1, torch.get_num_threads() // world_size)
+    mp.spawn(_entry, args=(worker, world_size, port, threads, args), nprocs=world_size, join=True)
+
+
+class _RankShard:
+    def __init__(self, dataloader, rank: int, world_size: int):
+        self.dataloader = dataloader
+        self.rank = rank
+        self.world_size = world_size
+
+    def __len__(self) -> int:
+        return len(self.dataloader) // self.world_size
+
+    def __iter__(self) -> Iterator:
+        # every rank draws, so their RNG streams stay in step; rank 0's values win
+        shared = [int(torch.randint(2 ** 62, ()).item()), _loader_state(self.dataloader)]
+        dist.broadcast_object_list(shared, src=0)
+        seed, state = shared
+        self.load_state_dict(state)
+        stop = len(self) * self.world_size
+        loader = self.dataloader
+        if not isinstance(loader, DataLoader) or isinstance(loader.dataset, IterableDataset):
+            # batches come out whole: iterate them all and keep this rank's
+            return itertools.islice(iter(loader), self.rank, stop, self.world_size)
+        batched = loader.batch_sampler is not None
+        with torch.random.fork_rng(devices=[]):
+            torch.manual_seed(seed)
+            mine = list(itertools.islice(iter(loader.batch_sampler if batched else loader.sampler),
+                                         self.rank, stop, self.world_size))
+        options = dict(collate_fn=loader.collate_fn, num_workers=loader.num_workers, pin_memory=loader.pin_memory,
+                       timeout=loader.timeout, worker_init_fn=loader.worker_init_fn)
+        if loader.num_workers:
+            options["prefetch_factor"] = loader.prefetch_factor
+        if batched:
+            return iter(DataLoader(loader.dataset, batch_sampler=mine, **options))
+        return iter(DataLoader(loader.dataset, sampler=mine, batch_size=None, **options))
+
+    def state_dict(self):
+        return _loader_state(self.dataloader)
+
+    def load_state_dict(self, state):
+        if state is not None:
+            _stateful(self.dataloader).load_state_dict(state)
+
+
+class DistributedDistiller(Distiller):
+    def __init__(self, *args, **kwargs):
+        """Same arguments as Distiller; torch.distributed must already be initialised."""
+        if not dist.is_initialized():
+            raise ValueError("DistributedDistiller needs an initialised process group (see launch())")
+        self.rank = dist.get_rank()
+        self.world_size = dist.get_world_size()
+        super().__init__(*args, **kwargs)
+        for p in self.student.state_dict().values():
+            dist.broadcast(p, src=0)
+
+    @property
+    def is_main(self) -> bool:
+        return self.rank == 0
+
+    def _broadcast_curriculum(self):
+        state = [[self.curriculum.current_idx, [st.completed for st in self.curriculum.stages]]]
+        dist.broadcast_object_list(state, src=0)
+        self.curriculum.current_idx, completed = state[0]
+        for st, c in zip(self.curriculum.stages, completed):
+            st.completed = c
+
+    def _optimizer_step(self):
+        grads = [p.grad for p in self.student.parameters() if p.grad is not None]
+        if grads:
+            flat = _flatten_dense_tensors(grads)
+            dist.all_reduce(flat)
+            flat /= self.world_size
+            for g, reduced in zip(grads, _unflatten_dense_tensors(flat, grads)):
+                g.copy_(reduced)
+        super()._optimizer_step()
+
+    def _save_checkpoint(self, name: str, experimental: bool = False):
+        if self.is_main:
+            return super()._save_checkpoint(name, experimental=experimental)
+        path = self._checkpoint_path(name)
+        if not experimental:
+            self.best_prod_ckpt = path
+        return path
+
+    def save_training_state(self, path=None, epoch: int = 0, batches_done: int = 0, epoch_start=None):
+        path = path or self.training_state_path
+        if self.is_main:
+            super().save_training_state(path, epoch=epoch, batches_done=batches_done, epoch_start=epoch_start)
+        return path
+
+    def _audit(self, line: str):
+        if self.is_main:
+            super()._audit(line)
+
+    def _rollback_to(self, path: str):
+        # rank 0's queued checkpoint writes must land before any rank reads
+        if self.is_main:
+            self.writer.flush()
+        dist.barrier()
+        if self.is_main:
+            return super()._rollback_to(path)
+        if not os.path.exists(path):
+            return False
+        self._load_student(path)
+        return True
+
+    def evaluate_holdout(self, baseline=None) -> Dict[str, float]:
+        result = [(super().evaluate_holdout(baseline), self.last_holdout) if self.is_main else None]
+        dist.broadcast_object_list(result, src=0)
+        metrics, self.last_holdout = result[0]
+        return metrics
+
+    def run_distillation(self, dataloader, epochs: int = 1, experimental_stage: bool = False,
+                         resume_from: Optional[str] = None):
+        """
+        Distiller.run_distillation on this rank's shard of dataloader (which must have a length).
+        resume_from: a training-state file of rank 0; every rank loads it, so all of them
+            continue from the same student, optimizer, RNG and batch position.
+        """
+        if resume_from is None:
+            self._broadcast_curriculum()
+        else:
+            # the file may still be queued on rank 0's writer
+            if self.is_main:
+                self.writer.flush()
+            dist.barrier()
+        return super().run_distillation(_RankShard(dataloader, self.rank, self.world_size), epochs=epochs,
+                                        experimental_stage=experimental_stage, resume_from=resume_from)
@@ -0,0 +1,145 @@
+"""
+Length-bucketed, token-budget batching for unpacked (padded) training data.
+
+- TokenBudgetSampler: a batch sampler over a flat dataset whose examples carry a
+  length and a curriculum stage name
+  * every epoch draws examples per stage by the curriculum's mixing weights
+    (CurriculumSchedule.mixing_weights(), or fixed weights=)
+  * examples are grouped into geometric length buckets (lengths within a bucket
+    differ by at most a factor bucket_growth), so batches hold similar lengths
+  * batches are filled up to max_tokens of padded tokens (batch size x longest
+    example) instead of a fixed example count: many short definitions or a few
+    long chaining samples per batch
+  * the batch order is shuffled; everything is a function of (seed, epoch), with
+    state_dict()/load_state_dict() for resume (Distiller also finds the state on
+    DataLoader(batch_sampler=...))
+- PadCollator: pads input_ids to the batch's longest example; labels are the next
+  token of every position (losses.next_token_labels), -100 at the end and on padding
+"""
+from typing import Dict, Iterator, List, Optional, Sequence
+import numpy as np
+import torch
+
+from .losses import next_token_labels
+
+
+class TokenBudgetSampler:
+    def __init__(self, lengths: Sequence[int], stages: Sequence[str], max_tokens: int = 4096, curriculum=None,
+                 weights: Optional[Dict[str, float]] = None, samples_per_epoch: Optional[int] = None,
+                 bucket_growth: float = 1.1, max_batch_size: Optional[int] = None, shuffle: bool = True,
+                 seed: int = 0):
+        """
+        lengths, stages: token count and stage name of every example in the dataset.
+        weights: fixed stage -> weight; otherwise the curriculum's current mixing weights
+            (without either, every example is used once per epoch).
+        samples_per_epoch: examples drawn per epoch (default: the examples of all
+            stages with a positive weight); a stage drawn more often than it has
+            examples is cycled through again.
+        """
+        if len(lengths) != len(stages):
+            raise ValueError(f"{len(lengths)} lengths but {len(stages)} stage names")
+        if bucket_growth <= 1:
+            raise ValueError("bucket_growth must be > 1")
+        self.lengths = np.maximum(np.asarray(lengths, dtype=np.int64), 1)
+        names = np.asarray(stages)
+        self.by_stage = {name: np.flatnonzero(names == name) for name in dict.fromkeys(stages)}
+        self.buckets = np.floor(np.log(self.lengths) / np.log(bucket_growth)).astype(np.int64)
+        self.max_tokens = max_tokens
+        self.curriculum = curriculum
+        self.weights = weights
+        self.samples_per_epoch = samples_per_epoch
+        self.max_batch_size = max_batch_size
+        self.shuffle = shuffle
+        self.seed = seed
+        self.epoch = 0
+        self._cache = None
+
+    def current_weights(self) -> Optional[Dict[str, float]]:
+        weights = self.weights
+        if weights is None and self.curriculum is not None:
+            weights = self.curriculum.mixing_weights()
+        if weights is None:
+            return None
+        unknown = set(weights) - set(self.by_stage)
+        if unknown:
+            raise ValueError(f"no examples for stages {sorted(unknown)}")
+        total = sum(weights.values())
+        return {name: w / total for name, w in weights.items() if w > 0}
+
+    def _draw(self, rng: np.random.Generator, weights: Optional[Dict[str, float]]) -> np.ndarray:
+        if weights is None:
+            return np.arange(len(self.lengths))
+        n = self.samples_per_epoch or sum(len(self.by_stage[name]) for name in weights)
+        # largest-remainder rounding, so the per-stage counts add up to n
+        quota = {name: n * w for name, w in weights.items()}
+        counts = {name: int(q) for name, q in quota.items()}
+        for name in sorted(quota, key=lambda k: counts[k] - quota[k])[:n - sum(counts.values())]:
+            counts[name] += 1
+        drawn = []
+        for name, count in counts.items():
+            pool = self.by_stage[name]
+            reps = -(-count // len(pool)) if count else 0
+            order = np.concatenate([rng.permutation(pool) if self.shuffle else pool for _ in range(reps)])
+            drawn.append(order[:count])
+        return np.concatenate(drawn) if drawn else np.zeros(0, dtype=np.int64)
+
+    def _batches(self, epoch: int, weights: Optional[Dict[str, float]]) -> List[List[int]]:
+        rng = np.random.default_rng((self.seed, epoch))
+        drawn = self._draw(rng, weights)
+        if self.shuffle:
+            drawn = rng.permutation(drawn)
+        # stable sort keeps the shuffled order inside each bucket
+        drawn = drawn[np.argsort(self.buckets[drawn], kind="stable")]
+        batches, batch, longest, bucket = [], [], 0, None
+        for i in drawn.tolist():
+            length = int(self.lengths[i])
+            full = (max(longest, length) * (len(batch) + 1) > self.max_tokens
+                    or (self.max_batch_size is not None and len(batch) >= self.max_batch_size))
+            if batch and (self.buckets[i] != bucket or full):
+                batches.append(batch)
+                batch, longest = [], 0
+            batch.append(i)
+            longest, bucket = max(longest, length), self.buckets[i]
+        if batch:
+            batches.append(batch)
+        if self.shuffle:
+            batches = [batches[j] for j in rng.permutation(len(batches))]
+        return batches
+
+    def _plan(self, epoch: int) -> List[List[int]]:
+        weights = self.current_weights()
+        key = (epoch, self.seed, None if weights is None else tuple(sorted(weights.items())))
+        if self._cache is None or self._cache[0] != key:
+            self._cache = (key, self._batches(epoch, weights))
+        return self._cache[1]
+
+    def __len__(self) -> int:
+        return len(self._plan(self.epoch))
+
+    def state_dict(self) -> Dict:
+        return {"epoch": self.epoch, "seed": self.seed}
+
+    def load_state_dict(self, state: Dict):
+        self.epoch, self.seed = state["epoch"], state["seed"]
+
+    def __iter__(self) -> Iterator[List[int]]:
+        plan = self._plan(self.epoch)
+        self.epoch += 1
+        yield from plan
+
+
+class PadCollator:
+    """Collate {"input_ids": list/tensor} examples into padded input_ids, attention_mask and labels."""
+
+    def __init__(self, pad_id: int = 0):
+        self.pad_id = pad_id
+
+    def __call__(self, examples: List[Dict]) -> Dict[str, torch.Tensor]:
+        ids = [torch.as_tensor(e["input_ids"], dtype=torch.long) for e in examples]
+        width = max(len(x) for x in ids)
+        input_ids = torch.full((len(ids), width), self.pad_id, dtype=torch.long)
+        mask = torch.zeros((len(ids), width), dtype=torch.long)
+        for row, x in enumerate(ids):
+            input_ids[row, :len(x)] = x
+            mask[row, :len(x)] = 1
+        return {"input_ids": input_ids, "attention_mask": mask, "labels": next_token_labels(input_ids, mask)}
@@ -6,10 +6,24 @@ import torch
 import torch.nn.functional as F
 
 
+def next_token_labels(input_ids: torch.Tensor, attention_mask: torch.Tensor = None) -> torch.Tensor:
+    """
+    Labels in the layout the losses below expect: labels[:, t] is the target of
+    logits[:, t], i.e. the next token input_ids[:, t + 1]. The last position, and
+    positions whose next token is padding (attention_mask 0), are -100.
+    """
+    labels = torch.full_like(input_ids, -100)
+    labels[:, :-1] = input_ids[:, 1:]
+    if attention_mask is not None:
+        labels[:, :-1].masked_fill_(attention_mask[:, 1:] == 0, -100)
+    return labels
+
+
 def token_lm_loss(student_logits: torch.Tensor, teacher_logits: torch.Tensor, labels: torch.Tensor = None):
     """
     Distillation loss between teacher and student logits (KL or MSE).
-    If labels provided, include CE.
+    If labels provided, include CE; labels[:, t] is compared with logits[:, t] as is
+    (already shifted, see next_token_labels).
     """
     # KL between teacher soft targets and student log-probs
     with torch.no_grad():
@@ -22,6 +36,93 @@ def token_lm_loss(student_logits: torch.Tensor, teacher_logits: torch.Tensor, la
     return kd_loss
 
 
+class _ChunkedDistillLoss(torch.autograd.Function):
+    """
+    KD (+ CE) over sequence slices. Forward keeps only one (batch, chunk, vocab) slice of
+    probabilities alive at a time; backward recomputes each slice and writes its
+    gradient, d/ds = T * (q - p) / batch + (softmax(s) - onehot(label)) / n_labels,
+    straight into the gradient buffer, so no full-vocabulary activations are saved.
+    """
+
+    @staticmethod
+    def _slices(student, teacher, topk_vals, topk_idx, labels, temperature, top_k, chunk):
+        # half-precision logits are upcast per slice; float64 stays float64
+        acc = torch.promote_types(student.dtype, torch.float32)
+        for a in range(0, student.shape[1], chunk):
+            b = min(a + chunk, student.shape[1])
+            s = student[:, a:b].to(acc)
+            log_q = F.log_softmax(s / temperature, dim=-1)
+            if topk_vals is not None or top_k:
+                if topk_vals is not None:
+                    vals, idx = topk_vals[:, a:b].to(acc), topk_idx[:, a:b].long()
+                else:
+                    vals, idx = teacher[:, a:b].to(acc).topk(top_k, dim=-1)
+                log_p = F.log_softmax(vals / temperature, dim=-1)
+            else:
+                idx = None
+                log_p = F.log_softmax(teacher[:, a:b].to(acc) / temperature, dim=-1)
+            lab = labels[:, a:b] if labels is not None else None
+            yield a, b, s, log_q, log_p, idx, lab
+
+    @staticmethod
+    def forward(ctx, student, teacher, topk_vals, topk_idx, labels, temperature, top_k, chunk):
+        batch = student.shape[0]
+        n_labels = int((labels != -100).sum()) if labels is not None else 0
+        acc = torch.promote_types(student.dtype, torch.float32)
+        kd = torch.zeros((), dtype=acc, device=student.device)
+        ce = torch.zeros((), dtype=acc, device=student.device)
+        for _, _, s, log_q, log_p, idx, lab in _ChunkedDistillLoss._slices(
+                student, teacher, topk_vals, topk_idx, labels, temperature, top_k, chunk):
+            q_at = log_q if idx is None else log_q.gather(-1, idx)
+            kd = kd + (log_p.exp() * (log_p - q_at)).sum()
+            if lab is not None:
+                valid = lab != -100
+                log_sm = log_q if temperature == 1.0 else F.log_softmax(s, dim=-1)
+                ce = ce - log_sm.gather(-1, lab.clamp(min=0).unsqueeze(-1)).squeeze(-1)[valid].sum()
+        ctx.save_for_backward(student, teacher, topk_vals, topk_idx, labels)
+        ctx.args = (temperature, top_k, chunk, batch, n_labels)
+        loss = kd * temperature ** 2 / batch
+        if labels is not None:
+            loss = loss + ce / max(1, n_labels)
+        return loss
+
+    @staticmethod
+    def backward(ctx, grad_output):
+        student, teacher, topk_vals, topk_idx, labels = ctx.saved_tensors
+        temperature, top_k, chunk, batch, n_labels = ctx.args
+        grad = torch.empty_like(student)
+        for a, b, s, log_q, log_p, idx, lab in _ChunkedDistillLoss._slices(
+                student, teacher, topk_vals, topk_idx, labels, temperature, top_k, chunk):
+            p = log_p.exp()
+            if idx is not None:
+                p = torch.zeros_like(log_q).scatter_(-1, idx, p)
+            g = (log_q.exp() - p) * (temperature / batch)
+            if lab is not None:
+                sm = log_q.exp() if temperature == 1.0 else F.softmax(s, dim=-1)
+                valid = (lab != -100).unsqueeze(-1).float()
+                onehot = torch.zeros_like(sm).scatter_(-1, lab.clamp(min=0).unsqueeze(-1), 1.0)
+                g = g + (sm - onehot) * valid / max(1, n_labels)
+            grad[:, a:b] = (g * grad_output).to(grad.dtype)
+        return grad, None, None, None, None, None, None, None
+
+
+def chunked_token_lm_loss(student_logits: torch.Tensor, teacher_logits: torch.Tensor = None,
+                          labels: torch.Tensor = None, temperature: float = 1.0, top_k: int = None,
+                          chunk_size: int = 64, teacher_topk=None):
+    """
+    token_lm_loss computed over `chunk_size` positions at a time, so peak memory is a few
+    (batch, chunk_size, vocab) slices instead of several full (batch, seq, vocab) tensors.
+    The KD term is scaled by temperature**2 (equal to token_lm_loss at temperature 1).
+    top_k: distill only the teacher's top-k logits, renormalized over those k tokens.
+    teacher_topk: precomputed (values, indices) of shape (batch, seq, k) instead of teacher_logits.
+    """
+    vals, idx = teacher_topk if teacher_topk is not None else (None, None)
+    if teacher_logits is not None:
+        teacher_logits = teacher_logits.detach()
+    return _ChunkedDistillLoss.apply(student_logits, teacher_logits, vals, idx, labels,
+                                     float(temperature), top_k, int(chunk_size))
+
+
 def concept_prediction_loss(student_concepts: torch.Tensor, teacher_concepts: torch.Tensor):
     """
     MSE / cosine objective for concept (SONAR) vectors.
@@ -29,22 +130,46 @@ def concept_prediction_loss(student_concepts: torch.Tensor, teacher_concepts: to
     return F.mse_loss(student_concepts, teacher_concepts)
 
 
+def popcount(x: torch.Tensor) -> torch.Tensor:
+    """Set bits per element of a non-negative int64 tensor (SWAR, stays on x's device)."""
+    x = x - ((x >> 1) & 0x5555555555555555)
+    x = (x & 0x3333333333333333) + ((x >> 2) & 0x3333333333333333)
+    x = (x + (x >> 4)) & 0x0F0F0F0F0F0F0F0F
+    x = x + (x >> 8)
+    x = x + (x >> 16)
+    x = x + (x >> 32)
+    return x & 0x7F
+
+
 def hypercube_transition_regularizer(vertex_seq_preds: torch.Tensor, allow_multi_bit=False, penalty=1.0):
     """
     vertex_seq_preds: LongTensor shape (batch, seq_len) of vertex ids predicted for successive tokens/sentences
-    Penalize transitions that are multi-bit flips (Hamming distance > 1).
-    For simplicity compute Hamming via XOR and bitcount on CPU tensors.
+    Penalize transitions that are multi-bit flips (Hamming distance > 1): sum of (h - 1)
+    over consecutive pairs, per sequence. XOR + popcount run on the tensor's device; ids
+    carry no gradient, see soft_transition_regularizer for the trainable form.
     """
-    if vertex_seq_preds.numel() == 0:
+    if vertex_seq_preds.numel() == 0 or allow_multi_bit:
         return torch.tensor(0.0, device=vertex_seq_preds.device)
-    # Move to CPU numpy for bitcount if needed
-    v = vertex_seq_preds.detach().cpu().numpy()
-    batch_pen = 0.0
-    for seq in v:
-        for i in range(1, len(seq)):
-            a = int(seq[i - 1])
-            b = int(seq[i])
-            h = (a ^ b).bit_count()
-            if h > 1 and not allow_multi_bit:
-                batch_pen += (h - 1)
-    return torch.tensor(batch_pen * penalty / max(1, vertex_seq_preds.shape[0]), dtype=torch.float32)
+    v = vertex_seq_preds.detach().long()
+    h = popcount(v[:, 1:] ^ v[:, :-1])
+    batch_pen = (h - 1).clamp(min=0).sum()
+    return batch_pen.float() * penalty / max(1, vertex_seq_preds.shape[0])
+
+
+def soft_transition_regularizer(bit_probs: torch.Tensor, allow_multi_bit=False, penalty=1.0, eps: float = 1e-6):
+    """
+    Differentiable relaxation of hypercube_transition_regularizer.
+    bit_probs: (batch, seq_len, n) probability that each vertex bit is 1 (e.g. sigmoid of
+    per-bit logits). Treating bits as independent Bernoullis, the expected penalty of a
+    transition is exactly E[max(h - 1, 0)] = E[h] - 1 + P(h = 0), with
+        E[h] = sum_i p_i (1 - q_i) + q_i (1 - p_i),   P(h = 0) = prod_i (1 - flip_i),
+    which equals the hard penalty when the probabilities are 0/1.
+    """
+    if bit_probs.shape[1] < 2 or allow_multi_bit:
+        return bit_probs.sum() * 0.0
+    p, q = bit_probs[:, :-1], bit_probs[:, 1:]
+    flip = p + q - 2 * p * q
+    expected = flip.sum(dim=-1)
+    stay = torch.exp(torch.log((1 - flip).clamp(min=eps)).sum(dim=-1))
+    batch_pen = (expected - 1 + stay).clamp(min=0).sum()
+    return batch_pen * penalty / max(1, bit_probs.shape[0])
@@ -0,0 +1,244 @@
+"""
+Pre-tokenized, packed training data for the distiller.
+
+- build_packed_dataset: tokenizes raw text per curriculum stage in a process pool
+  (one tokenizer per worker, batched calls), appends EOS after every document and
+  streams the concatenated tokens to <stage>.tokens.bin as uint16, so the text is
+  packed into fixed-length blocks with no padding (the tail shorter than one block
+  is dropped); index.json records block size, token and block counts per stage
+- PackedDataset: memory-maps the token files; block(stage, i) is a view
+- PackedLoader: batches of {"input_ids", "labels"} LongTensors for the current
+  curriculum stage. labels are the next token of every position, -100 at the end
+  (losses.next_token_labels). Blocks are read one shuffle buffer of consecutive
+  blocks at a time (sequential I/O), permuted within the buffer and across buffer
+  order, and batched ahead of the trainer by a prefetch thread; the order is a
+  function of (seed, epoch), with state_dict() for resume
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+import json
+import os
+import queue
+import threading
+import numpy as np
+import torch
+
+from .losses import next_token_labels
+
+INDEX = "index.json"
+_TOKENIZER = None
+
+
+def gpt2_tokenizer():
+    from transformers import GPT2TokenizerFast
+    return GPT2TokenizerFast.from_pretrained("gpt2")
+
+
+def _init_worker(tokenizer_factory: Callable):
+    global _TOKENIZER
+    _TOKENIZER = tokenizer_factory()
+
+
+def _tokenize(texts: List[str], eos_id: int) -> np.ndarray:
+    ids = _TOKENIZER(texts)["input_ids"]
+    out = np.empty(sum(len(x) + 1 for x in ids), dtype=np.uint16)
+    pos = 0
+    for x in ids:
+        out[pos:pos + len(x)] = x
+        out[pos + len(x)] = eos_id
+        pos += len(x) + 1
+    return out
+
+
+def _chunks(texts: Iterable[str], size: int) -> Iterator[List[str]]:
+    chunk = []
+    for t in texts:
+        chunk.append(t)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def build_packed_dataset(texts_by_stage: Dict[str, Iterable[str]], out_dir: str, block_size: int = 1024,
+                         tokenizer_factory: Callable = gpt2_tokenizer, workers: Optional[int] = None,
+                         chunk_texts: int = 1000) -> "PackedDataset":
+    """
+    texts_by_stage: curriculum stage name -> iterable of documents (streamed, never held whole).
+    tokenizer_factory: picklable callable returning a tokenizer with __call__(texts)["input_ids"]
+        and eos_token_id; its vocabulary must fit in uint16.
+    workers: tokenizer processes (None = os.cpu_count(), 0 = tokenize in this process).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    tokenizer = tokenizer_factory()
+    if len(tokenizer) > np.iinfo(np.uint16).max + 1:
+        raise ValueError(f"vocabulary of {len(tokenizer)} tokens does not fit in uint16")
+    eos_id = tokenizer.eos_token_id
+    if eos_id is None:
+        raise ValueError("tokenizer needs an eos_token_id to separate packed documents")
+    workers = os.cpu_count() if workers is None else workers
+    pool = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(tokenizer_factory,)) if workers else None
+    if pool is None:
+        _init_worker(lambda: tokenizer)
+    stages = {}
+    try:
+        for stage, texts in texts_by_stage.items():
+            path = os.path.join(out_dir, f"{stage}.tokens.bin")
+            tmp = f"{path}.tmp"
+            n_tokens = n_docs = 0
+            with open(tmp, "wb") as f:
+                chunks = _chunks(texts, chunk_texts)
+                if pool is None:
+                    results = (_tokenize(c, eos_id) for c in chunks)
+                else:
+                    results = _ordered(pool, chunks, eos_id, 2 * workers)
+                for tokens in results:
+                    f.write(tokens.data)
+                    n_tokens += len(tokens)
+                    n_docs += int((tokens == eos_id).sum())
+            os.replace(tmp, path)
+            stages[stage] = {"file": os.path.basename(path), "tokens": n_tokens, "documents": n_docs,
+                             "blocks": n_tokens // block_size}
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    index = {"version": 1, "block_size": block_size, "dtype": "uint16", "eos_id": eos_id, "stages": stages}
+    tmp = os.path.join(out_dir, INDEX + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp, os.path.join(out_dir, INDEX))
+    return PackedDataset(out_dir)
+
+
+def _ordered(pool, chunks, eos_id, window) -> Iterator[np.ndarray]:
+    """Pool results in input order, with at most `window` chunks in flight (flat memory on large corpora)."""
+    pending = []
+    for chunk in chunks:
+        pending.append(pool.submit(_tokenize, chunk, eos_id))
+        if len(pending) >= window:
+            yield pending.pop(0).result()
+    while pending:
+        yield pending.pop(0).result()
+
+
+class PackedDataset:
+    def __init__(self, path: str):
+        with open(os.path.join(path, INDEX), "r", encoding="utf-8") as f:
+            self.index = json.load(f)
+        self.path = path
+        self.block_size: int = self.index["block_size"]
+        self.stages = list(self.index["stages"])
+        self._tokens = {}
+        for stage, meta in self.index["stages"].items():
+            n = meta["blocks"] * self.block_size
+            self._tokens[stage] = (np.memmap(os.path.join(path, meta["file"]), dtype=np.uint16, mode="r", shape=(n,))
+                                   if n else np.zeros(0, dtype=np.uint16))
+
+    def num_blocks(self, stage: str) -> int:
+        return self.index["stages"][stage]["blocks"]
+
+    def blocks(self, stage: str, start: int, stop: int) -> np.ndarray:
+        """Blocks [start, stop) of a stage as a (stop - start, block_size) uint16 view."""
+        return self._tokens[stage][start * self.block_size:stop * self.block_size].reshape(-1, self.block_size)
+
+
+class PackedLoader:
+    def __init__(self, dataset: PackedDataset, batch_size: int = 8, stage: Optional[str] = None, curriculum=None,
+                 shuffle: bool = True, shuffle_buffer: int = 1024, prefetch: int = 4, seed: int = 0):
+        """
+        stage: fixed stage to read; otherwise curriculum.current_stage().name is read at the
+            start of every epoch (falling back to the only stage of a one-stage dataset).
+        shuffle_buffer: blocks read (and permuted) together.
+        prefetch: batches prepared ahead by the background thread.
+        """
+        if stage is None and curriculum is None and len(dataset.stages) != 1:
+            raise ValueError("PackedLoader needs stage= or curriculum= for a multi-stage dataset")
+        self.dataset = dataset
+        self.batch_size = batch_size
+        self.stage = stage
+        self.curriculum = curriculum
+        self.shuffle = shuffle
+        self.shuffle_buffer = max(shuffle_buffer, batch_size)
+        self.prefetch = prefetch
+        self.seed = seed
+        self.epoch = 0
+
+    def current_stage(self) -> str:
+        if self.stage is not None:
+            return self.stage
+        if self.curriculum is not None:
+            return self.curriculum.current_stage().name
+        return self.dataset.stages[0]
+
+    def __len__(self) -> int:
+        return -(-self.dataset.num_blocks(self.current_stage()) // self.batch_size)
+
+    def state_dict(self) -> Dict:
+        return {"epoch": self.epoch, "seed": self.seed}
+
+    def load_state_dict(self, state: Dict):
+        self.epoch, self.seed = state["epoch"], state["seed"]
+
+    def _batches(self, stage: str, epoch: int) -> Iterator[Dict[str, torch.Tensor]]:
+        rng = np.random.default_rng((self.seed, epoch))
+        n = self.dataset.num_blocks(stage)
+        starts = np.arange(0, n, self.shuffle_buffer)
+        if self.shuffle:
+            starts = rng.permutation(starts)
+        carry = np.zeros((0, self.dataset.block_size), dtype=np.int64)
+        for start in starts:
+            buf = np.asarray(self.dataset.blocks(stage, start, min(start + self.shuffle_buffer, n)), dtype=np.int64)
+            if self.shuffle:
+                buf = buf[rng.permutation(len(buf))]
+            buf = np.concatenate([carry, buf]) if len(carry) else buf
+            full = len(buf) - len(buf) % self.batch_size
+            for i in range(0, full, self.batch_size):
+                ids = torch.from_numpy(buf[i:i + self.batch_size])
+                yield {"input_ids": ids, "labels": next_token_labels(ids)}
+            carry = buf[full:]
+        if len(carry):
+            ids = torch.from_numpy(carry)
+            yield {"input_ids": ids, "labels": next_token_labels(ids)}
+
+    def __iter__(self) -> Iterator[Dict[str, torch.Tensor]]:
+        stage, epoch = self.current_stage(), self.epoch
+        self.epoch += 1
+        if self.prefetch <= 0:
+            yield from self._batches(stage, epoch)
+            return
+        q: "queue.Queue" = queue.Queue(maxsize=self.prefetch)
+        done = object()
+        stop = threading.Event()
+
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def produce():
+            try:
+                for batch in self._batches(stage, epoch):
+                    if not put(batch):
+                        return
+            except BaseException as e:  # surfaced in the consumer
+                put(e)
+                return
+            put(done)
+
+        thread = threading.Thread(target=produce, name="packed-loader", daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = q.get()
+                if item is done:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            stop.set()
@@ -0,0 +1,177 @@
+"""
+Smaller GPT-2 students initialised from a GPT-2 teacher.
+
+- build_student(teacher, layers=..., n_embd=..., n_inner=..., vocab_ids=...):
+  * layers: the teacher blocks the student keeps, in order (e.g. every other one)
+  * n_embd: residual width; the kept dimensions are those with the largest token
+    embedding norm, and every weight is sliced to them. Heads keep the teacher's
+    head_dim, so n_head = n_embd / head_dim and the heads with the largest
+    output-projection norm are kept per block
+  * n_inner: MLP width; the neurons with the largest |c_fc column| * |c_proj row|
+    are kept
+  * vocab_ids: restrict the (tied) embedding / LM head to these teacher token ids;
+    inputs outside the set are read as EOS, their labels are ignored, and the
+    Distiller compares against the teacher's logits on the same ids
+  With everything at the teacher's size the student reproduces the teacher exactly.
+- GPT2DistillModel: adapts a GPT2LMHeadModel to the Distiller API (batch dict in,
+  {"logits", ...} out), optionally with a concept head (mean-pooled final hidden
+  state -> concept_dim) and a per-position hypercube vertex head (vertex_bits
+  logits -> "vertex_bit_logits" for the soft transition regulariser, and the hard
+  "vertex_preds"); wrap the teacher in it too, without heads
+- top_token_ids: the most frequent token ids of a token array (e.g. a
+  packed_dataset stage), for vocab_ids
+"""
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+import torch
+from torch import nn
+from transformers import GPT2Config, GPT2LMHeadModel
+
+from ..evaluation.holdout import gpt2_generate_batch
+
+
+class GPT2DistillModel(nn.Module):
+    def __init__(self, model: GPT2LMHeadModel, concept_dim: Optional[int] = None, vertex_bits: Optional[int] = None,
+                 vocab_ids: Optional[torch.Tensor] = None, tokenizer=None, max_new_tokens: int = 32):
+        """
+        vocab_ids: teacher token id of every row of model's vocabulary (None = same vocabulary).
+        tokenizer: enables generate_batch() (holdout evaluation).
+        """
+        super().__init__()
+        self.model = model
+        n_embd = model.config.n_embd
+        self.concept_head = nn.Linear(n_embd, concept_dim) if concept_dim else None
+        self.vertex_head = nn.Linear(n_embd, vertex_bits) if vertex_bits else None
+        self.register_buffer("vocab_ids", None if vocab_ids is None else torch.as_tensor(vocab_ids, dtype=torch.long))
+        if self.vocab_ids is not None:
+            if len(self.vocab_ids) != model.config.vocab_size:
+                raise ValueError(f"{len(self.vocab_ids)} vocab_ids for a vocabulary of {model.config.vocab_size}")
+            if model.config.eos_token_id is None:
+                raise ValueError("a restricted vocabulary needs an eos_token_id (student row) in the model config")
+            token_map = torch.full((int(self.vocab_ids.max()) + 1,), -1, dtype=torch.long)
+            token_map[self.vocab_ids] = torch.arange(len(self.vocab_ids))
+            self.register_buffer("token_map", token_map, persistent=False)
+            self.unk_id = model.config.eos_token_id
+        self.tokenizer = tokenizer
+        self.max_new_tokens = max_new_tokens
+
+    def _lookup(self, ids: torch.Tensor, missing: int) -> torch.Tensor:
+        inside = ids < len(self.token_map)
+        mapped = self.token_map[torch.where(inside, ids, 0)]
+        return torch.where(inside & (mapped >= 0), mapped, missing)
+
+    def map_inputs(self, input_ids: torch.Tensor) -> torch.Tensor:
+        """Teacher token ids -> student rows (EOS for ids outside vocab_ids)."""
+        return input_ids if self.vocab_ids is None else self._lookup(input_ids, self.unk_id)
+
+    def map_labels(self, labels: torch.Tensor) -> torch.Tensor:
+        """Teacher token ids -> student rows, -100 (ignored) for ids outside vocab_ids."""
+        if self.vocab_ids is None:
+            return labels
+        return torch.where(labels == -100, labels, self._lookup(labels.clamp(min=0), -100))
+
+    def forward(self, batch: Dict[str, torch.Tensor]) -> Dict[str, torch.Tensor]:
+        mask = batch.get("attention_mask")
+        out = self.model(input_ids=self.map_inputs(batch["input_ids"]), attention_mask=mask,
+                         output_hidden_states=self.concept_head is not None or self.vertex_head is not None)
+        result = {"logits": out.logits}
+        if out.hidden_states is not None:
+            hidden = out.hidden_states[-1]
+            if self.concept_head is not None:
+                weights = (mask if mask is not None else torch.ones(hidden.shape[:2], device=hidden.device))
+                weights = weights.unsqueeze(-1).to(hidden.dtype)
+                pooled = (hidden * weights).sum(1) / weights.sum(1).clamp(min=1)
+                result["concepts"] = self.concept_head(pooled)
+            if self.vertex_head is not None:
+                bit_logits = self.vertex_head(hidden)
+                powers = 2 ** torch.arange(bit_logits.shape[-1], device=hidden.device)
+                result["vertex_bit_logits"] = bit_logits
+                result["vertex_preds"] = ((bit_logits > 0).long() * powers).sum(-1)
+        return result
+
+    def generate_batch(self, prompts: List[str]) -> List[str]:
+        if self.tokenizer is None:
+            raise ValueError("generate_batch needs GPT2DistillModel(tokenizer=...)")
+        if self.vocab_ids is not None:
+            raise ValueError("generate_batch is not supported with a restricted vocabulary")
+        return gpt2_generate_batch(self.model, self.tokenizer, prompts, self.max_new_tokens)
+
+
+def top_token_ids(tokens: np.ndarray, size: int, always: Sequence[int] = ()) -> torch.Tensor:
+    """The `size` most frequent ids in tokens (plus `always`, e.g. EOS), sorted."""
+    counts = np.bincount(np.asarray(tokens).reshape(-1))
+    keep = set(int(i) for i in always)
+    for i in np.argsort(-counts, kind="stable"):
+        if len(keep) >= size:
+            break
+        keep.add(int(i))
+    return torch.tensor(sorted(keep), dtype=torch.long)
+
+
+def _top(scores: torch.Tensor, k: int) -> torch.Tensor:
+    return scores.topk(k).indices.sort().values
+
+
+def build_student(teacher: GPT2LMHeadModel, layers: Optional[Sequence[int]] = None, n_embd: Optional[int] = None,
+                  n_inner: Optional[int] = None, vocab_ids: Optional[Sequence[int]] = None,
+                  concept_dim: Optional[int] = None, vertex_bits: Optional[int] = None,
+                  tokenizer=None) -> GPT2DistillModel:
+    """
+    layers: teacher block indices to keep (default: every other block).
+    n_embd: student width, a multiple of the teacher's head_dim (default: teacher's).
+    n_inner: student MLP width (default: 4 * n_embd scaled like the teacher's).
+    """
+    tcfg = teacher.config
+    t_inner = tcfg.n_inner or 4 * tcfg.n_embd
+    head_dim = tcfg.n_embd // tcfg.n_head
+    layers = list(range(0, tcfg.n_layer, 2)) if layers is None else list(layers)
+    if not layers or min(layers) < 0 or max(layers) >= tcfg.n_layer:
+        raise ValueError(f"layers must be teacher block indices in [0, {tcfg.n_layer}), got {layers}")
+    n_embd = n_embd or tcfg.n_embd
+    if n_embd % head_dim or n_embd > tcfg.n_embd:
+        raise ValueError(f"n_embd must be a multiple of head_dim={head_dim} and at most {tcfg.n_embd}, got {n_embd}")
+    n_head = n_embd // head_dim
+    n_inner = n_inner or t_inner * n_embd // tcfg.n_embd
+    if n_inner > t_inner:
+        raise ValueError(f"n_inner must be at most the teacher's {t_inner}, got {n_inner}")
+    vocab = torch.arange(tcfg.vocab_size) if vocab_ids is None else torch.as_tensor(vocab_ids, dtype=torch.long)
+
+    cfg = GPT2Config(**{**tcfg.to_dict(), "n_layer": len(layers), "n_embd": n_embd, "n_head": n_head,
+                        "n_inner": n_inner, "vocab_size": len(vocab)})
+    if vocab_ids is not None:
+        if not (vocab == tcfg.eos_token_id).any():
+            raise ValueError("vocab_ids must contain the teacher's eos_token_id")
+        cfg.eos_token_id = cfg.bos_token_id = int((vocab == tcfg.eos_token_id).nonzero()[0])
+    student = GPT2LMHeadModel(cfg)
+
+    t, s = teacher.transformer, student.transformer
+    dims = _top(t.wte.weight.detach().norm(dim=0), n_embd)
+    with torch.no_grad():
+        s.wte.weight.copy_(t.wte.weight[vocab][:, dims])
+        s.wpe.weight.copy_(t.wpe.weight[:, dims])
+        s.ln_f.weight.copy_(t.ln_f.weight[dims])
+        s.ln_f.bias.copy_(t.ln_f.bias[dims])
+        for sb, i in zip(s.h, layers):
+            tb = t.h[i]
+            for ln in ("ln_1", "ln_2"):
+                getattr(sb, ln).weight.copy_(getattr(tb, ln).weight[dims])
+                getattr(sb, ln).bias.copy_(getattr(tb, ln).bias[dims])
+            # heads: Conv1D weights are (in, out); c_proj rows are the concatenated head outputs
+            head_norms = tb.attn.c_proj.weight.detach().view(tcfg.n_head, head_dim, -1).norm(dim=(1, 2))
+            heads = _top(head_norms, n_head)
+            head_cols = (heads[:, None] * head_dim + torch.arange(head_dim)).reshape(-1)
+            qkv_cols = torch.cat([head_cols + part * tcfg.n_embd for part in range(3)])
+            sb.attn.c_attn.weight.copy_(tb.attn.c_attn.weight[dims][:, qkv_cols])
+            sb.attn.c_attn.bias.copy_(tb.attn.c_attn.bias[qkv_cols])
+            sb.attn.c_proj.weight.copy_(tb.attn.c_proj.weight[head_cols][:, dims])
+            sb.attn.c_proj.bias.copy_(tb.attn.c_proj.bias[dims])
+            # MLP neurons by input-norm x output-norm
+            fc, proj = tb.mlp.c_fc.weight.detach(), tb.mlp.c_proj.weight.detach()
+            neurons = _top(fc.norm(dim=0) * proj.norm(dim=1), n_inner)
+            sb.mlp.c_fc.weight.copy_(fc[dims][:, neurons])
+            sb.mlp.c_fc.bias.copy_(tb.mlp.c_fc.bias[neurons])
+            sb.mlp.c_proj.weight.copy_(proj[neurons][:, dims])
+            sb.mlp.c_proj.bias.copy_(tb.mlp.c_proj.bias[dims])
+    student.tie_weights()
+    return GPT2DistillModel(student, concept_dim=concept_dim, vertex_bits=vertex_bits,
+                            vocab_ids=None if vocab_ids is None else vocab, tokenizer=tokenizer)
@@ -0,0 +1,154 @@
+"""
+Offline teacher outputs for distillation.
+
+- precompute_teacher_outputs: runs the frozen teacher once over a dataloader and
+  writes shards of .npy arrays plus a manifest.json:
+  * the batch's tensor fields (input_ids, labels, ...) with their own dtypes
+  * top-k teacher logits as float16 and their indices in the smallest integer
+    dtype that holds the vocabulary (uint16 for GPT-2)
+  * concepts (float32) and vertex_preds (int32) when the teacher returns them
+- TeacherCache: memory-maps the shards (np.load(mmap_mode="r")), so only the rows
+  being read are paged in
+- TeacherCacheLoader: batches of the stored inputs with the teacher outputs under
+  batch["teacher"]; Distiller.run_distillation then skips the teacher forward and
+  distills against the top-k logits (chunked_token_lm_loss(teacher_topk=...))
+
+All rows must share one sequence length (pad before precomputing).
+"""
+from typing import Callable, Dict, Iterator, List, Optional
+import json
+import os
+import numpy as np
+import torch
+
+MANIFEST = "manifest.json"
+TEACHER_FIELDS = ("topk_vals", "topk_idx", "concepts", "vertex_preds")
+
+
+def _index_dtype(vocab: int) -> np.dtype:
+    for dt in (np.uint8, np.uint16, np.int32):
+        if vocab <= np.iinfo(dt).max + 1:
+            return np.dtype(dt)
+    return np.dtype(np.int64)
+
+
+def _teacher_rows(out: Dict[str, torch.Tensor], top_k: int) -> Dict[str, np.ndarray]:
+    rows = {}
+    if "logits" in out:
+        logits = out["logits"]
+        vals, idx = logits.topk(min(top_k, logits.shape[-1]), dim=-1)
+        rows["topk_vals"] = vals.to(torch.float16).cpu().numpy()
+        rows["topk_idx"] = idx.cpu().numpy().astype(_index_dtype(logits.shape[-1]))
+    if "concepts" in out:
+        rows["concepts"] = out["concepts"].float().cpu().numpy()
+    if "vertex_preds" in out:
+        rows["vertex_preds"] = out["vertex_preds"].cpu().numpy().astype(np.int32)
+    return rows
+
+
+def _write_shard(out_dir: str, shard: int, parts: Dict[str, List[np.ndarray]]) -> int:
+    rows = 0
+    for name, chunks in parts.items():
+        arr = np.concatenate(chunks)
+        rows = len(arr)
+        path = os.path.join(out_dir, f"shard_{shard:05d}.{name}.npy")
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, arr)
+        os.replace(tmp, path)
+    return rows
+
+
+def precompute_teacher_outputs(teacher: Callable, dataloader, out_dir: str, top_k: int = 64,
+                               shard_rows: int = 4096, device: Optional[torch.device] = None) -> "TeacherCache":
+    """
+    Run teacher over every batch of dataloader (use large batches) and store its outputs.
+    shard_rows: sequences per shard file.
+    """
+    device = device or torch.device("cpu")
+    os.makedirs(out_dir, exist_ok=True)
+    parts: Dict[str, List[np.ndarray]] = {}
+    shards, pending = [], 0
+    if hasattr(teacher, "eval"):
+        teacher.eval()
+    for batch in dataloader:
+        inputs = {k: v for k, v in batch.items() if torch.is_tensor(v)}
+        with torch.no_grad():
+            out = teacher({k: v.to(device) for k, v in inputs.items()})
+        rows = {k: v.cpu().numpy() for k, v in inputs.items()}
+        rows.update(_teacher_rows(out, top_k))
+        for name, arr in rows.items():
+            parts.setdefault(name, []).append(arr)
+        pending += len(next(iter(rows.values())))
+        if pending >= shard_rows:
+            shards.append(_write_shard(out_dir, len(shards), parts))
+            parts, pending = {}, 0
+    if pending:
+        shards.append(_write_shard(out_dir, len(shards), parts))
+    manifest = {"version": 1, "top_k": top_k, "shard_rows": shards, "fields": sorted(rows) if shards else []}
+    tmp = os.path.join(out_dir, MANIFEST + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(out_dir, MANIFEST))
+    return TeacherCache(out_dir)
+
+
+class TeacherCache:
+    def __init__(self, path: str):
+        with open(os.path.join(path, MANIFEST), "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.path = path
+        self.fields: List[str] = self.manifest["fields"]
+        self.shard_rows: List[int] = self.manifest["shard_rows"]
+        self.shards = [
+            {name: np.load(os.path.join(path, f"shard_{i:05d}.{name}.npy"), mmap_mode="r") for name in self.fields}
+            for i in range(len(self.shard_rows))
+        ]
+
+    def __len__(self) -> int:
+        return sum(self.shard_rows)
+
+    def rows(self, shard: int, idx: np.ndarray) -> Dict:
+        """Rows idx of one shard as a batch dict, teacher outputs under "teacher"."""
+        idx = np.sort(idx)
+        batch, teacher = {}, {}
+        for name, arr in self.shards[shard].items():
+            t = torch.from_numpy(np.ascontiguousarray(arr[idx]))
+            if name == "topk_idx" or name == "vertex_preds":
+                t = t.long()
+            (teacher if name in TEACHER_FIELDS else batch)[name] = t
+        batch["teacher"] = teacher
+        return batch
+
+
+class TeacherCacheLoader:
+    """
+    Iterates a TeacherCache in batches. With shuffle, the shard order and the rows
+    within each shard are permuted per epoch (seed + epoch), reading one shard at a time.
+    """
+
+    def __init__(self, cache: TeacherCache, batch_size: int = 8, shuffle: bool = False, seed: int = 0):
+        self.cache = cache
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.seed = seed
+        self.epoch = 0
+
+    def __len__(self) -> int:
+        return sum(-(-n // self.batch_size) for n in self.cache.shard_rows)
+
+    def state_dict(self) -> Dict:
+        return {"epoch": self.epoch, "seed": self.seed}
+
+    def load_state_dict(self, state: Dict):
+        self.epoch, self.seed = state["epoch"], state["seed"]
+
+    def __iter__(self) -> Iterator[Dict]:
+        rng = np.random.default_rng(self.seed + self.epoch)
+        self.epoch += 1
+        order = rng.permutation(len(self.cache.shard_rows)) if self.shuffle else range(len(self.cache.shard_rows))
+        for shard in order:
+            n = self.cache.shard_rows[shard]
+            rows = rng.permutation(n) if self.shuffle else np.arange(n)
+            for start in range(0, n, self.batch_size):
+                yield self.cache.rows(shard, rows[start:start + self.batch_size])
@@ -0,0 +1,205 @@
+"""
+Caching wrapper for `encoder(texts) -> np.ndarray` callables.
+
+- texts are keyed by a BLAKE2b digest of (namespace, text), stable across processes
+  (unlike Python's randomized hash())
+- duplicates within one call are encoded once
+- an in-memory LRU bounded by bytes; evicted entries spill to an on-disk sqlite
+  key-value store, consulted before falling back to the wrapped encoder. Evictions
+  are buffered and written in one transaction per `spill_batch` entries (and on
+  flush() / close()), so a cold pass does not pay a sqlite commit per eviction
+- only misses are sent to the wrapped encoder, in one batch
+
+If the wrapped object has a fit() method (e.g. SimpleEncoder), CachedEncoder.fit
+refits it and drops the cached vectors of this namespace, since they are stale.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+import numpy as np
+
+
+class CachedEncoder:
+    def __init__(
+        self,
+        encoder: Callable[[List[str]], np.ndarray],
+        max_bytes: int = 64 * 1024 * 1024,
+        spill_path: Optional[str] = None,
+        namespace: str = "",
+        spill_batch: int = 256,
+    ):
+        """
+        encoder: callable (or object with encode()) mapping list[str] -> (n, dim) array.
+        max_bytes: in-memory LRU budget for cached vectors.
+        spill_path: sqlite file for entries evicted from memory (None = no spill).
+        namespace: separates encoders sharing one spill file (e.g. model name + dim).
+        spill_batch: evicted entries buffered before they are written to the spill file.
+        """
+        self.encoder = encoder
+        self.max_bytes = max_bytes
+        self.namespace = namespace
+        self.spill_path = spill_path
+        self.spill_batch = max(1, int(spill_batch))
+        self._lru: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._mem_bytes = 0
+        # evicted entries not yet written to the spill file
+        self._spill: Dict[bytes, np.ndarray] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._db = None
+        if spill_path:
+            os.makedirs(os.path.dirname(spill_path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(spill_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS vectors (ns TEXT, key BLOB, dtype TEXT, vec BLOB, PRIMARY KEY (ns, key))"
+            )
+            self._db.commit()
+
+    def _key(self, text: str) -> bytes:
+        return hashlib.blake2b(f"{self.namespace}\x00{text}".encode("utf-8"), digest_size=16).digest()
+
+    def _encode_raw(self, texts: List[str]) -> np.ndarray:
+        fn = getattr(self.encoder, "encode", self.encoder)
+        return np.asarray(fn(texts))
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        return self.encode(texts)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        texts = list(texts)
+        keys = [self._key(t) for t in texts]
+        found: Dict[bytes, np.ndarray] = {}
+        missing: Dict[bytes, str] = {}
+        with self._lock:
+            for k, t in zip(keys, texts):
+                if k in found or k in missing:
+                    continue
+                vec = self._lru.get(k)
+                if vec is not None:
+                    self._lru.move_to_end(k)
+                    found[k] = vec
+                    self.hits += 1
+                else:
+                    missing[k] = t
+            if missing and self._db is not None:
+                for k, vec in self._disk_get(list(missing)).items():
+                    found[k] = vec
+                    del missing[k]
+                    self.disk_hits += 1
+                    self._put(k, vec)
+            self.misses += len(missing)
+        if missing:
+            vecs = self._encode_raw(list(missing.values()))
+            with self._lock:
+                for k, vec in zip(missing, vecs):
+                    vec = np.array(vec)
+                    vec.setflags(write=False)
+                    found[k] = vec
+                    self._put(k, vec)
+        if not texts:
+            return np.zeros((0, self._dim()), dtype=np.float32)
+        return np.stack([found[k] for k in keys])
+
+    def _dim(self) -> int:
+        dim = getattr(self.encoder, "dim", None)
+        if dim is None and self._lru:
+            dim = next(iter(self._lru.values())).shape[-1]
+        return int(dim or 0)
+
+    def _put(self, key: bytes, vec: np.ndarray):
+        if key in self._lru:
+            self._lru.move_to_end(key)
+            return
+        self._lru[key] = vec
+        self._mem_bytes += vec.nbytes
+        while self._mem_bytes > self.max_bytes and len(self._lru) > 1:
+            k, v = self._lru.popitem(last=False)
+            self._mem_bytes -= v.nbytes
+            if self._db is not None:
+                self._spill[k] = v
+        if len(self._spill) >= self.spill_batch:
+            self._write_spill()
+
+    def _write_spill(self):
+        if self._spill and self._db is not None:
+            self._disk_put(list(self._spill.items()))
+        self._spill.clear()
+
+    def _disk_get(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        out = {}
+        for k in keys:
+            vec = self._spill.pop(k, None)
+            if vec is not None:
+                out[k] = vec
+        keys = [k for k in keys if k not in out]
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = self._db.execute(
+                f"SELECT key, dtype, vec FROM vectors WHERE ns = ? AND key IN ({','.join('?' * len(chunk))})",
+                [self.namespace, *chunk],
+            ).fetchall()
+            for k, dtype, blob in rows:
+                out[bytes(k)] = np.frombuffer(blob, dtype=dtype)
+        return out
+
+    def _disk_put(self, items):
+        self._db.executemany(
+            "INSERT OR REPLACE INTO vectors (ns, key, dtype, vec) VALUES (?, ?, ?, ?)",
+            [(self.namespace, k, v.dtype.str, np.ascontiguousarray(v).tobytes()) for k, v in items],
+        )
+        self._db.commit()
+
+    def flush(self):
+        """Write every in-memory entry to the spill store (e.g. before shutdown)."""
+        if self._db is None:
+            return
+        with self._lock:
+            self._spill.update(self._lru)
+            self._write_spill()
+
+    def clear(self):
+        """Drop cached vectors of this namespace from memory and disk."""
+        with self._lock:
+            self._lru.clear()
+            self._spill.clear()
+            self._mem_bytes = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM vectors WHERE ns = ?", (self.namespace,))
+                self._db.commit()
+
+    def fit(self, texts: List[str]):
+        result = self.encoder.fit(texts)
+        self.clear()
+        return result
+
+    def close(self):
+        """Write buffered evictions and close the spill file."""
+        if self._db is not None:
+            with self._lock:
+                self._write_spill()
+            self._db.close()
+            self._db = None
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.disk_hits + self.misses
+        disk_bytes = 0
+        if self._db is not None:
+            with self._lock:
+                self._write_spill()
+                disk_bytes = self._db.execute(
+                    "SELECT COALESCE(SUM(LENGTH(vec)), 0) FROM vectors WHERE ns = ?", (self.namespace,)
+                ).fetchone()[0]
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_bytes": self._mem_bytes,
+            "memory_entries": len(self._lru),
+            "disk_bytes": int(disk_bytes),
+        }
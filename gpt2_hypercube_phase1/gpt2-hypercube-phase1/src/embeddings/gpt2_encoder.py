@@ -0,0 +1,110 @@
+"""
+Text encoder built on an already-loaded GPT-2 model.
+
+Implements the `encoder(texts) -> np.ndarray (n, dim)` contract used by
+InferenceManager, RetrievalAPI and the evaluation metrics.
+
+Modes:
+  - hidden: mean of the hidden states (last layer by default) over the real tokens
+  - embedding: mean of the token embedding rows (wte), no transformer forward; a cheap
+    bag-of-tokens embedding for high-volume ingestion
+
+Texts are tokenized in one batched call, truncated to max_length, sorted by length
+and padded per batch, so little compute is spent on padding. Everything runs under
+torch.no_grad with no global RNG state, so one instance can serve several threads.
+"""
+from typing import List, Optional
+import numpy as np
+import torch
+
+
+class GPT2Encoder:
+    def __init__(
+        self,
+        model,
+        tokenizer,
+        mode: str = "hidden",
+        max_length: int = 128,
+        batch_size: int = 32,
+        layer: int = -1,
+        projection_dim: Optional[int] = None,
+        normalize: bool = True,
+        seed: int = 0,
+        device: Optional[torch.device] = None,
+    ):
+        """
+        model: GPT2LMHeadModel / GPT2Model (or anything exposing get_input_embeddings()
+            and, for hidden mode, a `transformer` base model).
+        tokenizer: GPT-2 tokenizer; tokenizer(texts, truncation=True, max_length=...)
+            must return {"input_ids": list of id lists}.
+        layer: hidden-state layer to pool (-1 = last).
+        projection_dim: optional fixed Gaussian random projection to a smaller dimension.
+        """
+        if mode not in ("hidden", "embedding"):
+            raise ValueError(f"unknown mode {mode!r}; expected 'hidden' or 'embedding'")
+        self.model = model
+        self.tokenizer = tokenizer
+        self.mode = mode
+        self.max_length = max_length
+        self.batch_size = batch_size
+        self.layer = layer
+        self.normalize = normalize
+        self.base = getattr(model, "transformer", model)
+        self.wte = model.get_input_embeddings()
+        self.device = device or self.wte.weight.device
+        self.pad_id = tokenizer.eos_token_id if tokenizer.eos_token_id is not None else 0
+        hidden = self.wte.weight.shape[1]
+        self.projection = None
+        if projection_dim:
+            rng = np.random.RandomState(seed)
+            proj = (rng.randn(hidden, projection_dim) / np.sqrt(projection_dim)).astype(np.float32)
+            self.projection = torch.from_numpy(proj).to(self.device)
+        self.dim = projection_dim or hidden
+
+    @classmethod
+    def from_pretrained(cls, name: str = "gpt2", **kwargs) -> "GPT2Encoder":
+        from transformers import GPT2LMHeadModel, GPT2TokenizerFast
+        tokenizer = GPT2TokenizerFast.from_pretrained(name)
+        model = GPT2LMHeadModel.from_pretrained(name)
+        model.eval()
+        return cls(model, tokenizer, **kwargs)
+
+    def _pool(self, ids: torch.Tensor, mask: torch.Tensor) -> torch.Tensor:
+        if self.mode == "embedding":
+            states = self.wte(ids)
+        elif self.layer == -1:
+            states = self.base(input_ids=ids, attention_mask=mask).last_hidden_state
+        else:
+            out = self.base(input_ids=ids, attention_mask=mask, output_hidden_states=True)
+            states = out.hidden_states[self.layer]
+        m = mask.unsqueeze(-1).to(states.dtype)
+        return (states * m).sum(dim=1) / m.sum(dim=1).clamp(min=1.0)
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        return self.encode(texts)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        texts = list(texts)
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        if not texts:
+            return out
+        token_ids = self.tokenizer(texts, truncation=True, max_length=self.max_length)["input_ids"]
+        # an empty text pools the end-of-text token instead of producing NaN
+        token_ids = [ids if len(ids) else [self.pad_id] for ids in token_ids]
+        order = np.argsort([len(ids) for ids in token_ids], kind="stable")
+        with torch.no_grad():
+            for start in range(0, len(order), self.batch_size):
+                idx = order[start:start + self.batch_size]
+                width = max(len(token_ids[i]) for i in idx)
+                ids = torch.full((len(idx), width), self.pad_id, dtype=torch.long)
+                mask = torch.zeros((len(idx), width), dtype=torch.long)
+                for row, i in enumerate(idx):
+                    ids[row, : len(token_ids[i])] = torch.tensor(token_ids[i], dtype=torch.long)
+                    mask[row, : len(token_ids[i])] = 1
+                emb = self._pool(ids.to(self.device), mask.to(self.device)).float()
+                if self.projection is not None:
+                    emb = emb @ self.projection
+                if self.normalize:
+                    emb = torch.nn.functional.normalize(emb, dim=-1)
+                out[idx] = emb.cpu().numpy()
+        return out
@@ -1,5 +1,7 @@
 """
 Governance utilities: audits, rollback registry, whitepaper/log generation, and review stubs.
+With writer= (utils.checkpoint_writer.CheckpointWriter) audit lines and whitepapers
+are written in the background; call writer.flush() before reading them back.
 """
 import os
 import json
@@ -11,32 +13,41 @@ os.makedirs(GOV_DIR, exist_ok=True)
 
 
 class GovernanceManager:
-    def __init__(self, gov_dir: str = GOV_DIR):
+    def __init__(self, gov_dir: str = GOV_DIR, writer=None):
         self.gov_dir = gov_dir
         os.makedirs(self.gov_dir, exist_ok=True)
         self.audit_log = os.path.join(self.gov_dir, "audit.logl")
         self.rollback_paths: List[Dict[str, Any]] = []
+        self.writer = writer
 
-    def schedule_quarterly_audit(self, description: str):
-        entry = {"evt": "quarterly_audit", "desc": description, "ts": int(time.time())}
+    def _log(self, entry: Dict[str, Any]):
+        if self.writer is not None:
+            self.writer.append_line(self.audit_log, json.dumps(entry))
+            return
         with open(self.audit_log, "a", encoding="utf-8") as f:
             f.write(json.dumps(entry) + "\n")
+
+    def schedule_quarterly_audit(self, description: str):
+        entry = {"evt": "quarterly_audit", "desc": description, "ts": int(time.time())}
+        self._log(entry)
         return entry
 
     def register_rollback(self, ckpt_path: str, reason: str):
         entry = {"evt": "rollback_register", "ckpt": ckpt_path, "reason": reason, "ts": int(time.time())}
         self.rollback_paths.append(entry)
-        with open(self.audit_log, "a", encoding="utf-8") as f:
-            f.write(json.dumps(entry) + "\n")
+        self._log(entry)
 
     def publish_whitepaper(self, title: str, summary: str, filepath: Optional[str] = None):
         ts = int(time.time())
         doc = {"title": title, "summary": summary, "ts": ts}
         path = filepath or os.path.join(self.gov_dir, f"whitepaper_{ts}.json")
+        entry = {"evt": "whitepaper_published", "path": path, "ts": ts}
+        if self.writer is not None:
+            self.writer.write_json(doc, path, audit=(self.audit_log, json.dumps(entry)))
+            return path
         with open(path, "w", encoding="utf-8") as f:
             json.dump(doc, f, indent=2)
-        with open(self.audit_log, "a", encoding="utf-8") as f:
-            f.write(json.dumps({"evt": "whitepaper_published", "path": path, "ts": ts}) + "\n")
+        self._log(entry)
         return path
 
     def human_review_lineage(self, memes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
@@ -49,6 +60,5 @@ class GovernanceManager:
             m2 = m.copy()
             m2["human_ok"] = True  # optimistic default
             reviewed.append(m2)
-        with open(self.audit_log, "a", encoding="utf-8") as f:
-            f.write(json.dumps({"evt": "lineage_review", "count": len(reviewed), "ts": int(time.time())}) + "\n")
+        self._log({"evt": "lineage_review", "count": len(reviewed), "ts": int(time.time())})
         return reviewed
@@ -0,0 +1,194 @@
+"""
+Holdout evaluation for the distiller's rollback guard.
+
+- HoldoutEvaluator.evaluate(student, holdout): generates outputs for batches of
+  prompts (student.generate_batch(prompts) when available, else student.generate
+  per prompt) and scores them with evaluator(output, reference)
+  * scoring runs in a thread or process pool while the next batch is generated
+  * evaluators with prepare(reference) / score(output, prepared) have the
+    reference-side work (tokenising, n-gram counts, embeddings) done once per
+    reference and cached across evaluations
+  * given per-sample baseline scores of an earlier evaluation, a sequential test on
+    the paired drops stops as soon as the relative drop of the primary metric is
+    confidently above or below max_drop (Bonferroni-corrected normal bound over
+    the looks, one look per batch after min_samples)
+- gpt2_generate_batch: batched greedy generation for a Hugging Face causal LM
+- TokenOverlapEvaluator: token / bigram F1 against the reference, with prepare()
+"""
+from collections import Counter
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from statistics import NormalDist
+from typing import Any, Callable, Dict, List, Optional, Sequence
+import itertools
+import math
+import numpy as np
+import torch
+
+
+def primary_metric(metrics: Dict[str, float]) -> str:
+    """The metric the rollback guard compares: coherence, else the first one reported."""
+    return "coherence" if "coherence" in metrics else next(iter(metrics))
+
+
+def _score(evaluator, output: str, reference: Any) -> Dict[str, float]:
+    if hasattr(evaluator, "score"):
+        return evaluator.score(output, reference)
+    return evaluator(output, reference)
+
+
+def gpt2_generate_batch(model, tokenizer, prompts: List[str], max_new_tokens: int = 32) -> List[str]:
+    """Greedy continuations of prompts in one left-padded generate() call."""
+    tokenizer.padding_side = "left"
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    enc = tokenizer(prompts, return_tensors="pt", padding=True).to(model.device)
+    with torch.no_grad():
+        out = model.generate(**enc, max_new_tokens=max_new_tokens, do_sample=False,
+                             pad_token_id=tokenizer.pad_token_id)
+    return tokenizer.batch_decode(out[:, enc["input_ids"].shape[1]:], skip_special_tokens=True)
+
+
+class TokenOverlapEvaluator:
+    """Whitespace-token and bigram F1 of an output against its reference."""
+
+    def prepare(self, reference: str):
+        tokens = reference.lower().split()
+        return Counter(tokens), Counter(zip(tokens, tokens[1:]))
+
+    @staticmethod
+    def _f1(out: Counter, ref: Counter) -> float:
+        common = sum((out & ref).values())
+        if not common:
+            return 0.0
+        p, r = common / sum(out.values()), common / sum(ref.values())
+        return 2 * p * r / (p + r)
+
+    def score(self, output: str, prepared) -> Dict[str, float]:
+        tokens = output.lower().split()
+        ref_tokens, ref_bigrams = prepared
+        return {"token_f1": self._f1(Counter(tokens), ref_tokens),
+                "bigram_f1": self._f1(Counter(zip(tokens, tokens[1:])), ref_bigrams)}
+
+    def __call__(self, output: str, reference: str) -> Dict[str, float]:
+        return self.score(output, self.prepare(reference))
+
+
+class HoldoutEvaluator:
+    def __init__(self, evaluator: Callable[[str, Any], Dict[str, float]], batch_size: int = 8, workers: int = 0,
+                 pool: str = "thread", max_samples: Optional[int] = None, min_samples: int = 16,
+                 alpha: Optional[float] = None):
+        """
+        workers: scoring pool size (0 = score inline); pool: "thread" or "process"
+            (a process pool needs a picklable evaluator).
+        max_samples: holdout samples scored per evaluation (None = all).
+        alpha: error rate of the early-stopping test (None = never stop early).
+        """
+        if pool not in ("thread", "process"):
+            raise ValueError(f"pool must be 'thread' or 'process', got {pool!r}")
+        self.evaluator = evaluator
+        self.batch_size = batch_size
+        self.workers = workers
+        self.pool = pool
+        self.max_samples = max_samples
+        self.min_samples = min_samples
+        self.alpha = alpha
+        self._references: Dict[str, Any] = {}
+        self._executor: Optional[Executor] = None
+
+    def _pool(self) -> Optional[Executor]:
+        if self.workers and self._executor is None:
+            cls = ProcessPoolExecutor if self.pool == "process" else ThreadPoolExecutor
+            self._executor = cls(self.workers)
+        return self._executor
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _prepared(self, reference: str) -> Any:
+        if not hasattr(self.evaluator, "prepare"):
+            return reference
+        if reference not in self._references:
+            self._references[reference] = self.evaluator.prepare(reference)
+        return self._references[reference]
+
+    def _generate(self, student, prompts: List[str]) -> List[str]:
+        with torch.no_grad():
+            if hasattr(student, "generate_batch"):
+                return list(student.generate_batch(prompts))
+            if hasattr(student, "generate"):
+                return [student.generate(p) for p in prompts]
+        return [""] * len(prompts)
+
+    def _submit(self, outputs: List[str], references: List[str]) -> List[Future]:
+        pool = self._pool()
+        futures = []
+        for output, reference in zip(outputs, references):
+            prepared = self._prepared(reference)
+            if pool is not None:
+                futures.append(pool.submit(_score, self.evaluator, output, prepared))
+                continue
+            f: Future = Future()
+            f.set_result(_score(self.evaluator, output, prepared))
+            futures.append(f)
+        return futures
+
+    def _decide(self, baseline: Sequence[float], scores: List[float], max_drop: float, looks: int) -> Optional[str]:
+        n = min(len(scores), len(baseline))
+        if n < self.min_samples or n < 2:
+            return None
+        diffs = np.asarray(baseline[:n], dtype=np.float64) - np.asarray(scores[:n], dtype=np.float64)
+        threshold = max_drop * float(np.mean(baseline[:n]))
+        z = NormalDist().inv_cdf(1 - self.alpha / (2 * looks))
+        half = z * float(diffs.std(ddof=1)) / math.sqrt(n)
+        if diffs.mean() - half > threshold:
+            return "above"
+        if diffs.mean() + half < threshold:
+            return "below"
+        return None
+
+    def evaluate(self, student, holdout, baseline: Optional[Sequence[float]] = None,
+                 max_drop: float = 0.10) -> Dict[str, Any]:
+        """
+        Score up to max_samples holdout samples ({"prompt", "reference"} dicts).
+        baseline: per-sample primary-metric scores of an earlier evaluation of the same
+            holdout, in order (possibly fewer than are scored now); enables early
+            stopping (with alpha), paired on the samples it covers.
+        Returns {"metrics": means, "scores": primary metric per sample, "n", "decision"}
+        where decision is "above" / "below" when the test stopped early, else None.
+        """
+        if not hasattr(holdout, "__getitem__"):
+            holdout = list(itertools.islice(holdout, self.max_samples))
+        limit = self.max_samples if self.max_samples is not None else len(holdout)
+        limit = min(limit, len(holdout))
+        testing = baseline is not None and self.alpha is not None
+        paired = limit if baseline is None else min(limit, len(baseline))
+        looks = max(1, math.ceil((paired - self.min_samples) / self.batch_size) + 1)
+        results: List[Dict[str, float]] = []
+        key, decision, in_flight = None, None, None
+        for start in range(0, limit, self.batch_size):
+            samples = [holdout[i] for i in range(start, min(start + self.batch_size, limit))]
+            outputs = self._generate(student, [s.get("prompt", "") for s in samples])
+            submitted = self._submit(outputs, [s.get("reference", "") for s in samples])
+            # the previous batch was scored while this one was generated
+            if in_flight is not None:
+                results.extend(f.result() for f in in_flight)
+            in_flight = submitted
+            if results and key is None:
+                key = primary_metric(results[0])
+            # past the baseline the paired samples no longer change, so neither does the test
+            if testing and results and len(results) < paired + self.batch_size:
+                decision = self._decide(baseline, [r[key] for r in results], max_drop, looks)
+                if decision is not None:
+                    for f in in_flight:
+                        f.cancel()
+                    in_flight = None
+                    break
+        if in_flight is not None:
+            results.extend(f.result() for f in in_flight)
+        if not results:
+            return {"metrics": {}, "scores": [], "n": 0, "decision": None}
+        key = key or primary_metric(results[0])
+        metrics = {k: float(np.mean([r[k] for r in results])) for k in results[0]}
+        return {"metrics": metrics, "scores": [r[key] for r in results], "n": len(results), "decision": decision}
@@ -92,9 +92,12 @@ class LTMManager:
     - protected_vertices: set kept locked unless human-approved
     - versioned_map: list of snapshots (timestamped)
     - promotion policy: require min_generations OR human_approval to promote
+    - writer: optional CheckpointWriter; snapshots are then written in the background
     """
-    def __init__(self, path: str = "ltm_map.json", backups_dir: str = "ltm_backups", protected: Optional[List[int]] = None):
+    def __init__(self, path: str = "ltm_map.json", backups_dir: str = "ltm_backups", protected: Optional[List[int]] = None,
+                 writer=None):
         self.path = path
+        self.writer = writer
         self.backups_dir = backups_dir
         os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
         os.makedirs(self.backups_dir, exist_ok=True)
@@ -118,14 +121,20 @@ class LTMManager:
         version = {"ts": ts, "label": label or "", "mapping": copy.deepcopy(self.mapping)}
         self.versions.append(version)
         # save to disk and backup
+        backup = os.path.join(self.backups_dir, f"ltm_snapshot_{ts}.json")
+        if self.writer is not None:
+            self.writer.write_json({"mapping": self.mapping, "versions": self.versions}, self.path)
+            self.writer.write_json(version, backup)
+            return backup
         with open(self.path, "w", encoding="utf-8") as f:
             json.dump({"mapping": self.mapping, "versions": self.versions}, f, indent=2)
-        backup = os.path.join(self.backups_dir, f"ltm_snapshot_{ts}.json")
         with open(backup, "w", encoding="utf-8") as f:
             json.dump(version, f, indent=2)
         return backup
 
     def rollback_to(self, backup_path: str) -> bool:
+        if self.writer is not None:
+            self.writer.flush()
         if not os.path.exists(backup_path):
             return False
         with open(backup_path, "r", encoding="utf-8") as f:
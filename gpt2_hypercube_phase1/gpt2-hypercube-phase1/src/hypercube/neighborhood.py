@@ -0,0 +1,87 @@
+"""
+Hamming balls and subcubes of the hypercube, enumerated without vertex lists.
+
+- subcube: vertices agreeing with `value` outside `free_mask`, in binary reflected
+  Gray code order over the free bits, so consecutive vertices differ in one bit
+- ball: vertices within Hamming distance r of a center, sphere by sphere
+  (radius 0, 1, ..., r). Each sphere follows the revolving-door combination Gray
+  code and alternate spheres run in reverse, so consecutive vertices differ in at
+  most two bits (one bit between spheres)
+
+iter_* functions are lazy generators (O(n) work per vertex); the array functions
+return the same sequence as an int64 array, or a (N, size) array for N centers.
+"""
+from math import comb
+from typing import Iterator, List
+import numpy as np
+
+from .topology import Hypercube
+
+
+def ball_size(n: int, r: int) -> int:
+    return sum(comb(n, k) for k in range(min(r, n) + 1))
+
+
+def _door(n: int, k: int, reverse: bool = False) -> Iterator[int]:
+    """Revolving-door order of the k-subsets of n bits: R(n, k) = R(n-1, k), rev(R(n-1, k-1)) + bit n-1."""
+    if k == 0:
+        yield 0
+        return
+    if k > n:
+        return
+    hi = 1 << (n - 1)
+    if not reverse:
+        yield from _door(n - 1, k)
+        yield from (m | hi for m in _door(n - 1, k - 1, True))
+    else:
+        yield from (m | hi for m in _door(n - 1, k - 1, False))
+        yield from _door(n - 1, k, True)
+
+
+def _door_masks(n: int, r: int) -> List[np.ndarray]:
+    """Revolving-door masks of every sphere 0..r as arrays, built level by level over n."""
+    levels = [np.zeros(1, dtype=np.int64)] + [np.zeros(0, dtype=np.int64)] * r
+    for m in range(1, n + 1):
+        hi = np.int64(1 << (m - 1))
+        levels = [levels[0]] + [np.concatenate([levels[k], levels[k - 1][::-1] | hi]) for k in range(1, r + 1)]
+    return levels
+
+
+def iter_ball(hc: Hypercube, center: int, r: int) -> Iterator[int]:
+    center = int(center)
+    for k in range(min(r, hc.n) + 1):
+        for mask in _door(hc.n, k, reverse=k % 2 == 1):
+            yield center ^ mask
+
+
+def ball(hc: Hypercube, center, r: int) -> np.ndarray:
+    """Vertices within distance r of center (iter_ball order); an array of N centers gives (N, size)."""
+    r = min(r, hc.n)
+    spheres = _door_masks(hc.n, r)
+    masks = np.concatenate([s[::-1] if k % 2 else s for k, s in enumerate(spheres)])
+    if isinstance(center, np.ndarray):
+        return center.astype(np.int64)[:, None] ^ masks[None, :]
+    return int(center) ^ masks
+
+
+def iter_subcube(hc: Hypercube, value: int, free_mask: int) -> Iterator[int]:
+    """Vertices v with v & ~free_mask == value & ~free_mask, one bit flip apart."""
+    free_mask &= hc.vertex_count - 1
+    free = [i for i in range(hc.n) if free_mask >> i & 1]
+    cur = int(value) & ~free_mask
+    yield cur
+    for t in range(1, 1 << len(free)):
+        # Gray code t ^ (t >> 1) flips the bit at the index of t's lowest set bit
+        cur ^= 1 << free[(t & -t).bit_length() - 1]
+        yield cur
+
+
+def subcube(hc: Hypercube, value: int, free_mask: int) -> np.ndarray:
+    free_mask &= hc.vertex_count - 1
+    free = [i for i in range(hc.n) if free_mask >> i & 1]
+    t = np.arange(1 << len(free), dtype=np.int64)
+    gray = t ^ (t >> 1)
+    out = np.full(len(t), int(value) & ~free_mask, dtype=np.int64)
+    for q, pos in enumerate(free):
+        out |= ((gray >> q) & 1) << pos
+    return out
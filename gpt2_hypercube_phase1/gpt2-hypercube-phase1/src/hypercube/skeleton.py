@@ -1,31 +1,49 @@
 import numpy as np
 
+from .topology import Hypercube as _Topology
+
+
 class Hypercube:
+    """
+    Hypercube skeleton (vertex bit vectors and edges).
+
+    Vertices and edges are built on first access only: vertices as a (2^n, n) bit
+    array, edges as an (E, 2) array generated in O(V * n) by flipping each zero bit,
+    instead of comparing every pair of vertices.
+    """
     def __init__(self, dimension):
         self.dimension = dimension
-        self.vertices = self._generate_vertices(dimension)
-        self.edges = self._generate_edges(self.vertices)
-
-    def _generate_vertices(self, dimension):
-        """Generate vertices of the hypercube."""
-        return [np.array(list(bin(i)[2:].zfill(dimension)), dtype=int) for i in range(2 ** dimension)]
-
-    def _generate_edges(self, vertices):
-        """Generate edges based on Hamming distance of 1."""
-        edges = []
-        for i in range(len(vertices)):
-            for j in range(i + 1, len(vertices)):
-                if np.sum(np.abs(vertices[i] - vertices[j])) == 1:
-                    edges.append((i, j))
-        return edges
+        self.topology = _Topology(dimension)
+        self._vertices = None
+        self._edges = None
+
+    @property
+    def vertices(self):
+        """(2^n, n) array of 0/1 bits, row i = vertex i (MSB first)."""
+        if self._vertices is None:
+            self._vertices = self.topology.bits_of(np.arange(self.topology.vertex_count)).astype(int)
+        return self._vertices
+
+    @property
+    def edges(self):
+        """(E, 2) array of vertex index pairs (i, j), i < j, lexicographically ordered."""
+        if self._edges is None:
+            self._edges = self.topology.edges()
+        return self._edges
+
+    def iter_edges(self):
+        """Edges as (i, j) tuples without materializing the edge array."""
+        return self.topology.iter_edges()
 
     def get_vertex(self, index):
         """Get the vertex at a specific index."""
-        return self.vertices[index]
+        if self._vertices is not None:
+            return self._vertices[index]
+        return np.array(self.topology.bits_of(int(index)), dtype=int)
 
     def get_edges(self):
         """Get all edges of the hypercube."""
         return self.edges
 
     def __repr__(self):
-        return f"Hypercube(dimension={self.dimension}, vertices={len(self.vertices)}, edges={len(self.edges)})"
+        return f"Hypercube(dimension={self.dimension}, vertices={self.topology.vertex_count}, edges={self.topology.edge_count})"
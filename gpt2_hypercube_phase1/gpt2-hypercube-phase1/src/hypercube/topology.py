@@ -1,8 +1,28 @@
 """
 Hypercube topology utilities.
+
+Every operation takes either a single vertex id (returning Python ints/lists as
+before) or a NumPy array of ids (returning arrays), so bulk callers never loop
+in Python. Vertices and edges are generated lazily; nothing of size 2^n is
+materialized unless asked for, which keeps n up to ~24 practical.
 """
 import itertools
-from typing import List
+from typing import Iterator, List, Tuple, Union
+import numpy as np
+
+# popcount of every 16-bit value; hamming() on arrays sums four lookups per uint64
+_POPCOUNT16 = np.array([bin(i).count("1") for i in range(1 << 16)], dtype=np.uint8)
+
+VertexIds = Union[int, np.ndarray]
+
+
+def popcount(x: np.ndarray) -> np.ndarray:
+    """Number of set bits of every element of a non-negative integer array."""
+    x = np.asarray(x).astype(np.uint64)
+    out = _POPCOUNT16[x & 0xFFFF].astype(np.int64)
+    for shift in (16, 32, 48):
+        out += _POPCOUNT16[(x >> np.uint64(shift)) & 0xFFFF]
+    return out
 
 
 class Hypercube:
@@ -10,32 +30,87 @@ class Hypercube:
         assert n >= 1 and isinstance(n, int)
         self.n = n
         self.vertex_count = 1 << n
+        self.edge_count = n << (n - 1)
+        self._neighbor_table = None
+        # bit flipped by neighbor column i (LSB first), and the weight of bits_of column i (MSB first)
+        self._flips = np.left_shift(1, np.arange(n, dtype=np.int64))
+        self._weights = self._flips[::-1].copy()
+
+    @property
+    def id_dtype(self):
+        return np.int32 if self.n < 31 else np.int64
 
-    def vertex_id(self, bits: List[int]) -> int:
-        """Convert list of 0/1 bits (length n) to integer vertex id."""
+    def vertex_id(self, bits) -> VertexIds:
+        """Convert 0/1 bits (length n, MSB first) to a vertex id; an (N, n) array gives (N,) ids."""
+        if isinstance(bits, np.ndarray) and bits.ndim == 2:
+            assert bits.shape[1] == self.n
+            return (bits.astype(bool).astype(np.int64) * self._weights).sum(axis=1)
         assert len(bits) == self.n
         vid = 0
         for b in bits:
             vid = (vid << 1) | (1 if b else 0)
         return vid
 
-    def bits_of(self, vid: int) -> List[int]:
+    def bits_of(self, vid: VertexIds):
+        """Bits of a vertex, MSB first; an array of N ids gives an (N, n) uint8 array."""
+        if isinstance(vid, np.ndarray):
+            return ((vid.astype(np.int64)[..., None] & self._weights) != 0).astype(np.uint8)
         assert 0 <= vid < self.vertex_count
         return [(vid >> (self.n - 1 - i)) & 1 for i in range(self.n)]
 
-    def hamming(self, a: int, b: int) -> int:
+    def hamming(self, a: VertexIds, b: VertexIds) -> VertexIds:
+        if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+            return popcount(np.bitwise_xor(a, b))
         return bin(a ^ b).count("1")
 
-    def neighbors(self, vid: int) -> List[int]:
-        """Return all vertices at Hamming distance 1 (neighbors)."""
+    def neighbors(self, vid: VertexIds):
+        """Vertices at Hamming distance 1, neighbor i flipping bit i; an array of N ids gives (N, n)."""
+        if isinstance(vid, np.ndarray):
+            return vid[..., None] ^ self._flips.astype(vid.dtype)
         neigh = []
         for i in range(self.n):
             neigh.append(vid ^ (1 << i))
         return neigh
 
-    def complement(self, vid: int) -> int:
+    def neighbor_table(self) -> np.ndarray:
+        """(vertex_count, n) array whose row v is neighbors(v), in the same order; built once."""
+        if self._neighbor_table is None:
+            self._neighbor_table = self.neighbors(np.arange(self.vertex_count, dtype=np.int64))
+        return self._neighbor_table
+
+    def complement(self, vid: VertexIds) -> VertexIds:
         mask = (1 << self.n) - 1
         return vid ^ mask
 
     def all_vertices(self) -> List[int]:
         return list(range(self.vertex_count))
+
+    def iter_vertices(self) -> range:
+        """Lazy sequence of all vertex ids."""
+        return range(self.vertex_count)
+
+    def vertex_blocks(self, block: int = 1 << 20) -> Iterator[np.ndarray]:
+        """All vertex ids as consecutive arrays of at most `block` ids."""
+        for start in range(0, self.vertex_count, block):
+            yield np.arange(start, min(start + block, self.vertex_count), dtype=self.id_dtype)
+
+    def edge_blocks(self, block: int = 1 << 20) -> Iterator[np.ndarray]:
+        """
+        All edges (u, v), u < v, as (E_i, 2) arrays in lexicographic order, generated
+        from `block` vertices at a time in O(V * n) total.
+        """
+        flips = self._flips.astype(self.id_dtype)
+        for u in self.vertex_blocks(block):
+            upper = (u[:, None] & flips) == 0
+            rows, cols = np.nonzero(upper)
+            yield np.stack([u[rows], u[rows] | flips[cols]], axis=1)
+
+    def edges(self) -> np.ndarray:
+        """(edge_count, 2) array of all edges, u < v, lexicographically ordered."""
+        blocks = list(self.edge_blocks())
+        return np.concatenate(blocks) if blocks else np.zeros((0, 2), dtype=self.id_dtype)
+
+    def iter_edges(self) -> Iterator[Tuple[int, int]]:
+        """Lazy (u, v) edge tuples, u < v, in the same order as edges()."""
+        for block in self.edge_blocks(1 << 16):
+            yield from map(tuple, block.tolist())
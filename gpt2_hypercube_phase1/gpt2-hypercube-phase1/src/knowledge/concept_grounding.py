@@ -1,48 +1,152 @@
 """
 Concept grounding onto hypercube vertices.
 
-- Default encoder: sklearn TfidfVectorizer + TruncatedSVD (lightweight).
+- Default encoder: sklearn TfidfVectorizer + TruncatedSVD (lightweight), fit once and
+  persisted with save()/load(); streaming=True adds documents incrementally.
 - Mapping rules:
   * synonyms -> adjacent vertices
   * antonyms -> complement vertex
   * hierarchies -> simple path assignment (flip one bit per level)
 - Confidence threshold enforced (default 0.75).
 - Versioned mapping saved as JSON with timestamp.
+- Bulk assignment and the enforce_* rules run on GroundingEngine (one normalized
+  matmul per block of concepts, neighbor/complement index tables from Hypercube).
+- Encodings are cached between the enforce_* passes and dropped when the encoder is refit.
 """
 import os
 import json
 import time
 from typing import Dict, List, Optional, Tuple
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer
 from sklearn.decomposition import TruncatedSVD
+from sklearn.utils.extmath import randomized_svd
 from sklearn.preprocessing import normalize
-from sklearn.metrics.pairwise import cosine_similarity
 from ..hypercube.topology import Hypercube
+from ..embeddings.cache import CachedEncoder
+from .grounding_engine import GroundingEngine
 
 
 class SimpleEncoder:
-    """Lightweight TF-IDF + SVD encoder for embeddings."""
-    def __init__(self, dim: int = 64):
+    """
+    Lightweight TF-IDF + SVD encoder for embeddings.
+
+    batch mode (default): TfidfVectorizer + TruncatedSVD fit once on a corpus.
+    streaming mode: HashingVectorizer with running document frequencies; each
+        partial_fit() chunk gets a randomized SVD whose basis is merged into the
+        running rank-k basis (QR of [V S, V_c S_c]), so new documents are added
+        without re-fitting on the full corpus.
+
+    Either mode is saved/loaded as one .npz file (vocabulary or hashing state,
+    IDF weights and the SVD basis).
+    """
+    def __init__(self, dim: int = 64, streaming: bool = False, n_features: int = 2 ** 16, seed: int = 0):
         self.dim = dim
+        self.n_components = min(dim, 32)
+        self.streaming = streaming
+        self.n_features = n_features
+        self.seed = seed
         self._vec = TfidfVectorizer(max_features=5000)
-        self._svd = TruncatedSVD(n_components=min(dim, 32))
+        self._svd = TruncatedSVD(n_components=self.n_components)
+        # streaming state: document frequencies per hashed feature, (n_features, k) basis
+        self._hasher = HashingVectorizer(n_features=n_features, alternate_sign=False, norm=None)
+        self._df = np.zeros(n_features, dtype=np.int64)
+        self._n_docs = 0
+        self._sv: Optional[np.ndarray] = None
+        # (n_features, k) projection used by encode() in both modes
+        self._basis: Optional[np.ndarray] = None
         self._fitted = False
 
+    @property
+    def fitted(self) -> bool:
+        return self._fitted
+
     def fit(self, texts: List[str]):
+        if self.streaming:
+            self._df[:] = 0
+            self._n_docs = 0
+            self._sv = self._basis = None
+            return self.partial_fit(texts)
         X = self._vec.fit_transform(texts)
         Xs = self._svd.fit_transform(X)
         Xs = normalize(Xs)
+        self._basis = self._svd.components_.T.astype(np.float32)
         self._fitted = True
         return Xs
 
+    def _stream_tfidf(self, counts):
+        idf = np.log((1.0 + self._n_docs) / (1.0 + self._df)) + 1.0
+        return normalize(counts.multiply(idf.astype(np.float32)).tocsr())
+
+    def partial_fit(self, texts: List[str]):
+        """Streaming mode: fold a chunk of new documents into the IDF and SVD basis."""
+        if not self.streaming:
+            raise ValueError("partial_fit needs SimpleEncoder(streaming=True); batch mode is fit once")
+        counts = self._hasher.transform(texts)
+        self._df += np.bincount(counts.indices, minlength=self.n_features)
+        self._n_docs += counts.shape[0]
+        X = self._stream_tfidf(counts)
+        k = min(self.n_components, X.shape[0])
+        if k:
+            _, S, Vt = randomized_svd(X, k, random_state=self.seed)
+            if self._basis is None:
+                basis, sv = Vt.T, S
+            else:
+                Q, R = np.linalg.qr(np.hstack([self._basis * self._sv, Vt.T * S]))
+                Ur, Sr, _ = np.linalg.svd(R)
+                k = min(self.n_components, Sr.size)
+                basis, sv = Q @ Ur[:, :k], Sr[:k]
+            self._basis, self._sv = basis.astype(np.float32), sv.astype(np.float32)
+            self._fitted = True
+        return normalize(np.asarray(X @ self._basis)) if self._basis is not None else None
+
     def encode(self, texts: List[str]) -> np.ndarray:
         if not self._fitted:
-            # fit on the same texts (cheap fallback)
+            # fit on the same texts (cheap fallback for a fresh encoder)
             self.fit(texts)
-        X = self._vec.transform(texts)
-        Xs = self._svd.transform(X)
-        return normalize(Xs)
+        if self.streaming:
+            X = self._stream_tfidf(self._hasher.transform(texts))
+        else:
+            X = self._vec.transform(texts)
+        return normalize(np.asarray(X @ self._basis))
+
+    def save(self, path: str):
+        if not self._fitted:
+            raise ValueError("cannot save an unfitted SimpleEncoder")
+        arrays = {
+            "meta": np.array(json.dumps({
+                "dim": self.dim, "streaming": self.streaming, "n_features": self.n_features,
+                "seed": self.seed, "n_docs": self._n_docs,
+            })),
+            "basis": self._basis,
+        }
+        if self.streaming:
+            arrays["df"] = self._df
+            arrays["sv"] = self._sv
+        else:
+            arrays["vocabulary"] = self._vec.get_feature_names_out().astype(str)
+            arrays["idf"] = self._vec.idf_
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "SimpleEncoder":
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            enc = cls(dim=meta["dim"], streaming=meta["streaming"], n_features=meta["n_features"], seed=meta["seed"])
+            enc._basis = data["basis"]
+            enc._n_docs = meta["n_docs"]
+            if enc.streaming:
+                enc._df = data["df"]
+                enc._sv = data["sv"]
+            else:
+                enc._vec = TfidfVectorizer(max_features=5000, vocabulary=list(data["vocabulary"]))
+                enc._vec.idf_ = data["idf"]
+        enc._fitted = True
+        return enc
 
 
 class ConceptGrounder:
@@ -53,9 +157,11 @@ class ConceptGrounder:
         prototype_init: Optional[np.ndarray] = None,
         conf_threshold: float = 0.75,
         mapping_dir: str = "mappings",
+        cache_bytes: int = 16 * 1024 * 1024,
     ):
         self.hypercube = hypercube
         self.encoder = encoder or SimpleEncoder(dim=64)
+        self._cache = CachedEncoder(self.encoder, max_bytes=cache_bytes) if cache_bytes else None
         # prototype vectors per vertex_id; if provided used, else random
         if prototype_init is not None:
             assert prototype_init.shape[0] == hypercube.vertex_count
@@ -71,13 +177,26 @@ class ConceptGrounder:
         # mappings:
         self.concept_to_vertex: Dict[str, Optional[int]] = {}
         self.version_history: List[Dict] = []
+        self._engine: Optional[GroundingEngine] = None
+
+    @property
+    def engine(self) -> GroundingEngine:
+        # rebuilt when self.prototypes is replaced (not when it is modified in place)
+        if self._engine is None or self._engine.source is not self.prototypes:
+            self._engine = GroundingEngine(self.hypercube, self.prototypes)
+        return self._engine
 
     def _nearest_vertex(self, vec: np.ndarray) -> Tuple[int, float]:
-        sims = cosine_similarity(vec.reshape(1, -1), self.prototypes)[0]
-        idx = int(sims.argmax())
-        return idx, float(sims[idx])
+        vids, scores = self.engine.nearest(np.asarray(vec).reshape(1, -1))
+        return int(vids[0]), float(scores[0])
+
+    def _encode_unique(self, concepts) -> Dict[str, np.ndarray]:
+        names = list(dict.fromkeys(concepts))
+        return dict(zip(names, self.encode(names))) if names else {}
 
     def encode(self, texts: List[str]) -> np.ndarray:
+        if self._cache is not None:
+            return self._cache.encode(texts)
         return self.encoder.encode(texts)
 
     def assign_single(self, concept: str, vector: np.ndarray) -> Optional[int]:
@@ -87,102 +206,44 @@ class ConceptGrounder:
         return int(vid)
 
     def assign_bulk(self, concepts: List[str], texts_for_encoder: Optional[List[str]] = None):
-        # Fit encoder if not already
+        # Fit the encoder once; a streaming encoder folds in the new texts instead
         if texts_for_encoder is None:
             texts_for_encoder = concepts
-        self.encoder.fit(texts_for_encoder)
+        refit = True
+        if not getattr(self.encoder, "fitted", False):
+            self.encoder.fit(texts_for_encoder)
+        elif getattr(self.encoder, "streaming", False):
+            self.encoder.partial_fit(texts_for_encoder)
+        else:
+            refit = False
+        if refit and self._cache is not None:
+            self._cache.clear()
         vecs = self.encode(concepts)
-        for i, c in enumerate(concepts):
-            assigned = self.assign_single(c, vecs[i])
-            self.concept_to_vertex[c] = assigned
+        self.engine.assign(concepts, vecs, self.conf_threshold, self.concept_to_vertex)
 
-    def enforce_synonyms(self, groups: List[List[str]]):
+    def enforce_synonyms(self, groups: List[List[str]], radius: int = 1):
         """
         For each synonym group, pick an anchor (first assigned or nearest) and
         assign other members to neighbors (Hamming distance 1) if confidence allows.
+        radius > 1 lets large groups continue onto the anchor's Hamming ball.
         """
-        for group in groups:
-            # encode group
-            vecs = self.encode(group)
-            # find anchor: first with existing assignment else nearest to its own prototype
-            anchor_vid = None
-            for i, c in enumerate(group):
-                if c in self.concept_to_vertex and self.concept_to_vertex[c] is not None:
-                    anchor_vid = self.concept_to_vertex[c]
-                    break
-            if anchor_vid is None:
-                # pick first's nearest
-                anchor_vid, score = self._nearest_vertex(vecs[0])
-                if score < self.conf_threshold:
-                    # fallback: skip group
-                    continue
-                self.concept_to_vertex[group[0]] = int(anchor_vid)
-            # now assign neighbors to other terms
-            neighs = self.hypercube.neighbors(anchor_vid)
-            j = 0
-            for i, c in enumerate(group):
-                if c in self.concept_to_vertex and self.concept_to_vertex[c] is not None:
-                    continue
-                if j >= len(neighs):
-                    break
-                vid_candidate = neighs[j]
-                # check similarity to candidate prototype
-                score = cosine_similarity(vecs[i].reshape(1, -1), self.prototypes[vid_candidate].reshape(1, -1))[0, 0]
-                if score >= self.conf_threshold:
-                    self.concept_to_vertex[c] = int(vid_candidate)
-                    j += 1
+        vecs = self._encode_unique(c for group in groups for c in group)
+        self.engine.synonyms(groups, vecs, self.conf_threshold, self.concept_to_vertex, radius=radius)
 
     def enforce_antonyms(self, pairs: List[Tuple[str, str]]):
         """
         For each antonym pair, assign one to vid and the other to complement(vid).
         """
-        for a, b in pairs:
-            # ensure both encoded
-            vecs = self.encode([a, b])
-            a_vid, a_score = self._nearest_vertex(vecs[0])
-            if a_score < self.conf_threshold:
-                continue
-            b_vid, b_score = self._nearest_vertex(vecs[1])
-            # prefer to place b at complement of a
-            comp = self.hypercube.complement(a_vid)
-            comp_score = cosine_similarity(vecs[1].reshape(1, -1), self.prototypes[comp].reshape(1, -1))[0, 0]
-            if comp_score >= self.conf_threshold:
-                self.concept_to_vertex[a] = int(a_vid)
-                self.concept_to_vertex[b] = int(comp)
-            else:
-                # fallback to nearest if above threshold
-                if b_score >= self.conf_threshold:
-                    self.concept_to_vertex[a] = int(a_vid)
-                    self.concept_to_vertex[b] = int(b_vid)
+        vecs = self._encode_unique(c for pair in pairs for c in pair)
+        self.engine.antonyms(pairs, vecs, self.conf_threshold, self.concept_to_vertex)
 
     def enforce_hierarchy(self, paths: List[List[str]]):
         """
         Each path is a list [hypernym, ... , hyponym].
         Map to a simple path on the hypercube: start at nearest vertex then flip one bit per step.
         """
-        for path in paths:
-            vecs = self.encode(path)
-            start_vid, start_score = self._nearest_vertex(vecs[0])
-            if start_score < self.conf_threshold:
-                continue
-            current = start_vid
-            self.concept_to_vertex[path[0]] = int(current)
-            for i in range(1, len(path)):
-                # pick a neighbor that improves similarity if possible
-                candidates = [current] + self.hypercube.neighbors(current)
-                best_vid = current
-                best_score = -1.0
-                for cand in candidates:
-                    s = cosine_similarity(vecs[i].reshape(1, -1), self.prototypes[cand].reshape(1, -1))[0, 0]
-                    if s > best_score:
-                        best_vid = cand
-                        best_score = s
-                if best_score >= self.conf_threshold:
-                    current = best_vid
-                    self.concept_to_vertex[path[i]] = int(current)
-                else:
-                    # leave unassigned if confidence low
-                    self.concept_to_vertex[path[i]] = None
+        vecs = self._encode_unique(c for path in paths for c in path)
+        self.engine.hierarchy(paths, vecs, self.conf_threshold, self.concept_to_vertex)
 
     def save_mapping(self, name: Optional[str] = None) -> str:
         ts = int(time.time())
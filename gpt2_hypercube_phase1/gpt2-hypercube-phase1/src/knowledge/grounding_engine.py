@@ -0,0 +1,149 @@
+"""
+Vectorized concept grounding over hypercube prototypes.
+
+Same rules as the per-item ConceptGrounder loops, computed in bulk:
+  - similarities are dot products of L2-normalized rows (cosine), blocked matmuls
+    against the prototype matrix with a running argmax
+  - neighbor candidates come from Hypercube.neighbor_table(), complements from an
+    XOR with the all-ones mask, and candidate scores are gathered row-wise
+  - antonym pairs and hierarchy paths do not read earlier assignments, so they are
+    scored for all items at once (hierarchies one depth level at a time); synonym
+    groups depend on anchors assigned by earlier groups and are resolved in order,
+    with only integer bookkeeping left per group
+
+Assignments are written into the mapping in the same order as the per-item loops,
+so later items overwrite earlier ones exactly as before.
+"""
+from typing import Dict, Optional, Sequence, Tuple
+import numpy as np
+from sklearn.preprocessing import normalize
+
+from ..hypercube.topology import Hypercube
+from ..hypercube.neighborhood import ball
+
+
+class GroundingEngine:
+    def __init__(self, hypercube: Hypercube, prototypes: np.ndarray, block: int = 4096):
+        """
+        prototypes: (vertex_count, dim) prototype vectors; normalized once here.
+        block: rows per similarity matmul, bounds the (block, vertex_count) temporary.
+        """
+        self.hypercube = hypercube
+        self.source = prototypes
+        self.protos = normalize(np.asarray(prototypes, dtype=np.float64))
+        self.neighbors = hypercube.neighbor_table()
+        self.block = block
+
+    def nearest(self, vecs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Most similar vertex (first on ties) and its cosine similarity, per row of vecs."""
+        vecs = normalize(np.asarray(vecs, dtype=np.float64).reshape(len(vecs), -1))
+        vids = np.zeros(len(vecs), dtype=np.int64)
+        scores = np.zeros(len(vecs), dtype=np.float64)
+        for start in range(0, len(vecs), self.block):
+            sims = vecs[start:start + self.block] @ self.protos.T
+            best = sims.argmax(axis=1)
+            vids[start:start + len(best)] = best
+            scores[start:start + len(best)] = sims[np.arange(len(best)), best]
+        return vids, scores
+
+    def scores(self, vecs: np.ndarray, cands: np.ndarray) -> np.ndarray:
+        """Cosine similarity of row i of vecs to each vertex in cands[i] ((N,) or (N, k))."""
+        vecs = normalize(np.asarray(vecs, dtype=np.float64).reshape(len(vecs), -1))
+        cands = np.asarray(cands)
+        flat = cands.reshape(len(cands), -1)
+        out = np.empty(flat.shape, dtype=np.float64)
+        step = max(1, self.block * 8 // flat.shape[1])
+        for start in range(0, len(flat), step):
+            rows = slice(start, start + step)
+            out[rows] = np.einsum("nd,nkd->nk", vecs[rows], self.protos[flat[rows]])
+        return out.reshape(cands.shape)
+
+    def assign(self, concepts: Sequence[str], vecs: np.ndarray, threshold: float,
+               mapping: Dict[str, Optional[int]]):
+        vids, scores = self.nearest(vecs)
+        for c, vid, ok in zip(concepts, vids.tolist(), (scores >= threshold).tolist()):
+            mapping[c] = vid if ok else None
+
+    def synonyms(self, groups: Sequence[Sequence[str]], vecs: Dict[str, np.ndarray], threshold: float,
+                 mapping: Dict[str, Optional[int]], radius: int = 1):
+        """
+        vecs: vector per concept name (every member of every group must be present).
+        radius: members are placed on the anchor's neighbors first, then (radius > 1)
+            on the rest of its Hamming ball in neighborhood.ball order.
+        """
+        groups = [list(g) for g in groups if len(g)]
+        if not groups:
+            return
+        # XOR masks of the Hamming spheres 2..radius around an anchor
+        far = ball(self.hypercube, 0, radius)[1 + self.hypercube.n:] if radius > 1 else None
+        pos = {c: i for i, c in enumerate(vecs)}
+        unit = normalize(np.stack([np.asarray(v, dtype=np.float64) for v in vecs.values()]))
+        first_vid, first_score = self.nearest(unit[[pos[g[0]] for g in groups]])
+        first_ok = (first_score >= threshold).tolist()
+        first_vid = first_vid.tolist()
+        for g, group in enumerate(groups):
+            anchor = next((mapping[c] for c in group if mapping.get(c) is not None), None)
+            if anchor is None:
+                if not first_ok[g]:
+                    continue
+                anchor = first_vid[g]
+                mapping[group[0]] = anchor
+            cands = self.neighbors[anchor] if far is None else np.concatenate([self.neighbors[anchor], anchor ^ far])
+            passed = (unit[[pos[c] for c in group]] @ self.protos[cands].T >= threshold).tolist()
+            cands = cands.tolist()
+            j = 0
+            for i, c in enumerate(group):
+                if mapping.get(c) is not None:
+                    continue
+                if j >= len(cands):
+                    break
+                if passed[i][j]:
+                    mapping[c] = cands[j]
+                    j += 1
+
+    def antonyms(self, pairs: Sequence[Tuple[str, str]], vecs: Dict[str, np.ndarray], threshold: float,
+                 mapping: Dict[str, Optional[int]]):
+        if not len(pairs):
+            return
+        a_vid, a_score = self.nearest(np.stack([vecs[a] for a, _ in pairs]))
+        b_vecs = np.stack([vecs[b] for _, b in pairs])
+        b_vid, b_score = self.nearest(b_vecs)
+        comp = self.hypercube.complement(a_vid)
+        comp_ok = self.scores(b_vecs, comp) >= threshold
+        a_ok = a_score >= threshold
+        b_ok = b_score >= threshold
+        b_target = np.where(comp_ok, comp, b_vid)
+        write = a_ok & (comp_ok | b_ok)
+        for (a, b), w, av, bv in zip(pairs, write.tolist(), a_vid.tolist(), b_target.tolist()):
+            if w:
+                mapping[a] = av
+                mapping[b] = bv
+
+    def hierarchy(self, paths: Sequence[Sequence[str]], vecs: Dict[str, np.ndarray], threshold: float,
+                  mapping: Dict[str, Optional[int]]):
+        paths = [list(p) for p in paths if len(p)]
+        if not paths:
+            return
+        lengths = np.array([len(p) for p in paths])
+        start, start_score = self.nearest(np.stack([vecs[p[0]] for p in paths]))
+        ok = start_score >= threshold
+        current = start.copy()
+        # assigned[p, d]: vertex for paths[p][d], -1 for "leave unassigned"
+        assigned = np.full((len(paths), int(lengths.max())), -1, dtype=np.int64)
+        assigned[:, 0] = start
+        for depth in range(1, assigned.shape[1]):
+            active = np.flatnonzero(ok & (lengths > depth))
+            if not len(active):
+                break
+            cur = current[active]
+            cands = np.concatenate([cur[:, None], self.neighbors[cur]], axis=1)
+            sims = self.scores(np.stack([vecs[paths[p][depth]] for p in active]), cands)
+            best = sims.argmax(axis=1)
+            best_score = sims[np.arange(len(active)), best]
+            moved = best_score >= threshold
+            nxt = np.where(moved, cands[np.arange(len(active)), best], cur)
+            current[active] = nxt
+            assigned[active, depth] = np.where(moved, nxt, -1)
+        for p in np.flatnonzero(ok).tolist():
+            for c, vid in zip(paths[p], assigned[p, : lengths[p]].tolist()):
+                mapping[c] = vid if vid >= 0 else None
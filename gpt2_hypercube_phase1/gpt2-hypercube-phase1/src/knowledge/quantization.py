@@ -0,0 +1,196 @@
+"""
+Vector codecs used by VectorDB storage modes.
+
+Every codec maps float32 rows to (codes, scales) and scores a float32 query against
+codes without decoding the whole matrix:
+  - float32 / float16: plain casts, scales are 1; float16 blocks are scored through
+    torch, whose SIMD half -> float cast and sgemv are several times faster than
+    numpy's scalar float16 path
+  - int8: symmetric per-vector scaling, code = round(x / scale), scale = max|x| / 127
+  - pq: product quantization; each of m subvectors is replaced by the id of its
+    nearest centroid (k <= 256, one uint8 per subvector). Queries use asymmetric
+    distance computation (ADC): a (m, k) lookup table of query-centroid dot products
+    is built once and scores are sums of table entries.
+"""
+from typing import Optional, Tuple
+import numpy as np
+import torch
+
+STORAGE_MODES = ("float32", "float16", "int8", "pq")
+
+
+class VectorCodec:
+    name = "float32"
+    code_dtype = np.float32
+    trained = True
+
+    def code_width(self, dim: int) -> int:
+        return dim
+
+    def train(self, x: np.ndarray):
+        pass
+
+    def encode(self, x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        x = np.asarray(x, dtype=np.float32)
+        return x.astype(self.code_dtype), np.ones(x.shape[0], dtype=np.float32)
+
+    def decode(self, codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+        return np.asarray(codes, dtype=np.float32)
+
+    def dot(self, codes: np.ndarray, scales: np.ndarray, q: np.ndarray) -> np.ndarray:
+        """Approximate inner products between every code row and the float32 query q."""
+        return np.asarray(codes, dtype=np.float32) @ q
+
+    def state(self) -> Optional[np.ndarray]:
+        """Trained parameters to persist alongside the codes (None if stateless)."""
+        return None
+
+
+class Float16Codec(VectorCodec):
+    name = "float16"
+    code_dtype = np.float16
+
+    def dot(self, codes: np.ndarray, scales: np.ndarray, q: np.ndarray) -> np.ndarray:
+        codes = np.asarray(codes)
+        if not codes.flags.writeable:
+            # read-only memmap: torch only wraps writable memory (a float16 copy is half an upcast)
+            codes = codes.copy()
+        q = torch.from_numpy(np.ascontiguousarray(q, dtype=np.float32))
+        return (torch.from_numpy(codes).float() @ q).numpy()
+
+
+class Int8Codec(VectorCodec):
+    name = "int8"
+    code_dtype = np.int8
+
+    def encode(self, x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        x = np.asarray(x, dtype=np.float32)
+        scales = np.abs(x).max(axis=1) / 127.0 if x.size else np.zeros(x.shape[0], dtype=np.float32)
+        safe = np.where(scales > 0, scales, 1.0)
+        codes = np.clip(np.rint(x / safe[:, None]), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    def decode(self, codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+        return np.asarray(codes, dtype=np.float32) * np.asarray(scales, dtype=np.float32)[:, None]
+
+    def dot(self, codes: np.ndarray, scales: np.ndarray, q: np.ndarray) -> np.ndarray:
+        return (np.asarray(codes, dtype=np.float32) @ q) * scales
+
+
+def _kmeans(x: np.ndarray, k: int, n_iter: int, rng: np.random.RandomState) -> np.ndarray:
+    """Plain Lloyd iterations; empty clusters are re-seeded from random points."""
+    k = min(k, x.shape[0])
+    centroids = x[rng.choice(x.shape[0], size=k, replace=False)].copy()
+    x_sq = (x * x).sum(axis=1)
+    for _ in range(n_iter):
+        d = x_sq[:, None] - 2.0 * x @ centroids.T + (centroids * centroids).sum(axis=1)[None, :]
+        assign = d.argmin(axis=1)
+        counts = np.bincount(assign, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, x)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        if empty.any():
+            centroids[empty] = x[rng.choice(x.shape[0], size=int(empty.sum()))]
+    return centroids
+
+
+class ProductQuantizer(VectorCodec):
+    name = "pq"
+    code_dtype = np.uint8
+
+    def __init__(self, n_subvectors: Optional[int] = None, n_centroids: int = 256, n_iter: int = 20,
+                 train_sample: int = 65536, min_train_samples: Optional[int] = None, seed: int = 0):
+        """
+        min_train_samples: vectors a store needs before it trains the codebook on its own
+            (default 39 per centroid; fewer leave k-means centroids poorly placed).
+        """
+        assert 1 <= n_centroids <= 256
+        self.m = n_subvectors
+        self.k = n_centroids
+        self.n_iter = n_iter
+        self.train_sample = train_sample
+        self.min_train_samples = 39 * n_centroids if min_train_samples is None else int(min_train_samples)
+        self.seed = seed
+        # (m, k, sub_dim) centroids; set by train() or from a persisted state
+        self.codebook: Optional[np.ndarray] = None
+        self.dim: Optional[int] = None
+
+    @property
+    def trained(self) -> bool:
+        return self.codebook is not None
+
+    def code_width(self, dim: int) -> int:
+        return self.m or max(1, dim // 8)
+
+    def _split(self, x: np.ndarray) -> np.ndarray:
+        """(n, dim) -> (n, m, sub_dim), zero-padding dim up to a multiple of m."""
+        m, sub = self.codebook.shape[0], self.codebook.shape[2]
+        pad = m * sub - x.shape[1]
+        if pad:
+            x = np.pad(x, ((0, 0), (0, pad)))
+        return x.reshape(x.shape[0], m, sub)
+
+    def train(self, x: np.ndarray):
+        x = np.asarray(x, dtype=np.float32)
+        rng = np.random.RandomState(self.seed)
+        if x.shape[0] > self.train_sample:
+            x = x[rng.choice(x.shape[0], size=self.train_sample, replace=False)]
+        self.dim = x.shape[1]
+        m = self.code_width(self.dim)
+        sub = -(-self.dim // m)
+        self.codebook = np.zeros((m, self.k, sub), dtype=np.float32)
+        parts = self._split(x)
+        for j in range(m):
+            c = _kmeans(parts[:, j, :], self.k, self.n_iter, rng)
+            self.codebook[j, : c.shape[0]] = c
+            # with fewer training points than k, duplicate centroids keep codes in range
+            self.codebook[j, c.shape[0]:] = c[0]
+        self.m = m
+
+    def encode(self, x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        parts = self._split(np.asarray(x, dtype=np.float32))
+        codes = np.empty((parts.shape[0], self.m), dtype=np.uint8)
+        cb_sq = (self.codebook * self.codebook).sum(axis=2)
+        for j in range(self.m):
+            d = cb_sq[j][None, :] - 2.0 * parts[:, j, :] @ self.codebook[j].T
+            codes[:, j] = d.argmin(axis=1)
+        return codes, np.ones(parts.shape[0], dtype=np.float32)
+
+    def decode(self, codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+        codes = np.asarray(codes)
+        out = np.stack([self.codebook[j][codes[:, j]] for j in range(self.m)], axis=1)
+        return out.reshape(codes.shape[0], -1)[:, : self.dim]
+
+    def lookup_table(self, q: np.ndarray) -> np.ndarray:
+        """(m, k) dot products between each query subvector and every centroid."""
+        qs = self._split(np.asarray(q, dtype=np.float32).reshape(1, -1))[0]
+        return np.einsum("mks,ms->mk", self.codebook, qs)
+
+    def dot(self, codes: np.ndarray, scales: np.ndarray, q: np.ndarray) -> np.ndarray:
+        lut = self.lookup_table(q)
+        codes = np.asarray(codes)
+        out = np.zeros(codes.shape[0], dtype=np.float32)
+        for j in range(self.m):
+            out += lut[j][codes[:, j]]
+        return out
+
+    def state(self) -> Optional[np.ndarray]:
+        return self.codebook
+
+    def load_state(self, codebook: np.ndarray, dim: int):
+        self.codebook = np.asarray(codebook, dtype=np.float32)
+        self.m, self.k = int(self.codebook.shape[0]), int(self.codebook.shape[1])
+        self.dim = int(dim)
+
+
+def make_codec(storage: str, **kwargs) -> VectorCodec:
+    if storage == "float32":
+        return VectorCodec()
+    if storage == "float16":
+        return Float16Codec()
+    if storage == "int8":
+        return Int8Codec()
+    if storage == "pq":
+        return ProductQuantizer(**kwargs)
+    raise ValueError(f"unknown storage mode {storage!r}; expected one of {STORAGE_MODES}")
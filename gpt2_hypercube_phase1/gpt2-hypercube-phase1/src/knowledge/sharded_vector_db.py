@@ -0,0 +1,224 @@
+"""
+VectorDB partitioned across local shard worker processes.
+
+Each shard process owns a plain VectorDB holding its partition of the vertex ids.
+Queries are sent to every shard before any reply is read, so the shards scan their
+partitions in parallel; the per-shard top-k lists are merged into the global top-k.
+The facade exposes the VectorDB query/query_ids/upsert/bulk_upsert/save/load
+interface and the meta/vectors accessors, so it can be passed to InferenceManager,
+RetrievalAPI or the evaluation metrics as is. Calls from several threads are
+serialised (one request/reply exchange on the shard pipes at a time).
+
+Partitioning:
+  - hash: Fibonacci hash of the vertex id, spreads neighbouring ids across shards
+  - range: contiguous vertex-id ranges of `vertex_count / n_shards` ids per shard
+
+save(path) writes a small JSON manifest at `path` and one VectorDB file per shard
+next to it (`<path>.shard<i>`); load(path) restarts the shards to match the manifest.
+"""
+import os
+import json
+import heapq
+import multiprocessing as mp
+import threading
+from typing import Dict, List, Tuple, Optional
+import numpy as np
+
+from .vector_db import VectorDB
+
+_FIB = 0x9E3779B97F4A7C15
+_MASK64 = (1 << 64) - 1
+
+
+def _shard_worker(conn, storage: str, rerank: int):
+    """Shard process main loop: (op, args) requests in, ("ok", result) / ("error", msg) out."""
+    db = VectorDB(storage=storage, rerank=rerank)
+    while True:
+        try:
+            op, args = conn.recv()
+        except EOFError:
+            break
+        if op == "close":
+            conn.send(("ok", None))
+            break
+        try:
+            if op == "query":
+                result = db.query(*args)
+            elif op == "query_ids":
+                result = db.query_ids(*args)
+            elif op == "items":
+                result = {"meta": dict(db.meta), "vectors": db.vectors}
+            elif op == "bulk_upsert":
+                result = db.bulk_upsert(*args)
+            elif op == "len":
+                result = len(db)
+            elif op == "save":
+                result = db.save(*args)
+            elif op == "load":
+                result = db.load(*args)
+            else:
+                raise ValueError(f"unknown shard op {op!r}")
+            conn.send(("ok", result))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+class ShardedVectorDB:
+    def __init__(self, n_shards: int = 4, partition: str = "hash", vertex_count: Optional[int] = None,
+                 storage: str = "float32", rerank: int = 0, start_method: Optional[str] = None):
+        """
+        n_shards: number of local shard processes.
+        partition: "hash" or "range"; range partitioning needs vertex_count
+            (e.g. Hypercube.vertex_count).
+        storage / rerank: VectorDB options of every shard.
+        """
+        if partition not in ("hash", "range"):
+            raise ValueError(f"unknown partition {partition!r}; expected 'hash' or 'range'")
+        if partition == "range" and not vertex_count:
+            raise ValueError("range partitioning needs vertex_count")
+        self.partition = partition
+        self.vertex_count = vertex_count
+        self.storage = storage
+        self.rerank = int(rerank)
+        self._ctx = mp.get_context(start_method)
+        self._procs = []
+        self._conns = []
+        # the pipes carry one exchange at a time; concurrent callers would interleave replies
+        self._lock = threading.Lock()
+        self._start(n_shards)
+
+    @property
+    def n_shards(self) -> int:
+        return len(self._conns)
+
+    def _start(self, n_shards: int):
+        for _ in range(n_shards):
+            parent, child = self._ctx.Pipe()
+            proc = self._ctx.Process(target=_shard_worker, args=(child, self.storage, self.rerank), daemon=True)
+            proc.start()
+            child.close()
+            self._procs.append(proc)
+            self._conns.append(parent)
+
+    def close(self):
+        with self._lock:
+            self._close_locked()
+
+    def _close_locked(self):
+        for conn, proc in zip(self._conns, self._procs):
+            try:
+                conn.send(("close", None))
+                conn.recv()
+            except (EOFError, OSError, BrokenPipeError):
+                pass
+            conn.close()
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.terminate()
+        self._procs, self._conns = [], []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def shard_of(self, vertex_id: int) -> int:
+        vid = int(vertex_id)
+        if self.partition == "range":
+            return min(self.n_shards - 1, max(0, vid * self.n_shards // self.vertex_count))
+        return ((vid * _FIB) & _MASK64) * self.n_shards >> 64
+
+    def _call(self, requests: Dict[int, Tuple[str, tuple]]) -> Dict[int, object]:
+        """Send every request before reading any reply so the shards work in parallel."""
+        results, errors = {}, []
+        with self._lock:
+            for shard, req in requests.items():
+                self._conns[shard].send(req)
+            for shard in requests:
+                status, value = self._conns[shard].recv()
+                if status == "error":
+                    errors.append(f"shard {shard}: {value}")
+                results[shard] = value
+        if errors:
+            raise RuntimeError("; ".join(errors))
+        return results
+
+    def _broadcast(self, op: str, *args) -> List[object]:
+        results = self._call({i: (op, args) for i in range(self.n_shards)})
+        return [results[i] for i in range(self.n_shards)]
+
+    def upsert(self, vertex_id: int, vector: np.ndarray, meta: Dict = None):
+        self.bulk_upsert([(vertex_id, vector, meta)])
+
+    def bulk_upsert(self, items: List[Tuple[int, np.ndarray, Dict]]):
+        parts: Dict[int, list] = {}
+        for vid, vec, m in items:
+            parts.setdefault(self.shard_of(vid), []).append((int(vid), np.asarray(vec, dtype=np.float32), m))
+        self._call({shard: ("bulk_upsert", (part,)) for shard, part in parts.items()})
+
+    def query(self, qvec: np.ndarray, top_k: int = 5):
+        q = np.asarray(qvec, dtype=np.float32)
+        per_shard = self._broadcast("query", q, top_k)
+        return heapq.nlargest(top_k, (r for res in per_shard for r in res), key=lambda r: r["score"])
+
+    def query_ids(self, qvec: np.ndarray, vertex_ids, top_k: Optional[int] = None):
+        """Cosine scores of the items stored at vertex_ids only; asks just the shards owning them."""
+        q = np.asarray(qvec, dtype=np.float32)
+        parts: Dict[int, list] = {}
+        for vid in np.asarray(vertex_ids, dtype=np.int64).reshape(-1).tolist():
+            parts.setdefault(self.shard_of(vid), []).append(vid)
+        if not parts:
+            return []
+        results = self._call({shard: ("query_ids", (q, ids, top_k)) for shard, ids in parts.items()})
+        merged = (r for res in results.values() for r in res)
+        if top_k is None:
+            return sorted(merged, key=lambda r: r["score"], reverse=True)
+        return heapq.nlargest(top_k, merged, key=lambda r: r["score"])
+
+    def _items(self) -> Dict[str, Dict]:
+        meta, vectors = {}, {}
+        for part in self._broadcast("items"):
+            meta.update(part["meta"])
+            vectors.update(part["vectors"])
+        return {"meta": meta, "vectors": vectors}
+
+    @property
+    def meta(self) -> Dict[int, Dict]:
+        """vertex_id -> meta, gathered from every shard (a copy)."""
+        return self._items()["meta"]
+
+    @property
+    def vectors(self) -> Dict[int, np.ndarray]:
+        """vertex_id -> vector, gathered from every shard (a copy)."""
+        return self._items()["vectors"]
+
+    def __len__(self) -> int:
+        return sum(self._broadcast("len"))
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        shard_paths = [f"{path}.shard{i}" for i in range(self.n_shards)]
+        self._call({i: ("save", (p,)) for i, p in enumerate(shard_paths)})
+        manifest = {
+            "n_shards": self.n_shards,
+            "partition": self.partition,
+            "vertex_count": self.vertex_count,
+            "shards": [os.path.basename(p) for p in shard_paths],
+        }
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, path)
+
+    def load(self, path: str):
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest["n_shards"] != self.n_shards:
+            with self._lock:
+                self._close_locked()
+                self._start(manifest["n_shards"])
+        self.partition = manifest["partition"]
+        self.vertex_count = manifest["vertex_count"]
+        base = os.path.dirname(path)
+        self._call({i: ("load", (os.path.join(base, name),)) for i, name in enumerate(manifest["shards"])})
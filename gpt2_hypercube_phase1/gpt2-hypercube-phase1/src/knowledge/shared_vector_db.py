@@ -0,0 +1,303 @@
+"""
+VectorDB shared by several processes on one machine.
+
+One writer process owns a store directory. Each publication is written as an
+immutable generation file in the VectorDB binary format, then a memory-mapped
+generation counter is bumped. Reader processes map the generation files
+read-only, so the vectors live once in the OS page cache however many workers
+attach, and a query only compares the counter against the generation it has
+mapped before deciding to re-map.
+
+A publication only writes the staged upserts, as a delta generation on top of
+the newest base generation; a query scans the base and its deltas and skips rows
+a newer file overrides. Every `compact_every` deltas the writer merges them into
+a new base generation, so the full store is rewritten once per compaction
+instead of once per publication.
+
+Directory layout:
+  - GENERATION: 8-byte little-endian uint64 counter (0 = nothing published yet)
+  - gen_<N>.base.vdb: the whole store at generation N
+  - gen_<N>.delta.vdb: the rows upserted at generation N
+  Generation N is its newest base at or below N plus the deltas after it. The
+  writer keeps the files the newest `keep_generations` generations need; readers
+  still mapping a removed file keep working, and files the OS refuses to delete
+  while they are mapped (Windows) are retried on the next publication.
+"""
+import copy
+import heapq
+import os
+import re
+import time
+from typing import Dict, List, Tuple
+import numpy as np
+
+from .vector_db import VectorDB, VectorSnapshot
+
+GENERATION_FILE = "GENERATION"
+_GEN_FILE = re.compile(r"gen_(\d{8})\.(base|delta)\.vdb$")
+
+
+class _Segment:
+    """One mapped generation file and the mask of its rows no newer file overrides."""
+    __slots__ = ("gen", "db", "live")
+
+    def __init__(self, gen: int, db: VectorDB):
+        self.gen = gen
+        self.db = db
+        self.live = None  # None = every row is live
+
+    def hide(self, ids: np.ndarray):
+        snap = self.db.snapshot()
+        stale = np.isin(snap.ids[:snap.count], ids)
+        if stale.any():
+            self.live = ~stale if self.live is None else self.live & ~stale
+
+
+class SharedVectorDB:
+    def __init__(self, root: str, writer: bool = False, storage: str = "float32", rerank: int = 0,
+                 publish_every: int = 256, keep_generations: int = 2, compact_every: int = 16):
+        """
+        root: store directory shared by all processes.
+        writer: exactly one process per root should pass True; it stages upserts and
+            publishes a new generation once `publish_every` are pending (or on publish()).
+        storage / rerank: VectorDB options used by the writer for new stores.
+        compact_every: deltas on top of a base before the writer writes a new base.
+        """
+        self.root = root
+        self.writer = writer
+        self.storage = storage
+        self.rerank = int(rerank)
+        self.publish_every = max(1, int(publish_every))
+        self.keep_generations = max(1, int(keep_generations))
+        self.compact_every = max(1, int(compact_every))
+        self._segments: List[_Segment] = []
+        self._pending: List[Tuple[int, np.ndarray, Dict]] = []
+        self._gen = 0
+        os.makedirs(root, exist_ok=True)
+        counter = os.path.join(root, GENERATION_FILE)
+        if writer and not os.path.exists(counter):
+            with open(counter, "wb") as f:
+                f.write(np.zeros(1, dtype=np.uint64).tobytes())
+        while not os.path.exists(counter):
+            # reader started before the writer created the directory
+            time.sleep(0.05)
+        self._counter = np.memmap(counter, dtype=np.uint64, mode="r+" if writer else "r", shape=(1,))
+        self.refresh()
+
+    def _path(self, gen: int, kind: str) -> str:
+        return os.path.join(self.root, f"gen_{gen:08d}.{kind}.vdb")
+
+    @property
+    def generation(self) -> int:
+        """Generation currently mapped by this process."""
+        return self._gen
+
+    def _chain(self, gen: int) -> List[Tuple[int, str]]:
+        """(generation, path) of the base and deltas making up `gen`, oldest first."""
+        chain = []
+        for g in range(gen, 0, -1):
+            base = self._path(g, "base")
+            if os.path.exists(base):
+                chain.append((g, base))
+                return chain[::-1]
+            delta = self._path(g, "delta")
+            if not os.path.exists(delta):
+                raise FileNotFoundError(delta)
+            chain.append((g, delta))
+        raise FileNotFoundError(f"no base generation at or below {gen} in {self.root}")
+
+    def _map(self, gen: int):
+        mapped = {s.gen: s for s in self._segments}
+        segments = []
+        for g, path in self._chain(gen):
+            seg = mapped.get(g)
+            if seg is None:
+                db = VectorDB()
+                db.load(path, mmap=True)
+                seg = _Segment(g, db)
+            segments.append(seg)
+        if [s.gen for s in segments[:len(self._segments)]] != [s.gen for s in self._segments]:
+            # new base: recompute every mask
+            for seg in segments:
+                seg.live = None
+            known = 0
+        else:
+            known = len(self._segments)
+        for i in range(max(known, 1), len(segments)):
+            snap = segments[i].db.snapshot()
+            ids = snap.ids[:snap.count]
+            for older in segments[:i]:
+                older.hide(ids)
+        self._segments = segments
+        self._gen = gen
+
+    def refresh(self) -> bool:
+        """Map the newest published generation if it changed; returns True when it did."""
+        gen = int(self._counter[0])
+        if gen == self._gen:
+            return False
+        while True:
+            try:
+                self._map(gen)
+                return True
+            except FileNotFoundError:
+                # the writer published again and collected a file meanwhile; retry with the newest
+                newer = int(self._counter[0])
+                if newer == gen:
+                    raise
+                gen = newer
+
+    def query(self, qvec: np.ndarray, top_k: int = 5):
+        self.refresh()
+        hits = []
+        for seg in self._segments:
+            hits.extend(seg.db.snapshot().query(qvec, top_k=top_k, rerank=seg.db.rerank, live=seg.live))
+        return heapq.nlargest(top_k, hits, key=lambda r: r["score"])
+
+    def query_ids(self, qvec: np.ndarray, vertex_ids, top_k: int = None):
+        """Cosine scores of the items stored at vertex_ids only (e.g. a Hamming ball)."""
+        self.refresh()
+        hits = []
+        for seg in self._segments:
+            hits.extend(seg.db.snapshot().query_ids(qvec, vertex_ids, live=seg.live))
+        return heapq.nlargest(top_k or len(hits), hits, key=lambda r: r["score"])
+
+    def __len__(self) -> int:
+        self.refresh()
+        return sum(len(s.db) if s.live is None else int(np.count_nonzero(s.live)) for s in self._segments)
+
+    @property
+    def dim(self) -> int:
+        return self._segments[0].db.dim if self._segments else 0
+
+    def memory_usage(self) -> Dict[str, int]:
+        usage: Dict[str, int] = {}
+        for seg in self._segments:
+            for key, value in seg.db.memory_usage().items():
+                usage[key] = usage.get(key, 0) + value
+            if seg.live is not None:
+                usage["total"] += int(seg.live.nbytes)
+        return usage or VectorDB().memory_usage()
+
+    def upsert(self, vertex_id: int, vector: np.ndarray, meta: Dict = None):
+        self.bulk_upsert([(vertex_id, vector, meta)])
+
+    def bulk_upsert(self, items: List[Tuple[int, np.ndarray, Dict]]):
+        if not self.writer:
+            raise PermissionError("SharedVectorDB opened read-only; upserts go through the writer process")
+        dim = self.dim or (self._pending[0][1].shape[0] if self._pending else 0)
+        items = [(int(vid), np.asarray(vec, dtype=np.float32).reshape(-1), m) for vid, vec, m in items]
+        for _, vec, _ in items:
+            if dim and vec.shape[0] != dim:
+                raise ValueError(f"vector dim {vec.shape[0]} does not match store dim {dim}")
+            dim = vec.shape[0]
+        self._pending.extend(items)
+        if len(self._pending) >= self.publish_every:
+            self.publish()
+
+    def publish(self) -> int:
+        """
+        Write the staged upserts as the next generation and bump the counter: a delta
+        holding just those rows, or a new base every `compact_every` deltas. The
+        writer maps the files it wrote, so it keeps no private copy of the store either.
+        """
+        if not self.writer:
+            raise PermissionError("only the writer process can publish")
+        if not self._pending:
+            return self._gen
+        items, self._pending = self._pending, []
+        if not self._segments or len(self._segments) > self.compact_every:
+            db = self._merged()
+            db.bulk_upsert(items)
+            return self._publish(db, "base")
+        base = self._segments[0].db
+        # deltas are encoded with (a copy of) the base's codec, its codebook included, and
+        # never train one of their own, so compaction can concatenate their codes
+        db = VectorDB.from_snapshot(VectorSnapshot.empty(copy.deepcopy(base.snapshot().codec)),
+                                    base.storage, base.rerank)
+        db.bulk_upsert(items)
+        return self._publish(db, "delta")
+
+    def _merged(self) -> VectorDB:
+        """The live rows of every mapped segment in one in-memory store (compaction)."""
+        if not self._segments:
+            return VectorDB(storage=self.storage, rerank=self.rerank)
+        base = self._segments[0].db
+        snaps = [(s.db.snapshot(), s.live) for s in self._segments]
+        codec = snaps[0][0].codec
+        same_codec = all(s.codec.trained == codec.trained and s.codec.name == codec.name
+                         and np.array_equal(_state(s.codec), _state(codec)) for s, _ in snaps)
+        if not same_codec:
+            db = VectorDB(storage=base.storage, rerank=base.rerank)
+            for snap, live in snaps:
+                rows = snap.vectors()
+                keep = snap.ids[:snap.count] if live is None else snap.ids[:snap.count][live]
+                db.bulk_upsert([(int(v), rows[int(v)], snap.meta.get(int(v))) for v in keep.tolist()])
+            return db
+
+        def take(arr, snap, live):
+            arr = arr[:snap.count]
+            return np.asarray(arr if live is None else arr[live])
+
+        keep_full = all(s.full is not None for s, _ in snaps)
+        ids = np.concatenate([take(s.ids, s, live) for s, live in snaps])
+        meta = {}
+        for snap, live in snaps:
+            for vid in take(snap.ids, snap, live).tolist():
+                meta[vid] = snap.meta.get(vid)
+        merged = VectorSnapshot(
+            copy.deepcopy(codec),
+            np.concatenate([take(s.codes, s, live) for s, live in snaps]),
+            np.concatenate([take(s.scales, s, live) for s, live in snaps]),
+            np.concatenate([take(s.norms, s, live) for s, live in snaps]),
+            ids,
+            np.concatenate([take(s.full, s, live) for s, live in snaps]) if keep_full else None,
+            len(ids), snaps[0][0].dim, meta,
+        )
+        return VectorDB.from_snapshot(merged, base.storage, base.rerank)
+
+    def _publish(self, db: VectorDB, kind: str) -> int:
+        gen = int(self._counter[0]) + 1
+        # an untrained PQ base is trained when a compaction writes the next base
+        db.save(self._path(gen, kind), train=kind == "base")
+        self._map(gen)
+        self._counter[0] = gen
+        self._counter.flush()
+        self._collect()
+        return gen
+
+    def _collect(self):
+        """Remove the files no generation among the newest `keep_generations` needs."""
+        oldest = max(1, self._gen - self.keep_generations + 1)
+        try:
+            needed = self._chain(oldest)[0][0]
+        except FileNotFoundError:
+            needed = self._segments[0].gen
+        for name in os.listdir(self.root):
+            match = _GEN_FILE.match(name)
+            if match is None or int(match.group(1)) >= needed:
+                continue
+            try:
+                os.remove(os.path.join(self.root, name))
+            except PermissionError:
+                # still mapped by a reader on a platform that forbids it; next publication retries
+                pass
+
+    def save(self, path: str):
+        """Write the current generation as one VectorDB file."""
+        self.refresh()
+        self._merged().save(path)
+
+    def load(self, path: str):
+        """Writer only: publish the contents of a VectorDB file as the next (base) generation."""
+        if not self.writer:
+            raise PermissionError("only the writer process can load a new store")
+        self._pending = []
+        db = VectorDB()
+        db.load(path, mmap=True)
+        return self._publish(db, "base")
+
+
+def _state(codec):
+    state = codec.state()
+    return np.zeros(0, dtype=np.float32) if state is None else state
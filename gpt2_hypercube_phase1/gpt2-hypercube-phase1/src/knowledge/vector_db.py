@@ -1,56 +1,582 @@
 """
 Lightweight in-memory vector DB keyed by vertex id with cosine NN retrieval.
+
+Vectors are kept in one contiguous (N, width) code matrix with a parallel id array
+and precomputed L2 norms, so a query is a single blocked scan. The storage mode
+(float32, float16, int8, pq; see quantization.py) is chosen per store. Quantized
+stores can re-rank the best approximate candidates against full-precision vectors,
+which stay memory-mapped on disk after a load.
+
+Concurrency: readers never lock. Every query runs against the current
+``VectorSnapshot`` (arrays + metadata + count), which is never modified once
+published. Writers serialize on a lock, stage upserts and publish a new snapshot
+by a single attribute swap; appends go into spare capacity past the published
+count, and only updates of visible rows copy the arrays (copy-on-write). The
+metadata map is copied on every publish, so ``publish_every`` > 1 amortizes
+those copies over a batch of upserts.
+
+On-disk format (``save``/``load``), all sections 64-byte aligned:
+  - header: magic, version, storage mode, count, dim, code width and section offsets
+  - codes: count x width in the storage dtype, row-major
+  - scales: count float32 (per-vector int8 scale; 1 for other modes)
+  - norms: count float32 (L2 norm of each full-precision row)
+  - ids: count int64
+  - codebook: PQ centroids (m x k x sub_dim float32), pq mode only
+  - full: count x dim float32, quantized stores kept for re-ranking only
+  - meta index: count + 1 uint64 offsets into the meta blob
+  - meta blob: concatenated UTF-8 JSON documents, one per row
+
+``load`` maps the file with np.memmap, so several server processes share the
+page cache and nothing is copied until the store is mutated. Version 1 files
+(float32/float16 matrix only) and legacy pickle files written by older versions
+are still accepted by ``load``; ``convert_pickle_store`` rewrites the latter.
 """
 import os
 import json
 import pickle
-from typing import Dict, List, Tuple
+import copy
+import struct
+import threading
+import warnings
+from collections.abc import Mapping, MutableMapping
+from types import MappingProxyType
+from typing import Dict, List, Tuple, Optional
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 
+from .quantization import STORAGE_MODES, VectorCodec, make_codec
 
-class VectorDB:
-    def __init__(self):
-        # vertex_id -> vector (np.float32)
-        self.vectors: Dict[int, np.ndarray] = {}
+_MAGIC = b"VDBM"
+_VERSION = 2
+_ALIGN = 64
+# magic, version, storage code, has_full, count, dim, width, rerank, pq centroids,
+# offsets (codes, scales, norms, ids, codebook, full, meta index, meta blob)
+_HEADER = struct.Struct("<4sIII QQQQQ QQQQQQQQ")
+# version 1: magic, version, dtype code, reserved, count, dim, offsets (matrix, ids, norms, meta index, meta blob)
+_HEADER_V1 = struct.Struct("<4sIII QQ QQQQQ")
+_V1_STORAGE = {0: "float32", 1: "float16"}
+# rows scored per block in query(); bounds temporaries for quantized / memmapped matrices
+_QUERY_BLOCK = 4096
+
+
+def _align(offset: int) -> int:
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+class _MetaBlob(MutableMapping):
+    """
+    Read-only metadata blob decoded lazily per vertex, with a dict overlay for writes.
+    Lookups by vertex id go through a row index built on first use.
+    """
+    def __init__(self, ids: np.ndarray, offsets: np.ndarray, blob: np.ndarray):
+        self._ids = ids
+        self._offsets = offsets
+        self._blob = blob
+        self._rows: Optional[Dict[int, int]] = None
+        self._overlay: Dict[int, Dict] = {}
+        self._deleted = set()
+
+    def _row_of(self, vid: int) -> Optional[int]:
+        if self._rows is None:
+            self._rows = {int(v): i for i, v in enumerate(self._ids.tolist())}
+        return self._rows.get(int(vid))
+
+    def __getitem__(self, vid):
+        vid = int(vid)
+        if vid in self._overlay:
+            return self._overlay[vid]
+        row = self._row_of(vid)
+        if row is None or vid in self._deleted:
+            raise KeyError(vid)
+        start, end = int(self._offsets[row]), int(self._offsets[row + 1])
+        return json.loads(self._blob[start:end].tobytes().decode("utf-8"))
+
+    def __setitem__(self, vid, value):
+        self._overlay[int(vid)] = value
+        self._deleted.discard(int(vid))
+
+    def __delitem__(self, vid):
+        vid = int(vid)
+        if vid not in self:
+            raise KeyError(vid)
+        self._overlay.pop(vid, None)
+        self._deleted.add(vid)
+
+    def __iter__(self):
+        for vid in self._ids.tolist():
+            if vid not in self._deleted and vid not in self._overlay:
+                yield int(vid)
+        yield from self._overlay
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __contains__(self, vid):
+        vid = int(vid)
+        return vid in self._overlay or (vid not in self._deleted and self._row_of(vid) is not None)
+
+    def copy(self) -> "_MetaBlob":
+        new = _MetaBlob(self._ids, self._offsets, self._blob)
+        new._rows = self._rows
+        new._overlay = dict(self._overlay)
+        new._deleted = set(self._deleted)
+        return new
+
+
+def _normalize(dots: np.ndarray, norms: np.ndarray, q: np.ndarray) -> np.ndarray:
+    # zero-norm rows/queries score 0, as with sklearn's cosine_similarity
+    denom = np.asarray(norms, dtype=np.float32) * float(np.linalg.norm(q))
+    return np.divide(dots, denom, out=np.zeros_like(dots), where=denom > 0)
+
+
+def _top(sims: np.ndarray, k: int) -> np.ndarray:
+    k = min(k, sims.shape[0])
+    idx = np.argpartition(-sims, k - 1)[:k]
+    return idx[np.argsort(-sims[idx], kind="stable")]
+
+
+class VectorSnapshot:
+    """
+    One published version of a VectorDB: rows [0, count) of the arrays below.
+    Writers never modify rows a published snapshot can see, so it is safe to read
+    from any thread without locking.
+    """
+    __slots__ = ("codec", "codes", "scales", "norms", "ids", "full", "count", "dim", "meta", "version")
+
+    def __init__(self, codec: VectorCodec, codes: np.ndarray, scales: np.ndarray, norms: np.ndarray,
+                 ids: np.ndarray, full: Optional[np.ndarray], count: int, dim: int,
+                 meta: MutableMapping, version: int = 0):
+        self.codec = codec
+        self.codes = codes
+        self.scales = scales
+        self.norms = norms
+        self.ids = ids
+        # full-precision rows of a quantized store (re-ranking / untrained PQ), else None
+        self.full = full
+        self.count = count
+        self.dim = dim
         # vertex_id -> canonical snippet / metadata
-        self.meta: Dict[int, Dict] = {}
+        self.meta = meta
+        self.version = version
 
-    def upsert(self, vertex_id: int, vector: np.ndarray, meta: Dict = None):
-        self.vectors[int(vertex_id)] = np.asarray(vector, dtype=np.float32)
-        self.meta[int(vertex_id)] = meta or {}
+    @classmethod
+    def empty(cls, codec: VectorCodec) -> "VectorSnapshot":
+        f32 = np.zeros(0, dtype=np.float32)
+        return cls(codec, np.zeros((0, 0), dtype=codec.code_dtype), f32, f32, np.zeros(0, dtype=np.int64),
+                   None, 0, 0, {})
 
-    def bulk_upsert(self, items: List[Tuple[int, np.ndarray, Dict]]):
-        for vid, vec, m in items:
-            self.upsert(vid, vec, m)
+    def __len__(self) -> int:
+        return self.count
 
-    def _stack(self):
-        if not self.vectors:
-            return np.zeros((0, 1), dtype=np.float32), []
-        ids = sorted(self.vectors.keys())
-        mat = np.vstack([self.vectors[i] for i in ids])
-        return mat, ids
+    def vectors(self) -> Dict[int, np.ndarray]:
+        n = self.count
+        if self.full is not None:
+            mat = self.full[:n]
+        elif self.codec.name == "float32":
+            mat = self.codes[:n]
+        else:
+            mat = self.codec.decode(self.codes[:n], self.scales[:n])
+        return {int(v): mat[i] for i, v in enumerate(self.ids[:n].tolist())}
 
-    def query(self, qvec: np.ndarray, top_k: int = 5):
-        q = np.asarray(qvec, dtype=np.float32).reshape(1, -1)
-        mat, ids = self._stack()
-        if mat.shape[0] == 0:
+    def _cosine_scores(self, q: np.ndarray) -> np.ndarray:
+        n = self.count
+        if not self.codec.trained:
+            # PQ store queried before its codebook exists: score the full-precision rows
+            return _normalize(np.asarray(self.full[:n], dtype=np.float32) @ q, self.norms[:n], q)
+        sims = np.empty(n, dtype=np.float32)
+        for start in range(0, n, _QUERY_BLOCK):
+            stop = min(n, start + _QUERY_BLOCK)
+            sims[start:stop] = self.codec.dot(self.codes[start:stop], self.scales[start:stop], q)
+        return _normalize(sims, self.norms[:n], q)
+
+    def query(self, qvec: np.ndarray, top_k: int = 5, rerank: int = 0, live: Optional[np.ndarray] = None):
+        """live: optional boolean mask over the rows; rows where it is False are never returned."""
+        if live is not None:
+            top_k = min(top_k, int(np.count_nonzero(live)))
+        if self.count == 0 or top_k <= 0:
             return []
-        sims = cosine_similarity(q, mat)[0]
-        idx = sims.argsort()[::-1][:top_k]
+        q = np.asarray(qvec, dtype=np.float32).reshape(-1)
+        sims = self._cosine_scores(q)
+        if live is not None:
+            sims[~live] = -np.inf
+        if rerank > 0 and self.full is not None and self.codec.trained:
+            cand = _top(sims, max(top_k, rerank))
+            cand = np.sort(cand[np.isfinite(sims[cand])])
+            exact = _normalize(np.asarray(self.full[cand], dtype=np.float32) @ q, self.norms[cand], q)
+            order = _top(exact, top_k)
+            idx, scores = cand[order], exact[order]
+        else:
+            idx = _top(sims, top_k)
+            scores = sims[idx]
         results = []
-        for i in idx:
-            vid = ids[i]
-            results.append({"vertex_id": int(vid), "score": float(sims[i]), "meta": self.meta.get(vid)})
+        for i, s in zip(idx, scores):
+            vid = int(self.ids[i])
+            results.append({"vertex_id": vid, "score": float(s), "meta": self.meta.get(vid)})
         return results
 
-    def save(self, path: str):
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        with open(path, "wb") as f:
-            pickle.dump({"vectors": self.vectors, "meta": self.meta}, f)
+    def query_ids(self, qvec: np.ndarray, vertex_ids, top_k: Optional[int] = None,
+                  live: Optional[np.ndarray] = None):
+        """Score only the rows stored under vertex_ids (full precision when kept), best first."""
+        n = self.count
+        if n == 0:
+            return []
+        rows = np.flatnonzero(np.isin(self.ids[:n], np.asarray(vertex_ids, dtype=np.int64)))
+        if live is not None:
+            rows = rows[live[rows]]
+        if not len(rows):
+            return []
+        q = np.asarray(qvec, dtype=np.float32).reshape(-1)
+        if self.full is not None:
+            dots = np.asarray(self.full[rows], dtype=np.float32) @ q
+        else:
+            dots = self.codec.dot(self.codes[rows], self.scales[rows], q)
+        sims = _normalize(dots, self.norms[rows], q)
+        order = _top(sims, top_k or len(rows))
+        return [{"vertex_id": int(self.ids[rows[i]]), "score": float(sims[i]), "meta": self.meta.get(int(self.ids[rows[i]]))}
+                for i in order]
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Resident bytes per component for the live rows (memmapped arrays count as 0)."""
+        n = self.count
+
+        def resident(arr):
+            if arr is None or isinstance(arr, np.memmap):
+                return 0
+            return int(arr[:n].nbytes)
+
+        codebook = self.codec.state()
+        usage = {
+            "codes": resident(self.codes),
+            "scales": resident(self.scales),
+            "norms": resident(self.norms),
+            "ids": resident(self.ids),
+            "full": resident(self.full),
+            "codebook": 0 if codebook is None else int(codebook.nbytes),
+        }
+        usage["total"] = sum(usage.values())
+        return usage
 
-    def load(self, path: str):
+
+class VectorDB:
+    def __init__(self, storage: str = "float32", rerank: int = 0,
+                 pq_subvectors: Optional[int] = None, pq_centroids: int = 256, pq_min_train: Optional[int] = None,
+                 publish_every: int = 1):
+        """
+        storage: float32 | float16 | int8 | pq
+        rerank: when > 0, the best `max(top_k, rerank)` approximate hits of a quantized
+            store are re-scored against full-precision vectors (kept alongside the codes).
+        pq_subvectors / pq_centroids: product quantizer shape (default dim // 8 subvectors).
+        pq_min_train: stored vectors needed before the first query or save trains the
+            quantizer on them (default 39 * pq_centroids). A smaller store warns and
+            scores its full-precision vectors until train() is called; train() again
+            after the data has drifted, a trained codebook is never refreshed on its own.
+        publish_every: staged upserts are published to readers once this many are pending
+            (1 = every upsert is visible immediately); publish() forces it.
+        """
+        if storage not in STORAGE_MODES:
+            raise ValueError(f"unknown storage mode {storage!r}; expected one of {STORAGE_MODES}")
+        self.storage = storage
+        self.rerank = int(rerank)
+        self.publish_every = max(1, int(publish_every))
+        self._codec_kwargs = {"n_subvectors": pq_subvectors, "n_centroids": pq_centroids,
+                              "min_train_samples": pq_min_train} if storage == "pq" else {}
+        self._write_lock = threading.RLock()
+        self._pending: List[Tuple[int, np.ndarray, Dict]] = []
+        # vertex_id -> row, writer-side; built lazily after a memmapped load
+        self._rows: Optional[Dict[int, int]] = {}
+        self._snapshot = VectorSnapshot.empty(make_codec(storage, **self._codec_kwargs))
+
+    @classmethod
+    def from_snapshot(cls, snapshot: VectorSnapshot, storage: str, rerank: int = 0) -> "VectorDB":
+        """A store publishing `snapshot` as is (its codec included, e.g. a trained PQ codebook)."""
+        db = cls(storage=storage, rerank=rerank)
+        db._snapshot = snapshot
+        db._rows = None
+        return db
+
+    def snapshot(self) -> VectorSnapshot:
+        """Current published version; stays valid and unchanged while writers continue."""
+        return self._snapshot
+
+    @property
+    def dim(self) -> int:
+        snap = self._snapshot
+        return snap.dim if snap.count else 0
+
+    @property
+    def meta(self) -> Mapping:
+        """vertex_id -> meta of the current snapshot (read-only; write through upsert)."""
+        return MappingProxyType(self._snapshot.meta)
+
+    @property
+    def vectors(self) -> Dict[int, np.ndarray]:
+        """vertex_id -> vector (read-only convenience for callers of the old dict API)."""
+        return self._snapshot.vectors()
+
+    def __len__(self) -> int:
+        return self._snapshot.count
+
+    def _keeps_full(self, codec: VectorCodec) -> bool:
+        return codec.name != "float32" and (self.rerank > 0 or not codec.trained)
+
+    def _row_index(self) -> Dict[int, int]:
+        if self._rows is None:
+            snap = self._snapshot
+            self._rows = {int(v): i for i, v in enumerate(snap.ids[: snap.count].tolist())}
+        return self._rows
+
+    def upsert(self, vertex_id: int, vector: np.ndarray, meta: Dict = None):
+        self.bulk_upsert([(vertex_id, vector, meta)])
+
+    def bulk_upsert(self, items: List[Tuple[int, np.ndarray, Dict]]):
+        if not items:
+            return
+        vecs = np.vstack([np.asarray(vec, dtype=np.float32).reshape(1, -1) for _, vec, _ in items])
+        with self._write_lock:
+            dim = self._pending[0][1].shape[0] if self._pending else self.dim
+            if dim and vecs.shape[1] != dim:
+                raise ValueError(f"vector dim {vecs.shape[1]} does not match store dim {dim}")
+            self._pending.extend((int(vid), vec, m) for (vid, _, m), vec in zip(items, vecs))
+            if len(self._pending) >= self.publish_every:
+                self._publish_locked()
+
+    def publish(self) -> VectorSnapshot:
+        """Publish all staged upserts as a new snapshot and return it."""
+        with self._write_lock:
+            if self._pending:
+                self._publish_locked()
+            return self._snapshot
+
+    def _publish_locked(self):
+        items, self._pending = self._pending, []
+        old = self._snapshot
+        n, dim, codec = old.count, items[0][1].shape[0], old.codec
+        rows = self._row_index()
+        target = np.empty(len(items), dtype=np.int64)
+        new_ids = []
+        for i, (vid, _, _) in enumerate(items):
+            row = rows.get(vid)
+            if row is None:
+                row = n + len(new_ids)
+                rows[vid] = row
+                new_ids.append(vid)
+            target[i] = row
+        need = n + len(new_ids)
+        width = codec.code_width(dim)
+        keep_full = self._keeps_full(codec)
+        in_memory = not isinstance(old.codes, np.memmap) and old.codes.shape[1] == width
+        visible_update = bool((target < n).any())
+        if (in_memory and need <= old.codes.shape[0] and (old.full is not None) == keep_full
+                and not visible_update):
+            # append-only batch: write past the published count, readers cannot see these rows;
+            # the meta map is shared by key, so it is copied like on any other publish
+            codes, scales, norms, ids, full = old.codes, old.scales, old.norms, old.ids, old.full
+            meta = old.meta.copy()
+        else:
+            if not in_memory:
+                cap = max(need + need // 8, 16)
+            else:
+                cap = max(need, 2 * old.codes.shape[0] if need > old.codes.shape[0] else old.codes.shape[0], 16)
+
+            def grow(arr, shape, dtype):
+                out = np.zeros(shape, dtype=dtype)
+                if n and arr is not None:
+                    out[:n] = arr[:n]
+                return out
+
+            codes = grow(old.codes, (cap, width), codec.code_dtype)
+            scales = grow(old.scales, (cap,), np.float32)
+            norms = grow(old.norms, (cap,), np.float32)
+            ids = grow(old.ids, (cap,), np.int64)
+            full = grow(old.full, (cap, dim), np.float32) if keep_full else None
+            meta = old.meta.copy()
+        vecs = np.vstack([vec for _, vec, _ in items])
+        ids[n:need] = new_ids
+        if codec.trained:
+            codes[target], scales[target] = codec.encode(vecs)
+        norms[target] = np.linalg.norm(vecs, axis=1)
+        if full is not None:
+            full[target] = vecs
+        for vid, _, m in items:
+            meta[vid] = m or {}
+        self._snapshot = VectorSnapshot(codec, codes, scales, norms, ids, full, need, dim, meta, old.version + 1)
+
+    def train(self, sample: Optional[np.ndarray] = None):
+        """
+        Train the storage codec (PQ codebook) on `sample`, or on the stored vectors,
+        re-encode every stored row and publish the result.
+        """
+        with self._write_lock:
+            if self._pending:
+                self._publish_locked()
+            old = self._snapshot
+            n = old.count
+            current = None
+            if n and old.full is not None:
+                current = np.asarray(old.full[:n], dtype=np.float32)
+            elif n and old.codec.trained:
+                current = old.codec.decode(old.codes[:n], old.scales[:n])
+            sample = current if sample is None else sample
+            if sample is None:
+                raise ValueError("no vectors available to train on")
+            codec = copy.deepcopy(old.codec)
+            codec.train(np.asarray(sample, dtype=np.float32))
+            cap = max(n, old.ids.shape[0])
+            codes = np.zeros((cap, codec.code_width(old.dim)), dtype=codec.code_dtype)
+            scales = np.ones(cap, dtype=np.float32)
+            if n:
+                codes[:n], scales[:n] = codec.encode(current)
+            full = old.full if self._keeps_full(codec) else None
+            self._snapshot = VectorSnapshot(codec, codes, scales, old.norms, old.ids, full, n, old.dim,
+                                            old.meta, old.version + 1)
+
+    def _ensure_trained(self):
+        codec, n = self._snapshot.codec, len(self)
+        if codec.trained or not n:
+            return
+        if n < codec.min_train_samples:
+            warnings.warn(f"PQ store has fewer than {codec.min_train_samples} vectors to train on; "
+                          "scoring full-precision vectors until train() is called", RuntimeWarning)
+            return
+        with self._write_lock:
+            if not self._snapshot.codec.trained:
+                self.train()
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Resident bytes per component for the live rows (memmapped arrays count as 0)."""
+        return self._snapshot.memory_usage()
+
+    def query(self, qvec: np.ndarray, top_k: int = 5):
+        self._ensure_trained()
+        return self._snapshot.query(qvec, top_k=top_k, rerank=self.rerank)
+
+    def query_ids(self, qvec: np.ndarray, vertex_ids, top_k: Optional[int] = None):
+        """Cosine scores of the items stored at vertex_ids only (e.g. a Hamming ball)."""
+        self._ensure_trained()
+        return self._snapshot.query_ids(qvec, vertex_ids, top_k=top_k)
+
+    def save(self, path: str, train: bool = True):
+        """
+        Write the binary format atomically (temp file + rename).
+        train: False writes an untrained PQ store as is (full-precision rows, no codebook)
+            instead of training it first.
+        """
+        if train:
+            self._ensure_trained()
+        snap = self.publish()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        n, dim = snap.count, snap.dim if snap.count else 0
+        width = snap.codec.code_width(dim) if n else 0
+        ids = snap.ids[:n]
+        docs = [json.dumps(snap.meta.get(int(v)) or {}).encode("utf-8") for v in ids.tolist()]
+        meta_index = np.zeros(n + 1, dtype=np.uint64)
+        meta_index[1:] = np.cumsum([len(d) for d in docs], dtype=np.uint64)
+        codebook = snap.codec.state()
+        codebook = np.zeros(0, dtype=np.float32) if codebook is None else codebook
+        full = snap.full[:n] if snap.full is not None else np.zeros((0, dim), dtype=np.float32)
+
+        sections = [
+            np.ascontiguousarray(snap.codes[:n], dtype=snap.codec.code_dtype),
+            np.ascontiguousarray(snap.scales[:n], dtype=np.float32),
+            np.ascontiguousarray(snap.norms[:n], dtype=np.float32),
+            np.ascontiguousarray(ids, dtype=np.int64),
+            np.ascontiguousarray(codebook, dtype=np.float32),
+            np.ascontiguousarray(full, dtype=np.float32),
+            meta_index,
+            np.frombuffer(b"".join(docs), dtype=np.uint8),
+        ]
+        offsets = []
+        off = _align(_HEADER.size)
+        for arr in sections:
+            offsets.append(off)
+            off = _align(off + arr.nbytes)
+        pq_k = int(codebook.shape[1]) if codebook.ndim == 3 else 0
+        header = _HEADER.pack(_MAGIC, _VERSION, STORAGE_MODES.index(self.storage), int(full.shape[0] > 0),
+                              n, dim, width, self.rerank, pq_k, *offsets)
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(header)
+            for offset, arr in zip(offsets, sections):
+                f.seek(offset)
+                f.write(arr.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def load(self, path: str, mmap: bool = True):
+        """
+        Load a store written by save(); storage mode and rerank depth come from the file.
+        With mmap=True codes, full-precision vectors, ids and metadata stay memory-mapped
+        (read-only, shared page cache); the first upsert copies them into memory.
+        The loaded data replaces the current snapshot atomically, so concurrent readers
+        see either the old or the new store. Legacy pickle files are detected by their
+        missing magic and loaded eagerly.
+        """
+        with open(path, "rb") as f:
+            head = f.read(_HEADER.size)
+        if not head.startswith(_MAGIC):
+            self._load_pickle(path)
+            return
+        version = struct.unpack_from("<I", head, 4)[0]
+        if version == 1:
+            _, _, code, _, n, dim, codes_off, ids_off, norms_off, idx_off, meta_off = _HEADER_V1.unpack_from(head)
+            storage, has_full, width, rerank, pq_k = _V1_STORAGE[code], 0, dim, 0, 0
+            scales_off = codebook_off = None
+        elif version == _VERSION:
+            (_, _, code, has_full, n, dim, width, rerank, pq_k, codes_off, scales_off, norms_off,
+             ids_off, codebook_off, full_off, idx_off, meta_off) = _HEADER.unpack(head)
+            storage = STORAGE_MODES[code]
+        else:
+            raise ValueError(f"unsupported VectorDB file version {version}")
+        size = os.path.getsize(path)
+
+        def section(offset, dt, shape):
+            count = int(np.prod(shape))
+            if count == 0:
+                return np.zeros(shape, dtype=dt)
+            if mmap:
+                return np.memmap(path, dtype=dt, mode="r", offset=offset, shape=shape)
+            return np.fromfile(path, dtype=dt, count=count, offset=offset).reshape(shape)
+
+        codec = make_codec(storage)
+        if storage == "pq" and n and pq_k:
+            sub = -(-dim // width)
+            codec.load_state(np.array(section(codebook_off, np.float32, (width, pq_k, sub))), dim)
+        ids = section(ids_off, np.int64, (n,))
+        meta = _MetaBlob(ids, section(idx_off, np.uint64, (n + 1,)),
+                         section(meta_off, np.uint8, (max(0, size - meta_off),)))
+        snap = VectorSnapshot(
+            codec,
+            section(codes_off, codec.code_dtype, (n, width)),
+            section(scales_off, np.float32, (n,)) if scales_off else np.ones(n, dtype=np.float32),
+            section(norms_off, np.float32, (n,)),
+            ids,
+            section(full_off, np.float32, (n, dim)) if has_full else None,
+            int(n), int(dim),
+            meta if mmap else dict(meta.items()),
+        )
+        with self._write_lock:
+            self.storage, self.rerank = storage, int(rerank)
+            self._pending = []
+            self._rows = None
+            snap.version = self._snapshot.version + 1
+            self._snapshot = snap
+
+    def _load_pickle(self, path: str):
         with open(path, "rb") as f:
             d = pickle.load(f)
-        self.vectors = d.get("vectors", {})
-        self.meta = d.get("meta", {})
+        vectors = d.get("vectors", {})
+        meta = d.get("meta", {})
+        with self._write_lock:
+            self._pending = []
+            self._rows = {}
+            self._snapshot = VectorSnapshot.empty(make_codec(self.storage, **self._codec_kwargs))
+            self.bulk_upsert([(vid, vec, meta.get(vid)) for vid, vec in sorted(vectors.items())])
+            self.publish()
+
+
+def convert_pickle_store(src_path: str, dst_path: str, storage: str = "float32", rerank: int = 0) -> str:
+    """Migrate a legacy pickled VectorDB file to the memory-mappable binary format."""
+    db = VectorDB(storage=storage, rerank=rerank)
+    db.load(src_path)
+    db.save(dst_path)
+    return dst_path
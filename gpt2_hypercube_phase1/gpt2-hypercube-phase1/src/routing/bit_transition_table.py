@@ -1,57 +1,197 @@
 """
 Bit-transition routing table for hypercube.
 
-- BitTransitionTable builds adjacency lists (edges = Hamming distance 1).
-- Save / load to/from JSON-friendly dict (vertex -> [neighbors]).
-- Utility: edge_list() returns undirected edge tuples (u,v) with u < v.
+- Implicit by default: the neighbors of v are v ^ (1 << i), computed on demand,
+  so an unedited table costs O(1) memory whatever n is.
+- Override layer for edits only:
+  * disabled hypercube edges as per-vertex bitsets (bit i set = edge v <-> v ^ (1 << i) is off)
+  * extra edges between non-adjacent vertices as sparse sets
+- Compact binary format (magic, n, override arrays); legacy JSON adjacency files still load.
+- edge_list() returns an (E, 2) array with u < v; iter_edges() yields the same edges lazily.
+- shortest_route() delegates to routing.router.HypercubeRouter.
 """
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 import json
 import os
+import struct
+import numpy as np
 
-from gpt2_hypercube_phase1.src.hypercube.topology import Hypercube
+from ..hypercube.topology import Hypercube
+
+MAGIC = b"BTT1"
+# magic, n, number of vertices with disabled edges, number of extra edges
+_HEADER = struct.Struct("<4sIQQ")
+# 2**i % 67 is distinct for i < 64: bit index of a power of two without floating point
+_BIT_OF_MOD67 = np.zeros(67, dtype=np.int64)
+_BIT_OF_MOD67[[(1 << i) % 67 for i in range(64)]] = np.arange(64)
 
 
 class BitTransitionTable:
     def __init__(self, hypercube: Hypercube):
         self.hypercube = hypercube
-        # adjacency: int -> List[int]
-        self.adjacency: Dict[int, List[int]] = {}
-        self._build()
+        self._disabled: Dict[int, int] = {}
+        self._extra: Dict[int, Set[int]] = {}
+        # sorted (vids, masks) view of _disabled for array lookups; rebuilt after edits
+        self._disabled_arrays: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    @property
+    def is_implicit(self) -> bool:
+        return not self._disabled and not self._extra
+
+    def _check(self, vid: int) -> int:
+        vid = int(vid)
+        if not 0 <= vid < self.hypercube.vertex_count:
+            raise ValueError(f"vertex {vid} out of range for n={self.hypercube.n}")
+        return vid
+
+    def _set_disabled(self, u: int, bit: int, off: bool):
+        for v in (u, u ^ (1 << bit)):
+            mask = self._disabled.get(v, 0)
+            mask = mask | (1 << bit) if off else mask & ~(1 << bit)
+            if mask:
+                self._disabled[v] = mask
+            else:
+                self._disabled.pop(v, None)
+        self._disabled_arrays = None
 
-    def _build(self):
-        self.adjacency = {}
-        for v in self.hypercube.all_vertices():
-            self.adjacency[int(v)] = self.hypercube.neighbors(int(v))
+    def add_edge(self, u: int, v: int):
+        """Enable a disabled hypercube edge, or add an edge between non-adjacent vertices."""
+        u, v = self._check(u), self._check(v)
+        if u == v:
+            raise ValueError("self-loops are not supported")
+        diff = u ^ v
+        if diff & (diff - 1) == 0:
+            self._set_disabled(u, diff.bit_length() - 1, False)
+        else:
+            self._extra.setdefault(u, set()).add(v)
+            self._extra.setdefault(v, set()).add(u)
+
+    def remove_edge(self, u: int, v: int):
+        """Disable a hypercube edge or drop an extra edge."""
+        u, v = self._check(u), self._check(v)
+        diff = u ^ v
+        if diff and diff & (diff - 1) == 0:
+            self._set_disabled(u, diff.bit_length() - 1, True)
+            return
+        for a, b in ((u, v), (v, u)):
+            others = self._extra.get(a)
+            if others is not None:
+                others.discard(b)
+                if not others:
+                    del self._extra[a]
+
+    def has_edge(self, u: int, v: int) -> bool:
+        u, v = int(u), int(v)
+        diff = u ^ v
+        if diff and diff & (diff - 1) == 0:
+            return not (self._disabled.get(u, 0) >> (diff.bit_length() - 1)) & 1
+        return v in self._extra.get(u, ())
 
     def neighbors(self, vid: int) -> List[int]:
-        return list(self.adjacency.get(int(vid), []))
+        vid = int(vid)
+        off = self._disabled.get(vid, 0)
+        neigh = [vid ^ (1 << i) for i in range(self.hypercube.n) if not (off >> i) & 1]
+        extra = self._extra.get(vid)
+        if extra:
+            neigh.extend(sorted(extra))
+        return neigh
 
-    def edge_list(self) -> List[Tuple[int, int]]:
-        """Return undirected edges as (u, v) with u < v."""
-        edges = []
-        for u, neighs in self.adjacency.items():
-            for v in neighs:
-                if u < v:
-                    edges.append((u, v))
-        return edges
+    def disabled_masks(self, vids: np.ndarray) -> np.ndarray:
+        """Bitset of disabled hypercube edges for every vertex in vids (0 = all enabled)."""
+        vids = np.asarray(vids, dtype=np.int64)
+        if not self._disabled:
+            return np.zeros(vids.shape, dtype=np.int64)
+        if self._disabled_arrays is None:
+            keys = np.fromiter(self._disabled.keys(), dtype=np.int64, count=len(self._disabled))
+            vals = np.fromiter(self._disabled.values(), dtype=np.int64, count=len(self._disabled))
+            order = np.argsort(keys)
+            self._disabled_arrays = (keys[order], vals[order])
+        keys, vals = self._disabled_arrays
+        pos = np.minimum(np.searchsorted(keys, vids), len(keys) - 1)
+        return np.where(keys[pos] == vids, vals[pos], 0)
+
+    def _extra_edges(self) -> np.ndarray:
+        pairs = [(u, v) for u, others in self._extra.items() for v in others if u < v]
+        return np.array(sorted(pairs), dtype=np.int64).reshape(-1, 2)
+
+    def edge_blocks(self, block: int = 1 << 20) -> Iterator[np.ndarray]:
+        """Enabled hypercube edges as (E_i, 2) arrays with u < v, then the extra edges."""
+        for edges in self.hypercube.edge_blocks(block):
+            if self._disabled:
+                bits = _BIT_OF_MOD67[(edges[:, 0] ^ edges[:, 1]) % 67]
+                keep = (self.disabled_masks(edges[:, 0]) >> bits) & 1 == 0
+                edges = edges[keep]
+            yield edges
+        if self._extra:
+            yield self._extra_edges()
+
+    def edge_list(self) -> np.ndarray:
+        """Undirected edges as an (E, 2) array of (u, v) with u < v."""
+        blocks = [b.astype(np.int64) for b in self.edge_blocks()]
+        return np.concatenate(blocks) if blocks else np.zeros((0, 2), dtype=np.int64)
+
+    def iter_edges(self) -> Iterator[Tuple[int, int]]:
+        for block in self.edge_blocks(1 << 16):
+            yield from map(tuple, block.tolist())
 
     def save(self, path: str):
         os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump({"n": self.hypercube.n, "adjacency": {str(k): v for k, v in self.adjacency.items()}}, f, indent=2)
+        vids = np.array(sorted(self._disabled), dtype=np.uint64)
+        masks = np.array([self._disabled[v] for v in vids.tolist()], dtype=np.uint64)
+        extra = self._extra_edges().astype(np.uint64)
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, self.hypercube.n, len(vids), len(extra)))
+            f.write(vids.tobytes())
+            f.write(masks.tobytes())
+            f.write(extra.tobytes())
+        os.replace(tmp, path)
 
     @classmethod
     def load(cls, path: str) -> "BitTransitionTable":
-        with open(path, "r", encoding="utf-8") as f:
-            d = json.load(f)
-        hc = Hypercube(int(d["n"]))
-        table = cls(hc)
-        # override adjacency if present
-        adj_raw = d.get("adjacency", {})
-        table.adjacency = {int(k): list(v) for k, v in adj_raw.items()}
+        with open(path, "rb") as f:
+            head = f.read(_HEADER.size)
+            if not head.startswith(MAGIC):
+                f.seek(0)
+                return cls._load_json(json.loads(f.read().decode("utf-8")))
+            _, n, n_disabled, n_extra = _HEADER.unpack(head)
+            vids = np.frombuffer(f.read(8 * n_disabled), dtype=np.uint64)
+            masks = np.frombuffer(f.read(8 * n_disabled), dtype=np.uint64)
+            extra = np.frombuffer(f.read(16 * n_extra), dtype=np.uint64).reshape(-1, 2)
+        table = cls(Hypercube(int(n)))
+        table._disabled = dict(zip(vids.tolist(), masks.tolist()))
+        for u, v in extra.tolist():
+            table._extra.setdefault(u, set()).add(v)
+            table._extra.setdefault(v, set()).add(u)
+        return table
+
+    @classmethod
+    def _load_json(cls, d: Dict) -> "BitTransitionTable":
+        """
+        Older JSON adjacency files: keep only the differences from the implicit hypercube.
+        An edge is kept when either endpoint lists it; vertices missing from the file had
+        no neighbours there, so their unlisted hypercube edges are disabled too.
+        """
+        table = cls(Hypercube(int(d["n"])))
+        n = table.hypercube.n
+        masks = np.full(table.hypercube.vertex_count, (1 << n) - 1, dtype=np.int64)
+        for k, neighs in d.get("adjacency", {}).items():
+            u = table._check(k)
+            for v in neighs:
+                v = table._check(v)
+                diff = u ^ v
+                if diff == 0:
+                    raise ValueError(f"self-loop at vertex {u} in legacy adjacency; self-loops are not supported")
+                if diff & (diff - 1) == 0:
+                    masks[u] &= ~diff
+                    masks[v] &= ~diff
+                else:
+                    table.add_edge(u, v)
+        off = np.flatnonzero(masks)
+        table._disabled = dict(zip(off.tolist(), masks[off].tolist()))
         return table
 
-    def shortest_route(self, a: int, b: int) -> Optional[List[int]]:
-        """Proxy to hypercube.shortest_path for convenience."""
-        return self.hypercube.shortest_path(a, b)
+    def shortest_route(self, a: int, b: int, blocked: Optional[Iterable[int]] = None) -> Optional[List[int]]:
+        """Shortest path over this table's edges (e-cube while it is implicit); None if unreachable."""
+        from .router import HypercubeRouter
+        return HypercubeRouter(self.hypercube, table=self).route(a, b, blocked=blocked)
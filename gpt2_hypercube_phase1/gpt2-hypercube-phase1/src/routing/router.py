@@ -0,0 +1,177 @@
+"""
+Routing on the hypercube.
+
+- shortest_path: e-cube (bit-fixing) routing, flips the differing bits from the
+  lowest to the highest, O(n) per route
+- shortest_paths / next_hops / distances: the same for arrays of (src, dst) pairs
+- disjoint_paths: the n internally node-disjoint a -> b paths of Q_n (k = hamming(a, b)
+  paths fixing the differing bits in cyclic rotations, plus one detour of length
+  k + 2 through every agreeing dimension)
+- route: shortest path avoiding blocked vertices (e.g. LTMManager.protected_vertices)
+  and the disabled/extra edges of a BitTransitionTable; level-synchronous BFS
+  whose frontiers are bitsets of 2^n bits packed into uint64 words
+
+Blocked vertices only constrain intermediate hops; src and dst are always allowed.
+"""
+from typing import Iterable, List, Optional, Tuple
+import numpy as np
+
+from ..hypercube.topology import Hypercube, popcount
+
+# for in-word dimensions i < 6: bits whose position has bit i clear
+_IN_WORD_MASKS = [np.uint64(m) for m in (
+    0x5555555555555555, 0x3333333333333333, 0x0F0F0F0F0F0F0F0F,
+    0x00FF00FF00FF00FF, 0x0000FFFF0000FFFF, 0x00000000FFFFFFFF,
+)]
+
+
+class HypercubeRouter:
+    def __init__(self, hypercube: Hypercube, table=None):
+        """
+        table: optional BitTransitionTable whose disabled and extra edges route() honors;
+            e-cube routing (shortest_path/shortest_paths) always uses the full hypercube.
+        """
+        self.hypercube = hypercube
+        self.table = table
+        self.n = hypercube.n
+        self.words = max(1, hypercube.vertex_count >> 6)
+
+    def _check(self, vid: int) -> int:
+        vid = int(vid)
+        if not 0 <= vid < self.hypercube.vertex_count:
+            raise ValueError(f"vertex {vid} out of range for n={self.n}")
+        return vid
+
+    # --- e-cube routing ---
+
+    def shortest_path(self, a: int, b: int) -> List[int]:
+        a, b = self._check(a), self._check(b)
+        path = [a]
+        diff = a ^ b
+        while diff:
+            low = diff & -diff
+            path.append(path[-1] ^ low)
+            diff ^= low
+        return path
+
+    def distances(self, src: np.ndarray, dst: np.ndarray) -> np.ndarray:
+        return popcount(np.bitwise_xor(src, dst))
+
+    def next_hops(self, src: np.ndarray, dst: np.ndarray) -> np.ndarray:
+        """First e-cube hop of every (src, dst) pair (src itself where src == dst)."""
+        src = np.asarray(src, dtype=np.int64)
+        diff = src ^ np.asarray(dst, dtype=np.int64)
+        return src ^ (diff & -diff)
+
+    def shortest_paths(self, src: np.ndarray, dst: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        E-cube routes for arrays of pairs: (paths, lengths) where paths is (N, n + 1),
+        row i holds the lengths[i] + 1 vertices of route i followed by -1 padding.
+        """
+        src = np.asarray(src, dtype=np.int64)
+        diff = src ^ np.asarray(dst, dtype=np.int64)
+        flips = np.left_shift(1, np.arange(self.n, dtype=np.int64))
+        hop = (diff[:, None] & flips) != 0
+        # vertex reached after fixing all differing bits up to and including bit i
+        prefix = src[:, None] ^ (diff[:, None] & (2 * flips - 1))
+        step = np.cumsum(hop, axis=1)
+        paths = np.full((len(src), self.n + 1), -1, dtype=np.int64)
+        paths[:, 0] = src
+        rows, cols = np.nonzero(hop)
+        paths[rows, step[rows, cols]] = prefix[rows, cols]
+        return paths, step[:, -1]
+
+    def disjoint_paths(self, a: int, b: int) -> List[List[int]]:
+        """n internally node-disjoint a -> b paths: k of length k, n - k of length k + 2."""
+        a, b = self._check(a), self._check(b)
+        if a == b:
+            return [[a]]
+        differing = [i for i in range(self.n) if (a ^ b) >> i & 1]
+        paths = []
+        for start in range(len(differing)):
+            order = differing[start:] + differing[:start]
+            paths.append(self._flip_sequence(a, order))
+        for j in range(self.n):
+            if not (a ^ b) >> j & 1:
+                paths.append(self._flip_sequence(a, [j] + differing + [j]))
+        return paths
+
+    @staticmethod
+    def _flip_sequence(a: int, bits: List[int]) -> List[int]:
+        path = [a]
+        for i in bits:
+            path.append(path[-1] ^ (1 << i))
+        return path
+
+    # --- constrained routing ---
+
+    def to_bitset(self, vids: Iterable[int]) -> np.ndarray:
+        bits = np.zeros(self.words, dtype=np.uint64)
+        vids = np.fromiter((int(v) for v in vids), dtype=np.int64)
+        if len(vids):
+            np.bitwise_or.at(bits, vids >> 6, np.left_shift(np.uint64(1), (vids & 63).astype(np.uint64)))
+        return bits
+
+    @staticmethod
+    def _has(bits: np.ndarray, vid: int) -> bool:
+        return bool((int(bits[vid >> 6]) >> (vid & 63)) & 1)
+
+    def _shift(self, frontier: np.ndarray, i: int) -> np.ndarray:
+        """Bitset of v ^ (1 << i) for every v in frontier."""
+        if i < 6:
+            s, m = np.uint64(1 << i), _IN_WORD_MASKS[i]
+            return ((frontier & m) << s) | ((frontier >> s) & m)
+        k = 1 << (i - 6)
+        return frontier.reshape(-1, 2, k)[:, ::-1, :].reshape(-1)
+
+    def _edge_masks(self) -> Optional[List[np.ndarray]]:
+        """Per dimension, the bitset of vertices whose edge along it is enabled (None = all)."""
+        disabled = getattr(self.table, "_disabled", None)
+        if not disabled:
+            return None
+        full = np.full(self.words, np.uint64(0xFFFFFFFFFFFFFFFF))
+        return [full & ~self.to_bitset(v for v, mask in disabled.items() if mask >> i & 1)
+                for i in range(self.n)]
+
+    def route(self, a: int, b: int, blocked: Optional[Iterable[int]] = None) -> Optional[List[int]]:
+        """Shortest a -> b path avoiding blocked vertices and disabled edges; None if unreachable."""
+        a, b = self._check(a), self._check(b)
+        blocked = set(int(v) for v in blocked) if blocked is not None else set()
+        blocked.discard(a)
+        blocked.discard(b)
+        implicit = self.table is None or self.table.is_implicit
+        if implicit and not blocked:
+            return self.shortest_path(a, b)
+        if a == b:
+            return [a]
+        edge_masks = self._edge_masks()
+        extra = getattr(self.table, "_extra", None) or {}
+        allowed = ~self.to_bitset(blocked)
+        if self.hypercube.vertex_count < 64:
+            allowed &= np.uint64((1 << self.hypercube.vertex_count) - 1)
+        visited = self.to_bitset([a])
+        levels = [visited.copy()]
+        while not self._has(levels[-1], b):
+            frontier = levels[-1]
+            nxt = np.zeros_like(frontier)
+            for i in range(self.n):
+                src = frontier if edge_masks is None else frontier & edge_masks[i]
+                nxt |= self._shift(src, i)
+            for u, others in extra.items():
+                if self._has(frontier, u):
+                    nxt |= self.to_bitset(others)
+            nxt &= allowed & ~visited
+            if not nxt.any():
+                return None
+            visited |= nxt
+            levels.append(nxt)
+        # walk back through the levels, taking the first neighbor reached one level earlier
+        path = [b]
+        for level in reversed(levels[:-1]):
+            cur = path[-1]
+            cands = [cur ^ (1 << i) for i in range(self.n)] + sorted(extra.get(cur, ()))
+            path.append(next(v for v in cands if self._has(level, v) and self._edge_ok(v, cur)))
+        return path[::-1]
+
+    def _edge_ok(self, u: int, v: int) -> bool:
+        return self.table is None or self.table.has_edge(u, v)
@@ -0,0 +1,176 @@
+"""
+Background writer for checkpoints, JSON documents and audit logs.
+
+- callers only pay for a snapshot: tensors are copied to CPU (detached, contiguous)
+  before the call returns, so training can keep mutating its weights; save_tensors
+  copies into recycled buffers (no fresh allocation per save) and stores tied
+  tensors once, restored by load_tensors
+- one worker thread serialises the jobs in submission order: safetensors for
+  tensor dicts, torch.save for nested state (optimizer moments, RNG), JSON, and
+  appended log lines; audit lines for a save are written after its file lands
+- every file goes to "<path>.tmp" first and is moved into place with os.replace
+- the job queue is bounded (max_pending): a producer that outruns the disk blocks
+  on submit instead of piling up snapshots in memory
+- appended logs stay open between writes; flush() waits for every queued job and
+  re-raises the first failure; save/write calls also return a Future
+"""
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, TextIO
+import json
+import os
+import queue
+import threading
+import numpy as np
+import torch
+from safetensors import safe_open
+from safetensors.torch import load_file, save_file
+
+ALIASES_KEY = "__aliases__"
+
+
+def snapshot(obj: Any) -> Any:
+    """Copy of obj in which every tensor (and ndarray) is a private CPU copy."""
+    if torch.is_tensor(obj):
+        return obj.detach().to("cpu", copy=True).contiguous()
+    if isinstance(obj, np.ndarray):
+        return obj.copy()
+    if isinstance(obj, dict):
+        return {k: snapshot(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(snapshot(v) for v in obj)
+    return obj
+
+
+def _replace_atomically(path: str, write: Callable[[str], None]) -> str:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    write(tmp)
+    os.replace(tmp, path)
+    return path
+
+
+def load_tensors(path: str, device: str = "cpu") -> Dict[str, torch.Tensor]:
+    """Read a save_tensors() file, re-creating the tied entries."""
+    tensors = load_file(path, device=device)
+    with safe_open(path, framework="pt") as f:
+        aliases = json.loads((f.metadata() or {}).get(ALIASES_KEY, "{}"))
+    for name, target in aliases.items():
+        tensors[name] = tensors[target]
+    return tensors
+
+
+class CheckpointWriter:
+    def __init__(self, max_pending: int = 2):
+        self.max_pending = max_pending
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_pending)
+        self._pool: Dict[tuple, list] = {}
+        self._pool_lock = threading.Lock()
+        self._logs: Dict[str, TextIO] = {}
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name="checkpoint-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                fn, future, audit = job
+                try:
+                    future.set_result(fn())
+                    if audit is not None:
+                        self._append(*audit)
+                except BaseException as e:
+                    self._error = self._error or e
+                    future.set_exception(e)
+            finally:
+                self._queue.task_done()
+
+    def submit(self, fn: Callable[[], Any], audit: Optional[tuple] = None) -> Future:
+        """Run fn() on the writer thread; fn must only touch data it owns (snapshots)."""
+        future: Future = Future()
+        self._queue.put((fn, future, audit))
+        return future
+
+    def _append(self, path: str, line: str):
+        f = self._logs.get(path)
+        if f is None:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            f = self._logs[path] = open(path, "a", encoding="utf-8")
+        f.write(line if line.endswith("\n") else line + "\n")
+        f.flush()
+
+    def save_tensors(self, tensors: Dict[str, torch.Tensor], path: str, metadata: Optional[Dict[str, str]] = None,
+                     audit: Optional[tuple] = None) -> Future:
+        """
+        Write a flat name -> tensor dict as safetensors (read back with load_tensors).
+        audit: optional (log_path, line) appended once the file is in place.
+        """
+        metadata = {k: str(v) for k, v in (metadata or {}).items()}
+        unique, aliases, seen = {}, {}, {}
+        for name, t in tensors.items():
+            key = (t.device, t.data_ptr(), t.dtype, tuple(t.shape), t.stride())
+            if key in seen:
+                aliases[name] = seen[key]
+            else:
+                seen[key] = name
+                unique[name] = t
+        if aliases:
+            metadata[ALIASES_KEY] = json.dumps(aliases)
+        sig, buffers = self._take_buffers(unique)
+
+        def write():
+            try:
+                return _replace_atomically(path, lambda tmp: save_file(buffers, tmp, metadata=metadata))
+            finally:
+                self._return_buffers(sig, buffers)
+        return self.submit(write, audit)
+
+    def _take_buffers(self, tensors: Dict[str, torch.Tensor]):
+        sig = tuple((k, tuple(v.shape), v.dtype) for k, v in tensors.items())
+        with self._pool_lock:
+            free = self._pool.get(sig)
+            buffers = free.pop() if free else None
+        if buffers is None:
+            buffers = {k: torch.empty(v.shape, dtype=v.dtype) for k, v in tensors.items()}
+        for k, v in tensors.items():
+            buffers[k].copy_(v.detach())
+        return sig, buffers
+
+    def _return_buffers(self, sig: tuple, buffers: Dict[str, torch.Tensor]):
+        with self._pool_lock:
+            free = self._pool.setdefault(sig, [])
+            if len(free) <= self.max_pending:
+                free.append(buffers)
+
+    def save_object(self, obj: Any, path: str, audit: Optional[tuple] = None) -> Future:
+        """torch.save of a snapshot of obj (nested dicts/lists of tensors and plain values)."""
+        obj = snapshot(obj)
+        return self.submit(lambda: _replace_atomically(path, lambda tmp: torch.save(obj, tmp)), audit)
+
+    def write_json(self, obj: Any, path: str, audit: Optional[tuple] = None) -> Future:
+        text = json.dumps(obj, indent=2)
+
+        def write(tmp: str):
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(text)
+        return self.submit(lambda: _replace_atomically(path, write), audit)
+
+    def append_line(self, path: str, line: str) -> Future:
+        return self.submit(lambda: self._append(path, line))
+
+    def flush(self):
+        """Block until every queued job is done; raise the first error seen since the last flush."""
+        self._queue.join()
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        for f in self._logs.values():
+            f.close()
+        self._logs.clear()
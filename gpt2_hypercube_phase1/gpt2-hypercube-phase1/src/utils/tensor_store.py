@@ -0,0 +1,156 @@
+"""
+Content-addressed checkpoint store: each tensor is stored once per distinct content.
+
+Layout under root:
+  blobs/<h[:2]>/<h>.bin   raw tensor bytes, h = BLAKE2b-128 of (dtype, shape, bytes)
+  manifests/<name>.json   {"tensors": {key: {"hash", "dtype", "shape"}}, "aliases", "metadata", ...}
+
+- put(name, tensors) writes only blobs that are not already present, then the
+  manifest; saving an unchanged tensor costs its manifest entry only
+- every put hashes every tensor: no cheap signal (version counter, storage
+  address) catches all in-place edits, e.g. writes through .data
+- with writer= (CheckpointWriter) the tensors are snapshotted to CPU and hashing and
+  writing happen on the writer thread
+- tied entries (same storage, shape and stride) are stored once, as aliases
+- gc() deletes blobs no manifest references (and stray temp files)
+All files are written to a temp path and moved into place with os.replace.
+"""
+from typing import Any, Dict, Optional, Tuple
+import hashlib
+import json
+import os
+import threading
+import time
+import numpy as np
+import torch
+
+STORE_VERSION = 1
+
+
+def _raw(t: torch.Tensor) -> np.ndarray:
+    return t.detach().cpu().contiguous().reshape(-1).view(torch.uint8).numpy()
+
+
+def _digest(t: torch.Tensor) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{str(t.dtype)[6:]}{tuple(t.shape)}".encode())
+    h.update(_raw(t).data)
+    return h.hexdigest()
+
+
+class TensorStore:
+    def __init__(self, root: str):
+        self.root = root
+        self.blob_dir = os.path.join(root, "blobs")
+        self.manifest_dir = os.path.join(root, "manifests")
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.manifest_dir, exist_ok=True)
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.blob_dir, digest[:2], f"{digest}.bin")
+
+    def manifest_path(self, name: str) -> str:
+        return os.path.join(self.manifest_dir, f"{name}.json")
+
+    def _write_blob(self, digest: str, t: torch.Tensor) -> int:
+        path = self.blob_path(digest)
+        if os.path.exists(path):
+            return 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        raw = _raw(t)
+        with open(tmp, "wb") as f:
+            f.write(raw.data)
+        os.replace(tmp, path)
+        return raw.nbytes
+
+    def put(self, name: str, tensors: Dict[str, torch.Tensor], metadata: Optional[Dict[str, Any]] = None,
+            writer=None, audit: Optional[tuple] = None):
+        """
+        Store tensors as checkpoint `name` (replacing an older manifest of that name).
+        Returns {"bytes_written", "bytes_total"}, or a Future of it when writer is given.
+        """
+        entries, aliases, seen, pending = {}, {}, {}, {}
+        for key, t in tensors.items():
+            view_key = (t.device, t.data_ptr(), t.dtype, tuple(t.shape), t.stride())
+            if view_key in seen:
+                aliases[key] = seen[view_key]
+                continue
+            seen[view_key] = key
+            entries[key] = {"dtype": str(t.dtype)[6:], "shape": list(t.shape)}
+            pending[key] = t.detach().to("cpu", copy=True) if writer is not None else t
+        nbytes = sum(t.numel() * t.element_size() for k, t in tensors.items() if k in entries)
+        manifest = {"version": STORE_VERSION, "name": name, "ts": int(time.time()), "tensors": entries,
+                    "aliases": aliases, "metadata": metadata or {}}
+
+        def commit():
+            written = 0
+            for key, t in pending.items():
+                digest = _digest(t)
+                written += self._write_blob(digest, t)
+                entries[key]["hash"] = digest
+            path = self.manifest_path(name)
+            tmp = f"{path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(manifest, f)
+            os.replace(tmp, path)
+            return {"bytes_written": written, "bytes_total": nbytes}
+
+        if writer is not None:
+            return writer.submit(commit, audit=audit)
+        return commit()
+
+    def load_manifest(self, name_or_path: str) -> Dict[str, Any]:
+        path = name_or_path if name_or_path.endswith(".json") else self.manifest_path(name_or_path)
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def get(self, name_or_path: str, device: str = "cpu") -> Tuple[Dict[str, torch.Tensor], Dict[str, Any]]:
+        """(tensors, metadata) of a checkpoint, by name or manifest path."""
+        manifest = self.load_manifest(name_or_path)
+        tensors = {}
+        for key, e in manifest["tensors"].items():
+            raw = torch.from_numpy(np.fromfile(self.blob_path(e["hash"]), dtype=np.uint8))
+            tensors[key] = raw.view(getattr(torch, e["dtype"])).reshape(e["shape"]).to(device)
+        for key, target in manifest["aliases"].items():
+            tensors[key] = tensors[target]
+        return tensors, manifest["metadata"]
+
+    def names(self):
+        return sorted(f[:-5] for f in os.listdir(self.manifest_dir) if f.endswith(".json"))
+
+    def delete(self, name: str) -> bool:
+        path = self.manifest_path(name)
+        if not os.path.exists(path):
+            return False
+        os.remove(path)
+        return True
+
+    def _blobs(self):
+        for sub in os.listdir(self.blob_dir):
+            d = os.path.join(self.blob_dir, sub)
+            for f in os.listdir(d):
+                yield os.path.join(d, f)
+
+    def stats(self) -> Dict[str, int]:
+        """Bytes on disk in blobs vs bytes the manifests describe (the cost without dedup)."""
+        stored = sum(os.path.getsize(p) for p in self._blobs() if p.endswith(".bin"))
+        logical = 0
+        for name in self.names():
+            for e in self.load_manifest(name)["tensors"].values():
+                logical += int(np.prod(e["shape"], dtype=np.int64)) * getattr(torch, e["dtype"]).itemsize
+        return {"checkpoints": len(self.names()), "blob_bytes": stored, "logical_bytes": logical}
+
+    def gc(self) -> Dict[str, int]:
+        """Delete blobs referenced by no manifest. Do not run while puts are in flight."""
+        live = set()
+        for name in self.names():
+            live.update(e["hash"] for e in self.load_manifest(name)["tensors"].values())
+        removed = freed = 0
+        for path in list(self._blobs()):
+            digest = os.path.basename(path).split(".")[0]
+            if path.endswith(".tmp") or digest not in live:
+                freed += os.path.getsize(path)
+                os.remove(path)
+                removed += 1
+        return {"blobs_removed": removed, "bytes_freed": freed}
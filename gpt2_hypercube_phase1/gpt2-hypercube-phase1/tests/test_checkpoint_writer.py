@@ -0,0 +1,54 @@
+"""
+Background checkpoint writer: snapshots, atomic safetensors output, audit ordering.
+"""
+import json
+import os
+import pytest
+import torch
+from src.utils.checkpoint_writer import CheckpointWriter, load_tensors
+from src.evaluation.governance import GovernanceManager
+from src.evaluation.safeguards import LTMManager
+
+
+def test_writer_snapshots_and_audits(tmp_path):
+    writer = CheckpointWriter(max_pending=1)
+    model = torch.nn.Linear(4, 4)
+    tied = {"a.weight": model.weight, "b.weight": model.weight, "bias": model.bias}
+    expected = {k: v.detach().clone() for k, v in tied.items()}
+    log = str(tmp_path / "audit.logl")
+    paths = [str(tmp_path / f"ckpt_{i}.safetensors") for i in range(3)]
+    for i, path in enumerate(paths):
+        writer.save_tensors(tied, path, metadata={"step": i}, audit=(log, f"SAVE {path}"))
+        with torch.no_grad():
+            model.weight.add_(1.0)  # training keeps going while the write is queued
+    writer.append_line(log, "DONE")
+    writer.flush()
+    first = load_tensors(paths[0])
+    assert first["a.weight"] is first["b.weight"]
+    assert all(torch.equal(first[k], expected[k]) for k in expected)
+    assert torch.equal(load_tensors(paths[2])["a.weight"], expected["a.weight"] + 2)
+    assert open(log).read().splitlines() == [f"SAVE {p}" for p in paths] + ["DONE"]
+    assert not [f for f in os.listdir(tmp_path) if f.endswith(".tmp")]
+
+    writer.save_object({"x": torch.ones(2)}, str(tmp_path / "missing_dir" / "no" / "\0bad"))
+    with pytest.raises(Exception):
+        writer.flush()
+    writer.flush()  # the error is reported once
+    writer.close()
+
+
+def test_governance_and_ltm_with_writer(tmp_path):
+    writer = CheckpointWriter()
+    gm = GovernanceManager(gov_dir=str(tmp_path / "gov"), writer=writer)
+    wp = gm.publish_whitepaper("T", "S")
+    gm.register_rollback("ckpt.safetensors", "safety")
+    ltm = LTMManager(path=str(tmp_path / "ltm.json"), backups_dir=str(tmp_path / "bk"), writer=writer)
+    ltm.mapping["a"] = 1
+    backup = ltm.snapshot("v1")
+    ltm.mapping["a"] = 2
+    assert ltm.rollback_to(backup) and ltm.mapping == {"a": 1}
+    writer.flush()
+    assert json.load(open(wp))["title"] == "T"
+    events = [json.loads(line)["evt"] for line in open(gm.audit_log)]
+    assert events == ["whitepaper_published", "rollback_register"]
+    writer.close()
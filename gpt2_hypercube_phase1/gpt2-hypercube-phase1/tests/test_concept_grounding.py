@@ -44,4 +44,128 @@ def test_concept_assignments_tmp(tmp_path):
 
     # save mapping
     path = cg.save_mapping()
-    assert os.path.exists(path)
\ No newline at end of file
+    assert os.path.exists(path)
+
+def test_simple_encoder_save_load_and_streaming(tmp_path):
+    corpus = [f"doc {i} about {w} and {v}" for i, (w, v) in enumerate(zip(["apple", "river", "engine", "violin"] * 10, ["fruit", "water", "car", "music", "tree"] * 8))]
+    queries = ["apple fruit", "river water", "unknown words here"]
+
+    enc = SimpleEncoder(dim=8)
+    enc.fit(corpus)
+    path = str(tmp_path / "enc.npz")
+    enc.save(path)
+    loaded = SimpleEncoder.load(path)
+    np.testing.assert_allclose(loaded.encode(queries), enc.encode(queries), atol=1e-5)
+
+    # assign_bulk on a fitted batch encoder must not refit it
+    basis = enc._basis.copy()
+    cg = ConceptGrounder(hypercube=Hypercube(n=3), encoder=enc, prototype_init=np.eye(8, dtype=np.float32), mapping_dir=str(tmp_path))
+    cg.assign_bulk(["apple", "river"], texts_for_encoder=["apple", "river"])
+    np.testing.assert_array_equal(enc._basis, basis)
+
+    stream = SimpleEncoder(dim=8, streaming=True, n_features=2 ** 12)
+    stream.partial_fit(corpus[:20])
+    stream.partial_fit(corpus[20:])
+    out = stream.encode(queries)
+    assert out.shape == (3, 8)
+    np.testing.assert_allclose(np.linalg.norm(out[:2], axis=1), 1.0, atol=1e-5)
+    stream.save(path)
+    np.testing.assert_allclose(SimpleEncoder.load(path).encode(queries), out, atol=1e-5)
+    # the merged basis should capture nearly as much of the corpus as a one-shot fit
+    full = SimpleEncoder(dim=8, streaming=True, n_features=2 ** 12)
+    full.fit(corpus)
+    X = stream._stream_tfidf(stream._hasher.transform(corpus))
+    captured = lambda b: np.linalg.norm(X @ b) ** 2
+    assert captured(stream._basis) >= 0.9 * captured(full._basis)
+
+
+class _TableEncoder:
+    """Fixed random vector per concept name; already fitted."""
+    fitted = True
+
+    def __init__(self, names, dim, rng):
+        self.table = {n: rng.randn(dim) for n in names}
+
+    def encode(self, texts):
+        return np.stack([self.table[t] for t in texts])
+
+
+def _legacy_rules(cg, groups, pairs, paths):
+    """The original per-item loops (sklearn cosine_similarity per pair)."""
+    from sklearn.metrics.pairwise import cosine_similarity
+    cos = lambda v, vid: cosine_similarity(v.reshape(1, -1), cg.prototypes[vid].reshape(1, -1))[0, 0]
+
+    def nearest(v):
+        sims = cosine_similarity(v.reshape(1, -1), cg.prototypes)[0]
+        return int(sims.argmax()), float(sims.max())
+
+    m, thr, hc = cg.concept_to_vertex, cg.conf_threshold, cg.hypercube
+    for group in groups:
+        vecs = cg.encoder.encode(group)
+        anchor = next((m[c] for c in group if m.get(c) is not None), None)
+        if anchor is None:
+            anchor, score = nearest(vecs[0])
+            if score < thr:
+                continue
+            m[group[0]] = anchor
+        neighs, j = hc.neighbors(anchor), 0
+        for i, c in enumerate(group):
+            if m.get(c) is not None:
+                continue
+            if j >= len(neighs):
+                break
+            if cos(vecs[i], neighs[j]) >= thr:
+                m[c] = neighs[j]
+                j += 1
+    for a, b in pairs:
+        va, vb = cg.encoder.encode([a, b])
+        a_vid, a_score = nearest(va)
+        if a_score < thr:
+            continue
+        b_vid, b_score = nearest(vb)
+        comp = hc.complement(a_vid)
+        if cos(vb, comp) >= thr:
+            m[a], m[b] = a_vid, comp
+        elif b_score >= thr:
+            m[a], m[b] = a_vid, b_vid
+    for path in paths:
+        vecs = cg.encoder.encode(path)
+        current, score = nearest(vecs[0])
+        if score < thr:
+            continue
+        m[path[0]] = current
+        for i in range(1, len(path)):
+            cands = [current] + hc.neighbors(current)
+            scores = [cos(vecs[i], c) for c in cands]
+            best = int(np.argmax(scores))
+            if scores[best] >= thr:
+                current = cands[best]
+                m[path[i]] = current
+            else:
+                m[path[i]] = None
+
+
+def test_grounding_engine_matches_per_item_rules(tmp_path):
+    rng = np.random.RandomState(7)
+    hc = Hypercube(n=5)
+    names = [f"c{i}" for i in range(300)]
+    encoder = _TableEncoder(names, 4, rng)
+    proto = rng.randn(hc.vertex_count, 4).astype(np.float32)
+    pick = lambda k: [names[i] for i in rng.randint(0, len(names), size=k)]
+    groups = [pick(rng.randint(1, 8)) for _ in range(60)]
+    pairs = [tuple(pick(2)) for _ in range(60)]
+    paths = [pick(rng.randint(1, 7)) for _ in range(60)]
+
+    results = []
+    for legacy in (False, True):
+        cg = ConceptGrounder(hypercube=hc, encoder=encoder, prototype_init=proto, conf_threshold=0.6, mapping_dir=str(tmp_path))
+        cg.assign_bulk(names[:100])
+        if legacy:
+            _legacy_rules(cg, groups, pairs, paths)
+        else:
+            cg.enforce_synonyms(groups)
+            cg.enforce_antonyms(pairs)
+            cg.enforce_hierarchy(paths)
+        results.append(dict(cg.concept_to_vertex))
+    assert results[0] == results[1]
+    assert sum(v is not None for v in results[0].values()) > 50
@@ -7,7 +7,7 @@ import torch
 import tempfile
 from pathlib import Path
 from src.distillation.distiller import Distiller, CHECKPOINT_DIR
-from src.distillation.curriculum import CurriculumSchedule
+from src.distillation.curriculum import CurriculumSchedule, Stage
 from torch import nn
 from torch.utils.data import DataLoader
 
@@ -63,5 +63,334 @@ def test_distillation_run(tmp_path):
     assert isinstance(res, dict)
     # check checkpoint dir exists and at least one checkpoint file present
     assert os.path.isdir("distill_checkpoints")
-    files = list(Path("distill_checkpoints").glob("*.pt"))
-    assert len(files) >= 1
\ No newline at end of file
+    files = list(Path("distill_checkpoints").glob("*.safetensors"))
+    assert len(files) >= 1
+
+def test_distiller_closes_only_the_writer_it_created(tmp_path, monkeypatch):
+    from src.distillation import distiller as distiller_mod
+    from src.utils.checkpoint_writer import CheckpointWriter
+    monkeypatch.setattr(distiller_mod, "CHECKPOINT_DIR", str(tmp_path))
+    student = MockModel()
+    with Distiller(MockModel(), student, torch.optim.Adam(student.parameters(), lr=1e-3),
+                   device=torch.device("cpu")) as owned:
+        owned.run_distillation(simple_dataloader(), epochs=1)
+    assert not owned.writer._thread.is_alive()
+    shared = CheckpointWriter()
+    with Distiller(MockModel(), student, torch.optim.Adam(student.parameters(), lr=1e-3),
+                   device=torch.device("cpu"), checkpoint_writer=shared):
+        pass
+    assert shared._thread.is_alive()
+    shared.close()
+
+
+def test_transition_regularizers_match_bit_count_reference():
+    from src.distillation.losses import hypercube_transition_regularizer, soft_transition_regularizer
+    gen = torch.Generator().manual_seed(0)
+    preds = torch.randint(0, 1 << 12, (5, 40), generator=gen)
+    preds[:, 10:20] = preds[:, 9:10]  # runs of repeated vertices
+    expected = sum(max(0, (int(a) ^ int(b)).bit_count() - 1) for seq in preds.tolist() for a, b in zip(seq, seq[1:])) / 5
+    assert abs(hypercube_transition_regularizer(preds).item() - expected) < 1e-4
+    assert hypercube_transition_regularizer(preds, allow_multi_bit=True).item() == 0.0
+
+    bits = ((preds[..., None] >> torch.arange(12)) & 1).float()
+    assert abs(soft_transition_regularizer(bits).item() - expected) < 1e-3
+    logits = torch.randn(5, 40, 12, requires_grad=True)
+    soft = soft_transition_regularizer(torch.sigmoid(logits))
+    soft.backward()
+    assert soft.item() > 0 and logits.grad.abs().sum() > 0
+
+def test_chunked_token_loss_matches_dense():
+    from src.distillation.losses import token_lm_loss, chunked_token_lm_loss
+    gen = torch.Generator().manual_seed(0)
+    student = torch.randn(3, 10, 50, generator=gen, dtype=torch.float64, requires_grad=True)
+    teacher = torch.randn(3, 10, 50, generator=gen, dtype=torch.float64)
+    labels = torch.randint(0, 50, (3, 10), generator=gen)
+    labels[0, :4] = -100
+    dense = token_lm_loss(student, teacher, labels)
+    chunked = chunked_token_lm_loss(student, teacher, labels, chunk_size=3)
+    g_dense, = torch.autograd.grad(dense, student)
+    g_chunked, = torch.autograd.grad(chunked, student)
+    assert abs(dense.item() - chunked.item()) < 1e-9
+    assert torch.allclose(g_dense, g_chunked, atol=1e-9)
+    # top-k over the whole vocabulary is the dense KD term
+    full_k = chunked_token_lm_loss(student, teacher, labels, top_k=50, chunk_size=4)
+    assert abs(full_k.item() - dense.item()) < 1e-9
+
+    # temperature and renormalized top-k against an autograd reference
+    T, k = 2.0, 5
+    vals, idx = teacher.topk(k, dim=-1)
+    log_p = torch.log_softmax(vals / T, dim=-1)
+    log_q = torch.log_softmax(student / T, dim=-1).gather(-1, idx)
+    ref = (log_p.exp() * (log_p - log_q)).sum() * T * T / 3 + nn.functional.cross_entropy(
+        student.reshape(-1, 50), labels.reshape(-1), ignore_index=-100)
+    sparse = chunked_token_lm_loss(student, None, labels, temperature=T, teacher_topk=(vals, idx), chunk_size=4)
+    assert abs(ref.item() - sparse.item()) < 1e-9
+    assert torch.allclose(torch.autograd.grad(ref, student)[0], torch.autograd.grad(sparse, student)[0], atol=1e-9)
+
+def test_teacher_cache_replaces_teacher_forward(tmp_path):
+    import numpy as np
+    from src.distillation.teacher_cache import precompute_teacher_outputs, TeacherCacheLoader
+    torch.manual_seed(0)
+    teacher = MockModel()
+    cache = precompute_teacher_outputs(teacher, simple_dataloader(batches=5), str(tmp_path / "tc"), top_k=4, shard_rows=8)
+    assert len(cache) == 20 and cache.shard_rows == [8, 8, 4]
+    shard = cache.shards[0]
+    assert shard["topk_vals"].dtype == np.float16 and shard["topk_idx"].dtype == np.uint8
+    assert shard["topk_vals"].shape == (8, 6, 4) and isinstance(shard["topk_vals"], np.memmap)
+
+    loader = TeacherCacheLoader(cache, batch_size=3, shuffle=True)
+    batches = list(loader)
+    assert len(batches) == len(loader) == 8
+    first = batches[0]
+    expected = teacher({"input_ids": first["input_ids"]})["logits"].topk(4, dim=-1).values
+    assert torch.allclose(first["teacher"]["topk_vals"].float(), expected, atol=1e-2)
+    assert sorted(torch.cat([b["input_ids"] for b in batches]).sum(dim=1).tolist()) == \
+        sorted(torch.cat([b["input_ids"] for b in TeacherCacheLoader(cache)]).sum(dim=1).tolist())
+
+    def no_teacher(batch):
+        raise AssertionError("teacher should not run on cached batches")
+    student = MockModel()
+    opt = torch.optim.SGD(student.parameters(), lr=1e-3)
+    before = [p.detach().clone() for p in student.parameters()]
+    dist = Distiller(teacher=no_teacher, student=student, optimizer=opt, device=torch.device("cpu"))
+    assert dist.run_distillation(loader, epochs=1) == {"rolled_back": False}
+    assert any(not torch.equal(a, b) for a, b in zip(before, student.parameters()))
+
+def test_grad_accumulation_matches_large_batch_and_bf16_runs(tmp_path, monkeypatch):
+    import pytest
+    from src.distillation import distiller as distiller_mod
+    monkeypatch.setattr(distiller_mod, "CHECKPOINT_DIR", str(tmp_path))
+    batches = list(simple_dataloader(batches=3))
+    big = {k: torch.cat([b[k] for b in batches]) for k in batches[0]}
+    teacher = MockModel()
+    params = []
+    for data, accum in ((batches, 3), ([big], 1)):
+        torch.manual_seed(1)
+        student = MockModel()
+        dist = Distiller(teacher=teacher, student=student, optimizer=torch.optim.SGD(student.parameters(), lr=0.1),
+                         device=torch.device("cpu"), grad_accum_steps=accum)
+        dist.run_distillation(DataLoader(data, batch_size=None), epochs=1)
+        params.append([p.detach().clone() for p in student.parameters()])
+    assert all(torch.allclose(a, b, atol=1e-6) for a, b in zip(*params))
+
+    student = MockModel()
+    dist = Distiller(teacher=teacher, student=student, optimizer=torch.optim.SGD(student.parameters(), lr=0.1),
+                     device=torch.device("cpu"), precision="bf16", grad_accum_steps=2)
+    dist.run_distillation(DataLoader(batches, batch_size=None), epochs=1)
+    assert all(p.dtype == torch.float32 and torch.isfinite(p).all() for p in student.parameters())
+    with pytest.raises(ValueError):
+        Distiller(teacher=teacher, student=MockModel(), optimizer=torch.optim.SGD(student.parameters(), lr=0.1),
+                  device=torch.device("cpu"), gradient_checkpointing=True)
+
+
+def _distributed_worker(rank, world_size, teacher, student_state, data, out_path):
+    from src.distillation import distiller as distiller_mod
+    from src.distillation.distributed import DistributedDistiller
+    distiller_mod.CHECKPOINT_DIR = os.path.dirname(out_path)
+    student = MockModel()
+    if rank == 0:
+        student.load_state_dict(student_state)
+    dist = DistributedDistiller(teacher=teacher, student=student, optimizer=torch.optim.SGD(student.parameters(), lr=0.1),
+                                device=torch.device("cpu"))
+    dist.run_distillation(DataLoader(data, batch_size=None), epochs=1)
+    if rank == 0:
+        torch.save(student.state_dict(), out_path)
+
+
+def test_distributed_distiller_matches_accumulated_single_process(tmp_path, monkeypatch):
+    from src.distillation import distiller as distiller_mod
+    from src.distillation.distributed import launch
+    monkeypatch.setattr(distiller_mod, "CHECKPOINT_DIR", str(tmp_path / "single"))
+    torch.manual_seed(0)
+    teacher, student = MockModel(), MockModel()
+    data = list(simple_dataloader(batches=5))  # the fifth batch is dropped with 2 ranks
+    init = {k: v.clone() for k, v in student.state_dict().items()}
+    launch(_distributed_worker, 2, args=(teacher, init, data, str(tmp_path / "ddp.pt")))
+    dist = Distiller(teacher=teacher, student=student, optimizer=torch.optim.SGD(student.parameters(), lr=0.1),
+                     device=torch.device("cpu"), grad_accum_steps=2)
+    dist.run_distillation(DataLoader(data[:4], batch_size=None), epochs=1)
+    ddp = torch.load(tmp_path / "ddp.pt")
+    assert all(torch.allclose(ddp[k], v, atol=1e-6) for k, v in student.state_dict().items())
+    assert any(not torch.equal(init[k], v) for k, v in ddp.items())
+
+
+class _CountingDataset(torch.utils.data.Dataset):
+    def __init__(self, n):
+        self.n, self.loaded = n, []
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, i):
+        self.loaded.append(i)
+        return torch.tensor([i])
+
+
+def _shard_worker(rank, world_size, out_dir):
+    import torch.distributed as torch_dist
+    from src.distillation.distributed import _RankShard
+    torch.manual_seed(rank)  # ranks seeded differently still split one order
+    data = _CountingDataset(10)
+    seen = [int(b) for b in _RankShard(DataLoader(data, batch_size=None, shuffle=True), rank, world_size)]
+    torch.save({"seen": seen, "loaded": data.loaded}, os.path.join(out_dir, f"rank{rank}.pt"))
+    torch_dist.barrier()
+
+
+def test_rank_shards_split_one_order_and_load_only_their_batches(tmp_path):
+    from src.distillation.distributed import launch
+    launch(_shard_worker, 2, args=(str(tmp_path),))
+    ranks = [torch.load(tmp_path / f"rank{r}.pt") for r in range(2)]
+    assert all(r["loaded"] == r["seen"] and len(r["seen"]) == 5 for r in ranks)
+    assert sorted(ranks[0]["seen"] + ranks[1]["seen"]) == list(range(10))
+
+
+def _distributed_resume_worker(rank, world_size, teacher, data, root, out_path):
+    import pytest
+    from src.distillation import distiller as distiller_mod
+    from src.distillation.distributed import DistributedDistiller
+
+    def make(t, run):
+        distiller_mod.CHECKPOINT_DIR = os.path.join(root, run)
+        torch.manual_seed(3)
+        student = MockModel()
+        return DistributedDistiller(teacher=t, student=student, optimizer=torch.optim.Adam(student.parameters(), lr=0.01),
+                                    curriculum=CurriculumSchedule([Stage("a", 1), Stage("b", 2)]),
+                                    device=torch.device("cpu"), state_every_n_steps=1)
+
+    full = make(teacher, "full")
+    full.run_distillation(DataLoader(data, batch_size=None, shuffle=True), epochs=3)
+    # both ranks are preempted at their fourth batch (second batch of the second epoch)
+    crashed = make(_CrashingTeacher(teacher, crash_at=4), "crashed")
+    with pytest.raises(RuntimeError):
+        crashed.run_distillation(DataLoader(data, batch_size=None, shuffle=True), epochs=3)
+    torch.manual_seed(100 + rank)
+    resumed = make(teacher, "crashed")
+    resumed.run_distillation(DataLoader(data, batch_size=None, shuffle=True), resume_from=crashed.training_state_path)
+    if rank == 0:
+        torch.save({"full": full.student.state_dict(), "resumed": resumed.student.state_dict(),
+                    "steps": (full.global_step, resumed.global_step)}, out_path)
+
+
+def test_distributed_distiller_resumes_on_every_rank(tmp_path):
+    from src.distillation.distributed import launch
+    torch.manual_seed(0)
+    data = list(simple_dataloader(batches=4))
+    launch(_distributed_resume_worker, 2, args=(MockModel(), data, str(tmp_path), str(tmp_path / "out.pt")))
+    out = torch.load(tmp_path / "out.pt")
+    assert out["steps"][0] == out["steps"][1] == 6
+    assert all(torch.equal(v, out["resumed"][k]) for k, v in out["full"].items())
+    # only rank 0 writes the audit log
+    resumes = [line for line in open(tmp_path / "crashed" / "audit.logl") if line.startswith("STATE_RESUME")]
+    assert len(resumes) == 1
+
+
+class _CrashingTeacher(nn.Module):
+    def __init__(self, teacher, crash_at):
+        super().__init__()
+        self.teacher, self.calls, self.crash_at = teacher, 0, crash_at
+
+    def forward(self, batch):
+        self.calls += 1
+        if self.calls == self.crash_at:
+            raise RuntimeError("preempted")
+        return self.teacher(batch)
+
+
+def test_resume_from_training_state_continues_exactly(tmp_path, monkeypatch):
+    import pytest
+    from src.distillation import distiller as distiller_mod
+    teacher = MockModel()
+    data = list(simple_dataloader(batches=5))
+    curriculum = lambda: CurriculumSchedule([Stage("a", 1), Stage("b", 2)])
+
+    def make(t, run="crashed"):
+        # each run keeps its checkpoints and training state in its own directory
+        monkeypatch.setattr(distiller_mod, "CHECKPOINT_DIR", str(tmp_path / run))
+        torch.manual_seed(3)
+        student = MockModel()
+        student.embed.register_forward_hook(lambda m, i, o: nn.functional.dropout(o, 0.3, training=True))
+        return Distiller(teacher=t, student=student, optimizer=torch.optim.Adam(student.parameters(), lr=0.01),
+                         curriculum=curriculum(), device=torch.device("cpu"), grad_accum_steps=2, state_every_n_steps=1)
+
+    full = make(teacher, "full")
+    full.run_distillation(DataLoader(data, batch_size=None, shuffle=True), epochs=3)
+
+    # preempted in the middle of the second epoch (teacher call 9 = its fourth batch)
+    crashed = make(_CrashingTeacher(teacher, crash_at=9))
+    with pytest.raises(RuntimeError):
+        crashed.run_distillation(DataLoader(data, batch_size=None, shuffle=True), epochs=3)
+    torch.manual_seed(123)  # a fresh process would not share the crashed run's RNG
+    resumed = make(teacher)
+    resumed.run_distillation(DataLoader(data, batch_size=None, shuffle=True), resume_from=crashed.training_state_path)
+    assert resumed.global_step == full.global_step
+    assert resumed.curriculum.is_finished()
+    assert all(torch.equal(a, b) for a, b in zip(full.student.parameters(), resumed.student.parameters()))
+    # the state file is tensors and plain containers only
+    torch.load(resumed.training_state_path, weights_only=True)
+
+
+def test_student_factory_slices_teacher_and_trains_in_distiller(tmp_path, monkeypatch):
+    from transformers import GPT2Config, GPT2LMHeadModel
+    from src.distillation import distiller as distiller_mod
+    from src.distillation.student import build_student, top_token_ids, GPT2DistillModel
+    from src.distillation.losses import next_token_labels
+    monkeypatch.setattr(distiller_mod, "CHECKPOINT_DIR", str(tmp_path))
+    torch.manual_seed(0)
+    cfg = GPT2Config(vocab_size=300, n_positions=32, n_embd=64, n_layer=4, n_head=4, bos_token_id=0, eos_token_id=0)
+    teacher_lm = GPT2LMHeadModel(cfg).eval()
+    ids = torch.randint(0, 300, (4, 12))
+    exact = build_student(teacher_lm, layers=range(4)).eval()
+    assert torch.allclose(exact({"input_ids": ids})["logits"], teacher_lm(input_ids=ids).logits, atol=1e-5)
+
+    vocab = top_token_ids(ids.numpy(), 40, always=[0])
+    student = build_student(teacher_lm, layers=[0, 3], n_embd=32, n_inner=64, vocab_ids=vocab, concept_dim=8,
+                            vertex_bits=4)
+    assert student.model.config.n_head == 2 and student.model.config.vocab_size == 40
+    assert sum(p.numel() for p in student.parameters()) < sum(p.numel() for p in teacher_lm.parameters()) / 4
+    out = student({"input_ids": ids})
+    assert out["logits"].shape == (4, 12, 40) and out["concepts"].shape == (4, 8)
+    assert out["vertex_preds"].max() < 16
+    assert torch.equal(vocab[student.map_labels(ids)[student.map_labels(ids) != -100]], ids[torch.isin(ids, vocab)])
+
+    teacher = GPT2DistillModel(teacher_lm)
+    labels = next_token_labels(ids)
+    data = DataLoader([{"input_ids": ids, "labels": labels}] * 3, batch_size=None)
+    before = [p.detach().clone() for p in student.parameters()]
+    dist = Distiller(teacher, student, torch.optim.AdamW(student.parameters(), 1e-3),
+                     curriculum=CurriculumSchedule([Stage("s", 1)]), device=torch.device("cpu"))
+    assert dist.run_distillation(data, epochs=1) == {"rolled_back": False}
+    assert any(not torch.equal(a, b) for a, b in zip(before, student.parameters()))
+
+    # the CE term predicts the next token (mapped to student rows), not the current one
+    student.eval()
+    with torch.no_grad():
+        logits, tea_out = student({"input_ids": ids})["logits"], teacher({"input_ids": ids})
+        ce = dist._token_loss(logits, tea_out, labels) - dist._token_loss(logits, tea_out, None)
+        next_token = torch.nn.functional.cross_entropy(logits[:, :-1].reshape(-1, 40),
+                                                       student.map_labels(ids[:, 1:]).reshape(-1), ignore_index=-100)
+    assert torch.allclose(ce, next_token, atol=1e-5)
+
+
+def test_gradient_checkpointing_matches_plain_backward(tmp_path, monkeypatch):
+    from transformers import GPT2Config, GPT2LMHeadModel
+    from src.distillation import distiller as distiller_mod
+    from src.distillation.student import build_student, GPT2DistillModel
+    from src.distillation.losses import next_token_labels
+    monkeypatch.setattr(distiller_mod, "CHECKPOINT_DIR", str(tmp_path))
+    torch.manual_seed(0)
+    cfg = GPT2Config(vocab_size=100, n_positions=16, n_embd=32, n_layer=2, n_head=2,
+                     resid_pdrop=0.0, embd_pdrop=0.0, attn_pdrop=0.0)
+    teacher_lm = GPT2LMHeadModel(cfg).eval()
+    ids = torch.randint(0, 100, (2, 10))
+    data = [{"input_ids": ids, "labels": next_token_labels(ids)}]
+    params = []
+    for checkpointing in (False, True):
+        student = build_student(teacher_lm, layers=[0, 1])
+        dist = Distiller(GPT2DistillModel(teacher_lm), student, torch.optim.SGD(student.parameters(), lr=0.1),
+                         curriculum=CurriculumSchedule([Stage("s", 1)]), device=torch.device("cpu"),
+                         gradient_checkpointing=checkpointing)
+        dist.run_distillation(DataLoader(data, batch_size=None), epochs=1)
+        params.append([p.detach().clone() for p in student.parameters()])
+    assert student.model.is_gradient_checkpointing
+    assert all(torch.allclose(a, b, atol=1e-6) for a, b in zip(*params))
+    assert any(not torch.equal(a, b) for a, b in zip(params[0], teacher_lm.parameters()))
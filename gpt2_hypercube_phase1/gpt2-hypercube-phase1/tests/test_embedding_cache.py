@@ -0,0 +1,77 @@
+import numpy as np
+from src.embeddings.cache import CachedEncoder
+
+
+class CountingEncoder:
+    """Deterministic 8-d encoder that records every text it is asked to encode."""
+    def __init__(self):
+        self.seen = []
+
+    def __call__(self, texts):
+        self.seen.extend(texts)
+        out = np.zeros((len(texts), 8), dtype=np.float32)
+        for i, t in enumerate(texts):
+            out[i] = np.random.RandomState(sum(map(ord, t)) + len(t)).randn(8)
+        return out
+
+
+def test_cache_dedupes_and_only_encodes_misses():
+    base = CountingEncoder()
+    enc = CachedEncoder(base)
+    out = enc(["a", "b", "a", "c", "b"])
+    assert base.seen == ["a", "b", "c"]
+    np.testing.assert_array_equal(out, base(["a", "b", "a", "c", "b"]))
+    base.seen.clear()
+    enc(["c", "d", "a"])
+    assert base.seen == ["d"]
+    stats = enc.stats()
+    assert stats["misses"] == 4 and stats["hits"] == 2
+    assert stats["memory_bytes"] == 4 * 8 * 4
+
+
+def test_cache_spills_to_disk_and_survives_restart(tmp_path):
+    path = str(tmp_path / "emb.sqlite")
+    base = CountingEncoder()
+    # room for two 32-byte vectors in memory
+    enc = CachedEncoder(base, max_bytes=64, spill_path=path, namespace="test")
+    texts = [f"text {i}" for i in range(10)]
+    expected = base(texts)
+    base.seen.clear()
+    np.testing.assert_array_equal(enc(texts), expected)
+    assert enc.stats()["memory_entries"] == 2
+    assert enc.stats()["disk_bytes"] == 8 * 32
+    np.testing.assert_array_equal(enc(texts[:3]), expected[:3])
+    assert enc.stats()["disk_hits"] == 3
+    enc.flush()
+    enc.close()
+
+    base.seen.clear()
+    again = CachedEncoder(base, max_bytes=64, spill_path=path, namespace="test")
+    np.testing.assert_array_equal(again(texts), expected)
+    assert base.seen == []
+    assert again.stats()["hit_ratio"] == 1.0
+    # another namespace in the same file does not see these entries
+    other = CachedEncoder(base, spill_path=path, namespace="other")
+    other(texts[:2])
+    assert base.seen == texts[:2]
+
+
+def test_cache_buffers_evictions_and_keeps_dim_for_empty_input(tmp_path):
+    import sqlite3
+    path = str(tmp_path / "emb.sqlite")
+    base = CountingEncoder()
+    enc = CachedEncoder(base, max_bytes=64, spill_path=path, spill_batch=5)
+    assert enc([]).shape == (0, 0)
+    enc([f"text {i}" for i in range(10)])
+
+    def rows_on_disk():
+        with sqlite3.connect(path) as other:
+            return other.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+    # 8 evictions: one batch of 5 committed, 3 still buffered
+    assert rows_on_disk() == 5
+    # "text 6" comes back from the buffer, "text 1" from disk; they evict "text 8" and "text 9"
+    np.testing.assert_array_equal(enc(["text 6", "text 1"]), base(["text 6", "text 1"]))
+    assert enc([]).shape == (0, 8)
+    enc.close()
+    assert rows_on_disk() == 9
@@ -0,0 +1,51 @@
+"""
+Unit tests for the batched GPT-2 text encoder (tiny randomly initialised GPT-2, no download).
+"""
+import numpy as np
+import pytest
+import torch
+from transformers import GPT2Config, GPT2LMHeadModel
+from src.embeddings.gpt2_encoder import GPT2Encoder
+from src.api.retrieval import RetrievalAPI
+from src.knowledge.vector_db import VectorDB
+
+
+class CharTokenizer:
+    """Maps characters to ids; enough of the GPT-2 tokenizer call contract for the encoder."""
+    eos_token_id = 0
+
+    def __call__(self, texts, truncation=True, max_length=None):
+        ids = [[1 + (ord(c) % 60) for c in t] for t in texts]
+        if truncation and max_length:
+            ids = [x[:max_length] for x in ids]
+        return {"input_ids": ids}
+
+
+@pytest.fixture(scope="module")
+def tiny_gpt2():
+    torch.manual_seed(0)
+    model = GPT2LMHeadModel(GPT2Config(vocab_size=64, n_positions=64, n_embd=32, n_layer=2, n_head=2))
+    model.eval()
+    return model
+
+
+@pytest.mark.parametrize("mode", ["hidden", "embedding"])
+def test_batched_encoding_matches_single_text_encoding(tiny_gpt2, mode):
+    enc = GPT2Encoder(tiny_gpt2, CharTokenizer(), mode=mode, batch_size=3, max_length=16)
+    texts = ["apple", "a much longer sentence about fruit", "", "banana", "apple"]
+    batch = enc(texts)
+    assert batch.shape == (5, 32) and batch.dtype == np.float32
+    assert np.allclose(np.linalg.norm(batch, axis=1), 1.0, atol=1e-5)
+    for i, t in enumerate(texts):
+        assert np.allclose(enc([t])[0], batch[i], atol=1e-5)
+    assert np.allclose(batch[0], batch[4])
+
+
+def test_projection_and_retrieval_contract(tiny_gpt2):
+    enc = GPT2Encoder(tiny_gpt2, CharTokenizer(), projection_dim=8, layer=1)
+    docs = ["the capital of france is paris", "dogs are mammals", "water boils at 100 degrees"]
+    vdb = VectorDB()
+    vdb.bulk_upsert([(i, v, {"snippet": d}) for i, (v, d) in enumerate(zip(enc(docs), docs))])
+    res = RetrievalAPI(enc, vdb).retrieve("dogs are mammals", k=1)
+    assert res[0]["meta"]["snippet"] == "dogs are mammals"
+    assert res[0]["score"] == pytest.approx(1.0, abs=1e-5)
@@ -0,0 +1,68 @@
+"""
+Holdout evaluation: batched generation, pooled scoring, cached references, sequential early stop.
+"""
+from src.distillation.distiller import _latest_scores, _record_scores
+from src.evaluation.holdout import HoldoutEvaluator, TokenOverlapEvaluator
+
+
+class EchoStudent:
+    def __init__(self, wrong_every=0):
+        self.batches = []
+        self.wrong_every = wrong_every
+
+    def generate_batch(self, prompts):
+        self.batches.append(len(prompts))
+        return [("nonsense" if self.wrong_every and i % self.wrong_every == 0 else p.replace("q", "a"))
+                for i, p in enumerate(prompts)]
+
+
+class CountingEvaluator(TokenOverlapEvaluator):
+    def __init__(self):
+        self.prepared = 0
+
+    def prepare(self, reference):
+        self.prepared += 1
+        return super().prepare(reference)
+
+
+def test_batched_pooled_evaluation_caches_references():
+    holdout = [{"prompt": f"q {i} x{i % 7}", "reference": f"a {i} x{i % 7}"} for i in range(40)]
+    scorer = CountingEvaluator()
+    inline = HoldoutEvaluator(scorer, batch_size=16, max_samples=None)
+    student = EchoStudent(wrong_every=4)
+    first = inline.evaluate(student, holdout)
+    assert student.batches == [16, 16, 8] and first["n"] == 40
+    assert abs(first["metrics"]["token_f1"] - 0.75) < 1e-9 and list(first["metrics"])[0] == "token_f1"
+    inline.evaluate(student, holdout)
+    assert scorer.prepared == 40
+
+    pooled = HoldoutEvaluator(TokenOverlapEvaluator(), batch_size=16, workers=2)
+    assert pooled.evaluate(EchoStudent(wrong_every=4), holdout)["scores"] == first["scores"]
+    pooled.close()
+
+
+def test_sequential_test_stops_once_the_drop_is_decided():
+    holdout = [{"prompt": f"q {i}", "reference": f"a {i}"} for i in range(200)]
+    baseline = [1.0] * 200
+    ev = HoldoutEvaluator(TokenOverlapEvaluator(), batch_size=8, min_samples=16, alpha=0.05)
+    same = ev.evaluate(EchoStudent(), holdout, baseline=baseline, max_drop=0.1)
+    assert same["decision"] == "below" and same["n"] < 40
+    broken = ev.evaluate(EchoStudent(wrong_every=1), holdout, baseline=baseline, max_drop=0.1)
+    assert broken["decision"] == "above" and broken["n"] < 40
+    # a drop close to the threshold needs the whole holdout
+    close = ev.evaluate(EchoStudent(wrong_every=10), holdout, baseline=baseline, max_drop=0.1)
+    assert close["decision"] is None and close["n"] == 200
+
+
+def test_early_stopped_baseline_pairs_only_its_samples():
+    holdout = [{"prompt": f"q {i}", "reference": f"a {i}"} for i in range(40)]
+    ev = HoldoutEvaluator(TokenOverlapEvaluator(), batch_size=8, min_samples=16, alpha=0.05)
+    # a baseline cut short by an early stop no longer caps the next evaluation
+    out = ev.evaluate(EchoStudent(wrong_every=10), holdout, baseline=[1.0] * 16, max_drop=0.1)
+    assert out["n"] == 40 and out["decision"] is None
+
+    record = _record_scores({}, [1.0] * 40, epoch=-1)
+    record = _record_scores(record, out["scores"][:16], epoch=0)
+    assert record[20] == (1.0, -1) and record[3] == (out["scores"][3], 0)
+    # stale scores from before the early stop are never compared against
+    assert _latest_scores(record) == out["scores"][:16]
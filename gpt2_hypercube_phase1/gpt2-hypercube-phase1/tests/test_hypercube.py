@@ -0,0 +1,51 @@
+import numpy as np
+from src.hypercube.topology import Hypercube
+from src.hypercube import skeleton
+from src.hypercube.neighborhood import ball, ball_size, iter_ball, iter_subcube, subcube
+
+
+def test_batched_topology_matches_scalar_ops():
+    hc = Hypercube(n=7)
+    rng = np.random.RandomState(0)
+    a = rng.randint(0, hc.vertex_count, size=200)
+    b = rng.randint(0, hc.vertex_count, size=200)
+    bits = hc.bits_of(a)
+    assert bits.shape == (200, 7)
+    assert bits.tolist() == [hc.bits_of(int(v)) for v in a]
+    np.testing.assert_array_equal(hc.vertex_id(bits), a)
+    assert hc.hamming(a, b).tolist() == [hc.hamming(int(x), int(y)) for x, y in zip(a, b)]
+    assert hc.neighbors(a).tolist() == [hc.neighbors(int(v)) for v in a]
+    assert hc.complement(a).tolist() == [hc.complement(int(v)) for v in a]
+    assert Hypercube(n=40).hamming(np.array([0]), np.array([(1 << 40) - 1]))[0] == 40
+
+
+def test_lazy_edges_match_pairwise_definition():
+    n = 5
+    old = [np.array(list(bin(i)[2:].zfill(n)), dtype=int) for i in range(2 ** n)]
+    expected = [(i, j) for i in range(len(old)) for j in range(i + 1, len(old)) if np.abs(old[i] - old[j]).sum() == 1]
+    sk = skeleton.Hypercube(n)
+    assert repr(sk) == "Hypercube(dimension=5, vertices=32, edges=80)"
+    assert list(sk.iter_edges()) == expected
+    assert sk.get_edges().tolist() == [list(e) for e in expected]
+    assert sk.get_vertex(9).tolist() == old[9].tolist()
+    np.testing.assert_array_equal(sk.vertices, np.stack(old))
+    hc = Hypercube(n=9)
+    assert sum(len(block) for block in hc.edge_blocks(block=100)) == hc.edge_count
+
+
+def test_hamming_ball_and_subcube_gray_order():
+    hc = Hypercube(n=9)
+    center = 0b101100101
+    for r in range(5):
+        lazy = list(iter_ball(hc, center, r))
+        assert ball(hc, center, r).tolist() == lazy
+        assert len(lazy) == ball_size(9, r)
+        assert set(lazy) == {v for v in range(hc.vertex_count) if hc.hamming(v, center) <= r}
+        assert all(hc.hamming(u, v) <= 2 for u, v in zip(lazy, lazy[1:]))
+    centers = np.array([0, 7, 300])
+    np.testing.assert_array_equal(ball(hc, centers, 2)[2], ball(hc, 300, 2))
+
+    cube = list(iter_subcube(hc, value=0b110000000, free_mask=0b000101011))
+    assert subcube(hc, 0b110000000, 0b000101011).tolist() == cube
+    assert sorted(cube) == [v for v in range(hc.vertex_count) if v & ~0b000101011 == 0b110000000]
+    assert all(hc.hamming(u, v) == 1 for u, v in zip(cube, cube[1:]))
@@ -0,0 +1,105 @@
+import json
+import numpy as np
+import pytest
+from src.hypercube.topology import Hypercube
+from src.routing.bit_transition_table import BitTransitionTable
+from src.routing.router import HypercubeRouter
+
+
+def test_bit_transition_table_overrides_and_binary_roundtrip(tmp_path):
+    hc = Hypercube(n=4)
+    table = BitTransitionTable(hc)
+    assert table.is_implicit
+    assert table.neighbors(5) == hc.neighbors(5)
+    assert len(table.edge_list()) == hc.edge_count
+
+    table.remove_edge(0, 4)
+    table.add_edge(3, 12)
+    assert not table.has_edge(4, 0) and table.has_edge(12, 3)
+    assert table.neighbors(0) == [1, 2, 8]
+    assert table.neighbors(3) == [2, 1, 7, 11, 12]
+    edges = table.edge_list()
+    assert len(edges) == hc.edge_count and [0, 4] not in edges.tolist() and [3, 12] in edges.tolist()
+    assert list(table.iter_edges()) == [tuple(e) for e in edges.tolist()]
+    np.testing.assert_array_equal(table.disabled_masks(np.array([0, 4, 5])), [4, 4, 0])
+
+    path = str(tmp_path / "table.btt")
+    table.save(path)
+    loaded = BitTransitionTable.load(path)
+    assert all(loaded.neighbors(v) == table.neighbors(v) for v in hc.iter_vertices())
+
+    # legacy JSON adjacency files keep loading
+    legacy = str(tmp_path / "table.json")
+    with open(legacy, "w", encoding="utf-8") as f:
+        json.dump({"n": 4, "adjacency": {str(v): table.neighbors(v) for v in hc.iter_vertices()}}, f)
+    migrated = BitTransitionTable.load(legacy)
+    assert all(migrated.neighbors(v) == table.neighbors(v) for v in hc.iter_vertices())
+    # vertices a legacy file leaves out had no neighbours there
+    with open(legacy, "w", encoding="utf-8") as f:
+        json.dump({"n": 4, "adjacency": {"0": [1], "1": [0]}}, f)
+    sparse = BitTransitionTable.load(legacy)
+    assert sparse.edge_list().tolist() == [[0, 1]] and sparse.neighbors(6) == []
+    with open(legacy, "w", encoding="utf-8") as f:
+        json.dump({"n": 4, "adjacency": {"0": [0, 1]}}, f)
+    with pytest.raises(ValueError):
+        BitTransitionTable.load(legacy)
+
+    table.add_edge(4, 0)
+    table.remove_edge(12, 3)
+    assert table.is_implicit
+
+
+def _bfs_distance(table, a, b, blocked):
+    dist, frontier = {a: 0}, [a]
+    while frontier:
+        nxt = []
+        for u in frontier:
+            for v in table.neighbors(u):
+                if v not in dist and (v not in blocked or v == b):
+                    dist[v] = dist[u] + 1
+                    nxt.append(v)
+        frontier = nxt
+    return dist.get(b)
+
+
+def test_router_ecube_disjoint_and_constrained_paths():
+    hc = Hypercube(n=8)
+    router = HypercubeRouter(hc)
+    rng = np.random.RandomState(0)
+    src = rng.randint(0, hc.vertex_count, size=300)
+    dst = rng.randint(0, hc.vertex_count, size=300)
+    paths, lengths = router.shortest_paths(src, dst)
+    for s, d, row, length in zip(src, dst, paths, lengths):
+        expected = router.shortest_path(int(s), int(d))
+        assert row[: length + 1].tolist() == expected and (row[length + 1:] == -1).all()
+        assert all(hc.hamming(u, v) == 1 for u, v in zip(expected, expected[1:]))
+    np.testing.assert_array_equal(lengths, router.distances(src, dst))
+    np.testing.assert_array_equal(router.next_hops(src, dst), np.where(lengths > 0, paths[:, 1], src))
+
+    a, b = 0b00010110, 0b10010011
+    disjoint = router.disjoint_paths(a, b)
+    assert len(disjoint) == hc.n
+    inner = [v for p in disjoint for v in p[1:-1]]
+    assert len(inner) == len(set(inner))
+    assert all(p[0] == a and p[-1] == b and all(hc.hamming(u, v) == 1 for u, v in zip(p, p[1:])) for p in disjoint)
+
+    table = BitTransitionTable(hc)
+    for u, v in zip(rng.randint(0, 256, 40).tolist(), rng.randint(0, 8, 40).tolist()):
+        table.remove_edge(u, u ^ (1 << v))
+    table.add_edge(1, 254)
+    constrained = HypercubeRouter(hc, table=table)
+    blocked = set(rng.randint(0, 256, 60).tolist())
+    for s, d in zip(src[:50].tolist(), dst[:50].tolist()):
+        path = constrained.route(s, d, blocked=blocked)
+        expected = _bfs_distance(table, s, d, blocked - {s})
+        if expected is None:
+            assert path is None
+            continue
+        assert path[0] == s and path[-1] == d and len(path) - 1 == expected
+        assert all(table.has_edge(u, v) for u, v in zip(path, path[1:]))
+        assert not set(path[1:-1]) & blocked
+    assert table.shortest_route(1, 254) == [1, 254]
+    assert BitTransitionTable(hc).shortest_route(3, 12) == [3, 2, 0, 4, 12]
+    small = HypercubeRouter(Hypercube(n=4))
+    assert small.route(0, 15, blocked={1, 2, 4}) == [0, 8, 12, 14, 15]
+    assert small.route(0, 15, blocked={1, 2, 4, 8}) is None
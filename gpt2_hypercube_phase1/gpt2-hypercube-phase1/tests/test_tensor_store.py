@@ -0,0 +1,67 @@
+"""
+Content-addressed checkpoint store: dedup, aliases, round trip and garbage collection.
+"""
+import torch
+from torch import nn
+from src.utils.tensor_store import TensorStore
+from src.utils.checkpoint_writer import CheckpointWriter
+
+
+def test_store_dedups_and_collects(tmp_path):
+    store = TensorStore(str(tmp_path / "store"))
+    model = nn.Sequential(nn.Embedding(100, 16), nn.Linear(16, 100))
+    model[1].weight = nn.Parameter(torch.randn(100, 16))
+    state = dict(model.state_dict(), tied=model[1].weight)  # alias of 1.weight
+    full = store.put("v0", state)
+    assert full["bytes_written"] == full["bytes_total"] == (100 * 16 * 2 + 100) * 4
+    assert store.put("v1", model.state_dict())["bytes_written"] == 0
+
+    with torch.no_grad():
+        model[1].bias.add_(1.0)
+    writer = CheckpointWriter()
+    stats = store.put("v2", model.state_dict(), metadata={"step": 2}, writer=writer).result()
+    assert stats["bytes_written"] == 100 * 4
+
+    tensors, meta = store.get("v0")
+    assert tensors["tied"] is tensors["1.weight"] and meta == {}
+    loaded, meta = store.get(store.manifest_path("v2"))
+    assert meta == {"step": 2}
+    assert all(torch.equal(loaded[k], v) for k, v in model.state_dict().items())
+
+    assert store.gc()["blobs_removed"] == 0
+    store.delete("v0")
+    store.delete("v1")
+    assert store.gc() == {"blobs_removed": 1, "bytes_freed": 100 * 4}  # only the old bias
+    assert store.names() == ["v2"]
+    writer.close()
+
+
+def test_store_sees_writes_through_data(tmp_path):
+    store = TensorStore(str(tmp_path / "store"))
+    layer = nn.Linear(8, 8)
+    store.put("a", layer.state_dict())
+    layer.weight.data.zero_()  # bypasses the autograd version counter
+    assert store.put("b", layer.state_dict())["bytes_written"] == 8 * 8 * 4
+    assert torch.equal(store.get("b")[0]["weight"], torch.zeros(8, 8))
+
+
+def test_distiller_checkpoints_into_store(tmp_path, monkeypatch):
+    from test_distillation import MockModel, simple_dataloader
+    from src.distillation import distiller as distiller_mod
+    from src.distillation.distiller import Distiller
+    monkeypatch.setattr(distiller_mod, "CHECKPOINT_DIR", str(tmp_path / "ckpt"))
+    store = TensorStore(str(tmp_path / "store"))
+    torch.manual_seed(0)
+    student = MockModel()
+    student.embed.weight.requires_grad_(False)  # frozen: stored once across checkpoints
+    initial = {k: v.clone() for k, v in student.state_dict().items()}
+    dist = Distiller(teacher=MockModel(), student=student, optimizer=torch.optim.SGD(
+        [p for p in student.parameters() if p.requires_grad], lr=0.1), device=torch.device("cpu"),
+        checkpoint_store=store)
+    dist.run_distillation(simple_dataloader(), epochs=2)
+    stats = store.stats()
+    embed_bytes = 64 * 16 * 4
+    assert stats["checkpoints"] == 3
+    assert stats["logical_bytes"] - stats["blob_bytes"] >= 2 * embed_bytes
+    assert dist._rollback_to(store.manifest_path("pre_distill"))
+    assert all(torch.equal(initial[k], v) for k, v in student.state_dict().items())
@@ -0,0 +1,382 @@
+"""
+Unit tests for VectorDB storage and the memory-mapped on-disk format.
+"""
+import os
+import pickle
+import numpy as np
+import pytest
+from src.knowledge.vector_db import VectorDB, convert_pickle_store
+from src.hypercube.topology import Hypercube
+from src.api.retrieval import RetrievalAPI
+
+
+def _populated_db(n=50, dim=16, seed=0):
+    rng = np.random.RandomState(seed)
+    vdb = VectorDB()
+    vdb.bulk_upsert([(i, rng.randn(dim).astype(np.float32), {"snippet": f"s{i}"}) for i in range(n)])
+    return vdb, rng
+
+
+def test_query_matches_bruteforce_cosine():
+    vdb, rng = _populated_db()
+    q = rng.randn(16).astype(np.float32)
+    mat = np.vstack([vdb.vectors[i] for i in range(50)])
+    sims = mat @ q / (np.linalg.norm(mat, axis=1) * np.linalg.norm(q))
+    res = vdb.query(q, top_k=5)
+    assert [r["vertex_id"] for r in res] == list(np.argsort(-sims)[:5])
+    assert res[0]["score"] == pytest.approx(float(sims.max()), rel=1e-5)
+    assert res[0]["meta"]["snippet"] == f"s{res[0]['vertex_id']}"
+
+
+def test_neighborhood_retrieval_scores_the_top_vertex_ball():
+    vdb, rng = _populated_db(n=64, dim=16)
+    hc = Hypercube(n=6)
+    qvec = vdb.vectors[21] + 0.01 * rng.randn(16).astype(np.float32)
+    api = RetrievalAPI(lambda texts: np.stack([qvec] * len(texts)), vdb, hypercube=hc)
+    res = api.retrieve_neighborhood("query", radius=2, k=100)
+    near = {v for v in range(64) if hc.hamming(v, 21) <= 2}
+    assert res[0]["vertex_id"] == 21 and res[0]["distance"] == 0
+    assert {r["vertex_id"] for r in res} == near
+    brute = {r["vertex_id"]: r["score"] for r in vdb.query(qvec, top_k=64)}
+    assert all(abs(r["score"] - brute[r["vertex_id"]]) < 1e-5 for r in res)
+    assert [r["score"] for r in res] == sorted((r["score"] for r in res), reverse=True)
+    assert len(api.retrieve_neighborhood("query", radius=1, k=3)) == 3
+
+
+def test_save_load_mmap_roundtrip_and_upsert(tmp_path):
+    vdb, rng = _populated_db()
+    path = str(tmp_path / "store.vdb")
+    vdb.save(path)
+    loaded = VectorDB()
+    loaded.load(path)
+    assert isinstance(loaded.snapshot().codes, np.memmap)
+    q = rng.randn(16).astype(np.float32)
+    assert loaded.query(q, top_k=10) == vdb.query(q, top_k=10)
+    # first write copies out of the read-only mapping; existing rows keep their metadata
+    loaded.upsert(3, np.ones(16, dtype=np.float32), {"snippet": "updated"})
+    loaded.upsert(99, -np.ones(16, dtype=np.float32), {"snippet": "new"})
+    assert len(loaded) == 51
+    assert loaded.query(np.ones(16), top_k=1)[0]["meta"] == {"snippet": "updated"}
+    assert loaded.meta[7] == {"snippet": "s7"}
+
+
+def test_float16_save_and_legacy_pickle_migration(tmp_path):
+    vdb, rng = _populated_db()
+    q = rng.randn(16).astype(np.float32)
+    f16 = str(tmp_path / "store16.vdb")
+    half = VectorDB(storage="float16")
+    half.bulk_upsert([(i, v, vdb.meta[i]) for i, v in vdb.vectors.items()])
+    half.save(f16)
+    half = VectorDB()
+    half.load(f16)
+    assert half.storage == "float16" and half.snapshot().codes.dtype == np.float16
+    assert [r["vertex_id"] for r in half.query(q, top_k=3)] == [r["vertex_id"] for r in vdb.query(q, top_k=3)]
+
+    legacy = str(tmp_path / "legacy.pkl")
+    with open(legacy, "wb") as f:
+        pickle.dump({"vectors": vdb.vectors, "meta": dict(vdb.meta)}, f)
+    old = VectorDB()
+    old.load(legacy)
+    assert old.query(q, top_k=5) == vdb.query(q, top_k=5)
+    converted = convert_pickle_store(legacy, str(tmp_path / "converted.vdb"))
+    new = VectorDB()
+    new.load(converted)
+    assert new.query(q, top_k=5) == vdb.query(q, top_k=5)
+
+
+def test_empty_store_roundtrip(tmp_path):
+    vdb = VectorDB()
+    assert vdb.query(np.ones(4), top_k=3) == []
+    vdb.save(str(tmp_path / "empty.vdb"))
+    loaded = VectorDB()
+    loaded.load(str(tmp_path / "empty.vdb"))
+    assert loaded.query(np.ones(4), top_k=3) == []
+
+
+def _clustered(n, dim, n_clusters, rng):
+    centers = rng.randn(n_clusters, dim).astype(np.float32)
+    return centers[rng.randint(0, n_clusters, size=n)] + 0.3 * rng.randn(n, dim).astype(np.float32)
+
+
+@pytest.mark.parametrize("storage,kwargs,min_recall", [
+    ("int8", {}, 0.9),
+    ("pq", {"pq_subvectors": 16, "pq_centroids": 64}, 0.5),
+    ("pq", {"pq_subvectors": 16, "pq_centroids": 64, "rerank": 50}, 0.9),
+])
+def test_quantized_storage_recall_and_persistence(tmp_path, storage, kwargs, min_recall):
+    rng = np.random.RandomState(1)
+    data = _clustered(2000, 32, 20, rng)
+    queries = _clustered(20, 32, 20, rng)
+    exact = VectorDB()
+    quant = VectorDB(storage=storage, **kwargs)
+    for db in (exact, quant):
+        db.bulk_upsert([(i, v, {"i": i}) for i, v in enumerate(data)])
+    if storage == "pq":
+        # 2000 vectors are below the 39 * 64 a store needs to train itself
+        quant.train()
+
+    def recall(db):
+        hits = 0
+        for q in queries:
+            truth = {r["vertex_id"] for r in exact.query(q, top_k=10)}
+            hits += len(truth & {r["vertex_id"] for r in db.query(q, top_k=10)})
+        return hits / (10 * len(queries))
+
+    assert recall(quant) >= min_recall
+    usage = quant.memory_usage()
+    assert usage["codes"] < exact.memory_usage()["codes"]
+    path = str(tmp_path / f"{storage}.vdb")
+    quant.save(path)
+    loaded = VectorDB()
+    loaded.load(path)
+    assert loaded.storage == storage and loaded.rerank == quant.rerank
+    assert loaded.memory_usage()["full"] == 0
+    q = queries[0]
+    assert [r["vertex_id"] for r in loaded.query(q, 10)] == [r["vertex_id"] for r in quant.query(q, 10)]
+
+
+def test_small_pq_store_warns_and_scores_exactly_until_trained(tmp_path):
+    vdb, rng = _populated_db(n=100)
+    pq = VectorDB(storage="pq", pq_subvectors=4, pq_centroids=16)
+    pq.bulk_upsert([(i, v, vdb.meta[i]) for i, v in vdb.vectors.items()])
+    q = rng.randn(16).astype(np.float32)
+    with pytest.warns(RuntimeWarning, match="fewer than 624"):
+        hits = pq.query(q, top_k=5)
+    assert not pq.snapshot().codec.trained
+    assert [r["vertex_id"] for r in hits] == [r["vertex_id"] for r in vdb.query(q, top_k=5)]
+    # an untrained store round-trips with its full-precision rows
+    path = str(tmp_path / "untrained.vdb")
+    with pytest.warns(RuntimeWarning):
+        pq.save(path)
+    loaded = VectorDB()
+    loaded.load(path)
+    assert not loaded.snapshot().codec.trained and loaded.snapshot().full is not None
+    pq.train()
+    assert pq.snapshot().codec.trained and pq.snapshot().full is None
+    big = VectorDB(storage="pq", pq_subvectors=4, pq_centroids=16, pq_min_train=100)
+    big.bulk_upsert([(i, v, None) for i, v in vdb.vectors.items()])
+    big.query(q)
+    assert big.snapshot().codec.trained
+
+
+def test_snapshot_isolation_and_batched_publication():
+    vdb = VectorDB(publish_every=4)
+    vdb.upsert(0, np.ones(8, dtype=np.float32), {"v": 0})
+    assert len(vdb) == 0  # staged, not yet visible
+    snap = vdb.publish()
+    assert len(snap) == 1
+    vdb.bulk_upsert([(0, -np.ones(8, dtype=np.float32), {"v": 1})] + [(i, np.eye(8)[i], {"v": 1}) for i in range(1, 4)])
+    # the earlier snapshot still sees version 0 of vertex 0
+    assert len(snap) == 1 and snap.meta[0] == {"v": 0}
+    assert snap.query(np.ones(8), top_k=1)[0]["score"] == pytest.approx(1.0)
+    assert len(vdb) == 4 and vdb.meta[0] == {"v": 1}
+    # appends publish a new meta map too: the old snapshot's keys do not change under its readers
+    before = vdb.snapshot()
+    vdb.bulk_upsert([(i, np.eye(8)[i % 8], {"v": 2}) for i in range(4, 8)])
+    assert len(before.meta) == 4 and sorted(before.meta) == [0, 1, 2, 3]
+    assert len(vdb.meta) == 8
+    with pytest.raises(TypeError):
+        vdb.meta[0] = {}
+
+
+def test_concurrent_readers_and_writers_see_consistent_snapshots():
+    import threading
+    dim, n_ids, rounds = 8, 64, 40
+    vdb = VectorDB(publish_every=8)
+
+    def vec(vid, version):
+        v = np.zeros(dim, dtype=np.float32)
+        v[vid % dim] = 1.0
+        v[(vid + 1) % dim] = float(version)
+        return v
+
+    vdb.bulk_upsert([(i, vec(i, 0), {"version": 0}) for i in range(n_ids)])
+    vdb.publish()
+    errors = []
+    stop = threading.Event()
+
+    def writer(offset):
+        for version in range(1, rounds):
+            vdb.bulk_upsert([(i, vec(i, version), {"version": version}) for i in range(offset, n_ids, 2)])
+            new_id = n_ids + offset + 2 * version
+            vdb.bulk_upsert([(new_id, vec(new_id, version), {"version": version})])
+        vdb.publish()
+
+    def reader():
+        rng = np.random.RandomState()
+        last_count = 0
+        while not stop.is_set():
+            snap = vdb.snapshot()
+            if len(snap) < last_count:
+                errors.append("snapshot shrank")
+            last_count = len(snap)
+            vectors = snap.vectors()
+            for r in snap.query(rng.randn(dim), top_k=5):
+                if vectors[r["vertex_id"]][(r["vertex_id"] + 1) % dim] != r["meta"]["version"]:
+                    errors.append(f"torn read for {r['vertex_id']}")
+
+    readers = [threading.Thread(target=reader) for _ in range(4)]
+    writers = [threading.Thread(target=writer, args=(k,)) for k in range(2)]
+    for t in readers + writers:
+        t.start()
+    for t in writers:
+        t.join()
+    stop.set()
+    for t in readers:
+        t.join()
+    assert not errors, errors[:5]
+    assert len(vdb) == n_ids + 2 * (rounds - 1)
+    assert all(vdb.meta[i]["version"] == rounds - 1 for i in range(n_ids))
+
+
+def _shared_reader_proc(root, expected_gen, queue):
+    from src.knowledge.shared_vector_db import SharedVectorDB
+    reader = SharedVectorDB(root)
+    while reader.generation < expected_gen:
+        reader.refresh()
+    res = reader.query(np.eye(8)[3], top_k=1)
+    queue.put((reader.generation, res[0]["vertex_id"], res[0]["meta"], reader.memory_usage()["codes"]))
+
+
+def test_shared_vector_db_generations_across_processes(tmp_path):
+    import multiprocessing as mp
+    from src.knowledge.shared_vector_db import SharedVectorDB
+    root = str(tmp_path / "shared")
+    writer = SharedVectorDB(root, writer=True, publish_every=8, keep_generations=1)
+    reader = SharedVectorDB(root)
+    assert reader.generation == 0 and len(reader) == 0
+    writer.bulk_upsert([(i, np.eye(8)[i], {"snippet": f"s{i}"}) for i in range(8)])
+    assert writer.generation == 1
+    # readers attach zero-copy and pick up new generations on their next call
+    assert len(reader) == 8 and reader.generation == 1
+    assert reader.memory_usage()["codes"] == 0 and writer.memory_usage()["codes"] == 0
+    with pytest.raises(PermissionError):
+        reader.upsert(9, np.ones(8))
+
+    writer.upsert(3, np.eye(8)[3], {"snippet": "updated"})
+    assert writer.generation == 1  # staged until publish_every or publish()
+    writer.publish()
+    ctx = mp.get_context("fork") if "fork" in mp.get_all_start_methods() else None
+    if ctx is None:
+        pytest.skip("fork start method unavailable")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_shared_reader_proc, args=(root, 2, queue))
+    proc.start()
+    gen, vid, meta, resident = queue.get(timeout=30)
+    proc.join(timeout=30)
+    assert (gen, vid, meta, resident) == (2, 3, {"snippet": "updated"}, 0)
+    assert reader.query(np.eye(8)[3], top_k=1)[0]["meta"] == {"snippet": "updated"}
+    # generation 2 only wrote the updated row on top of the generation 1 base
+    assert sorted(os.listdir(root)) == ["GENERATION", "gen_00000001.base.vdb", "gen_00000002.delta.vdb"]
+    assert len(reader) == 8 and len(reader.query(np.eye(8)[3], top_k=20)) == 8
+
+
+def test_shared_vector_db_compaction_and_deferred_removal(tmp_path, monkeypatch):
+    from src.knowledge.shared_vector_db import SharedVectorDB
+    vdb, rng = _populated_db(n=64)
+    root = str(tmp_path / "shared")
+    writer = SharedVectorDB(root, writer=True, publish_every=16, keep_generations=1, compact_every=2)
+    reader = SharedVectorDB(root)
+    items = [(i, v, vdb.meta[i]) for i, v in vdb.vectors.items()]
+    writer.bulk_upsert(items[:16])
+    writer.bulk_upsert(items[16:32])
+    writer.bulk_upsert(items[32:48])
+    assert sorted(os.listdir(root))[1:] == ["gen_00000001.base.vdb", "gen_00000002.delta.vdb",
+                                            "gen_00000003.delta.vdb"]
+    # a file the OS refuses to delete while mapped stays until a later publication
+    real_remove = os.remove
+
+    def refuse(path):
+        raise PermissionError(path)
+
+    monkeypatch.setattr(os, "remove", refuse)
+    writer.bulk_upsert(items[48:])
+    assert writer.generation == 4 and len(os.listdir(root)) == 5
+    monkeypatch.setattr(os, "remove", real_remove)
+    writer.upsert(0, items[0][1], {"snippet": "again"})
+    writer.publish()
+    assert sorted(os.listdir(root))[1:] == ["gen_00000004.base.vdb", "gen_00000005.delta.vdb"]
+    assert len(reader) == 64
+    for q in rng.randn(5, 16).astype(np.float32):
+        assert [r["vertex_id"] for r in reader.query(q, top_k=7)] == [r["vertex_id"] for r in vdb.query(q, top_k=7)]
+    q, ids = rng.randn(16).astype(np.float32), [0, 3, 17, 40]
+    got = reader.query_ids(q, ids)
+    assert [r["vertex_id"] for r in got] == [r["vertex_id"] for r in vdb.query_ids(q, ids)]
+    assert got[[r["vertex_id"] for r in got].index(0)]["meta"] == {"snippet": "again"}
+    path = str(tmp_path / "merged.vdb")
+    reader.save(path)
+    merged = VectorDB()
+    merged.load(path)
+    assert len(merged) == 64 and merged.meta[0] == {"snippet": "again"}
+
+
+def test_shared_pq_deltas_never_train_a_codebook_of_their_own(tmp_path):
+    from src.knowledge.shared_vector_db import SharedVectorDB
+    rng = np.random.RandomState(0)
+    vecs = rng.randn(10050, 8).astype(np.float32)
+    root = str(tmp_path / "shared")
+    writer = SharedVectorDB(root, writer=True, storage="pq", publish_every=len(vecs))
+    writer.bulk_upsert([(i, vecs[i], None) for i in range(50)])
+    with pytest.warns(RuntimeWarning):
+        writer.publish()  # too small a base to train on
+    # large enough to train on its own, but a delta keeps the base's (untrained) codec
+    writer.bulk_upsert([(i, vecs[i], None) for i in range(50, len(vecs))])
+    writer.publish()
+    reader = SharedVectorDB(root)
+    assert [s.db.snapshot().codec.trained for s in reader._segments] == [False, False]
+    q = rng.randn(8).astype(np.float32)
+    cos = vecs @ q / np.linalg.norm(vecs, axis=1)
+    assert [r["vertex_id"] for r in reader.query(q, top_k=5)] == np.argsort(-cos)[:5].tolist()
+
+
+@pytest.mark.parametrize("partition", ["hash", "range"])
+def test_sharded_vector_db_matches_single_store(tmp_path, partition):
+    from src.knowledge.sharded_vector_db import ShardedVectorDB
+    vdb, rng = _populated_db(n=64)
+    items = [(i, v, vdb.meta[i]) for i, v in vdb.vectors.items()]
+    with ShardedVectorDB(n_shards=3, partition=partition, vertex_count=64) as sharded:
+        sharded.bulk_upsert(items)
+        assert len(sharded) == 64
+        sizes = [sum(1 for i in range(64) if sharded.shard_of(i) == s) for s in range(3)]
+        assert min(sizes) > 0
+        queries = rng.randn(5, 16).astype(np.float32)
+        for q in queries:
+            assert [r["vertex_id"] for r in sharded.query(q, top_k=7)] == [r["vertex_id"] for r in vdb.query(q, top_k=7)]
+        path = str(tmp_path / "sharded.json")
+        sharded.save(path)
+    with ShardedVectorDB(n_shards=1) as restored:
+        restored.load(path)
+        assert restored.n_shards == 3 and restored.partition == partition
+        assert restored.query(queries[0], top_k=3) == vdb.query(queries[0], top_k=3)
+
+
+def test_sharded_vector_db_concurrent_queries_and_ball_lookup():
+    import threading
+    from src.knowledge.sharded_vector_db import ShardedVectorDB
+    vdb, rng = _populated_db(n=64)
+    queries = rng.randn(50, 16).astype(np.float32)
+    expected = [[r["vertex_id"] for r in vdb.query(q, top_k=5)] for q in queries]
+    with ShardedVectorDB(n_shards=3) as sharded:
+        sharded.bulk_upsert([(i, v, vdb.meta[i]) for i, v in vdb.vectors.items()])
+        wrong, errors = [], []
+
+        def worker():
+            try:
+                for _ in range(4):
+                    for q, want in zip(queries, expected):
+                        if [r["vertex_id"] for r in sharded.query(q, top_k=5)] != want:
+                            wrong.append(want)
+            except Exception as e:  # surfaced below
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert not errors and not wrong
+        assert sharded.meta == dict(vdb.meta) and set(sharded.vectors) == set(range(64))
+        ids = [1, 5, 9, 40, 63]
+        got, want = sharded.query_ids(queries[0], ids, top_k=3), vdb.query_ids(queries[0], ids, top_k=3)
+        assert [r["vertex_id"] for r in got] == [r["vertex_id"] for r in want]
+        assert [r["score"] for r in got] == pytest.approx([r["score"] for r in want], abs=1e-6)
@@ -179,16 +179,11 @@ def build_gpt2_generator():
             
         return response.strip()
 
-    def encoder(texts: List[str]) -> np.ndarray:
-        # Simple encoding using consistent random seeding
-        encoded = []
-        for text in texts:
-            # Use hash of text for consistent random seeding
-            seed = abs(hash(text)) % 10000
-            np.random.seed(seed)
-            embedding = np.random.rand(768).astype(np.float32)
-            encoded.append(embedding)
-        return np.array(encoded)
+    # Mean-pooled GPT-2 hidden states from the model loaded above (768-d, batched);
+    # repeated prompts and queries are served from the embedding cache
+    from embeddings.gpt2_encoder import GPT2Encoder
+    from embeddings.cache import CachedEncoder
+    encoder = CachedEncoder(GPT2Encoder(model_instance, tokenizer), namespace="gpt2-hidden")
 
     print("GPT-2 model loaded successfully!")
     return generator, encoder
@@ -289,7 +284,7 @@ try:
         dialogue_state = DialogueState(capacity=16)
         vectordb = VectorDB()
         # seed vectordb with a dummy vertex
-        vectordb.upsert(0, np.random.rand(768).astype(np.float32), {"snippet": "seed"})
+        vectordb.upsert(0, encoder_fn(["seed"])[0], {"snippet": "seed"})
         
         inf = InferenceManager(
             generator=generator_fn,
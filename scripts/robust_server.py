@@ -13,7 +13,7 @@ from flask_cors import CORS
 import numpy as np
 
 # Add the Zoid project to the path
-zoid_path = os.path.join(os.path.dirname(__file__), "gpt2_hypercube_phase1", "gpt2-hypercube-phase1")
+zoid_path = os.path.join(os.path.dirname(__file__), "..", "gpt2_hypercube_phase1", "gpt2-hypercube-phase1")
 sys.path.insert(0, zoid_path)
 sys.path.insert(0, os.path.join(zoid_path, "src"))
 
@@ -105,20 +105,14 @@ def try_import_production_components():
                     return "Sorry, I encountered an error while generating a response."
 
         class ProductionEncoder:
-            """Real encoder using GPT-2 tokenizer"""
-            def __init__(self):
-                self.tokenizer = GPT2Tokenizer.from_pretrained("gpt2")
-            
+            """Mean-pooled GPT-2 hidden-state embeddings, reusing the generator's model"""
+            def __init__(self, generator):
+                from embeddings.gpt2_encoder import GPT2Encoder
+                from embeddings.cache import CachedEncoder
+                self.encoder = CachedEncoder(GPT2Encoder(generator.model, generator.tokenizer), namespace="gpt2-hidden")
+
             def __call__(self, texts: List[str]) -> np.ndarray:
-                # Simple encoding using consistent random seeding
-                encoded = []
-                for text in texts:
-                    # Use hash of text for consistent random seeding
-                    seed = abs(hash(text)) % 10000
-                    np.random.seed(seed)
-                    embedding = np.random.rand(768).astype(np.float32)
-                    encoded.append(embedding)
-                return np.array(encoded)
+                return self.encoder(texts)
         
         return ProductionGenerator, ProductionEncoder, True
     except Exception as e:
@@ -133,7 +127,7 @@ if args.mode == "production":
     if PRODUCTION_AVAILABLE and ProductionGenerator is not None and ProductionEncoder is not None:
         print("Initializing production mode...")
         generator = ProductionGenerator()
-        encoder = ProductionEncoder()
+        encoder = ProductionEncoder(generator)
         model_status = "production"
     else:
         print("Falling back to mock mode...")
@@ -12,7 +12,7 @@ from flask_cors import CORS
 import numpy as np
 
 # Add the Zoid project to the path
-zoid_path = os.path.join(os.path.dirname(__file__), "gpt2_hypercube_phase1", "gpt2-hypercube-phase1")
+zoid_path = os.path.join(os.path.dirname(__file__), "..", "gpt2_hypercube_phase1", "gpt2-hypercube-phase1")
 sys.path.insert(0, zoid_path)
 sys.path.insert(0, os.path.join(zoid_path, "src"))
 
@@ -94,42 +94,27 @@ class ZoidGenerator:
             return "Sorry, I encountered an error while generating a response."
 
 class ZoidEncoder:
-    """Wrapper for GPT-2 tokenizer to create embeddings"""
-    def __init__(self):
-        self.torch, self.GPT2Tokenizer, self.GPT2LMHeadModel = import_torch_components()
-        
-        if not self.torch:
-            raise ImportError("PyTorch is required for production mode")
-            
-        self.tokenizer = self.GPT2Tokenizer.from_pretrained("gpt2")
-    
+    """Mean-pooled GPT-2 hidden-state embeddings, reusing the generator's model"""
+    def __init__(self, generator: ZoidGenerator):
+        from embeddings.gpt2_encoder import GPT2Encoder
+        from embeddings.cache import CachedEncoder
+        self.encoder = CachedEncoder(GPT2Encoder(generator.model_instance, generator.tokenizer), namespace="gpt2-hidden")
+
     def __call__(self, texts: List[str]) -> np.ndarray:
-        try:
-            encoded = []
-            for text in texts:
-                # Simple approach: create random embeddings with consistent seeding
-                seed = abs(hash(text)) % 10000
-                np.random.seed(seed)
-                embedding = np.random.rand(768).astype(np.float32)
-                encoded.append(embedding)
-            return np.array(encoded)
-        except Exception as e:
-            print(f"Error encoding text: {e}")
-            # Return random vectors as fallback
-            return np.random.rand(len(texts), 768)
+        return self.encoder(texts)
 
 # Initialize components
 if ZOID_AVAILABLE:
     try:
         generator = ZoidGenerator()
-        encoder = ZoidEncoder()
+        encoder = ZoidEncoder(generator)
         model_status = "production"
         
         # Initialize Zoid components
         dialogue_state = DialogueState(capacity=16)
         vectordb = VectorDB()
         # Seed vectordb with a dummy vertex
-        vectordb.upsert(0, np.random.rand(768).astype(np.float32), {"snippet": "seed"})
+        vectordb.upsert(0, encoder(["seed"])[0], {"snippet": "seed"})
         
         # Initialize inference manager
         inf = InferenceManager(